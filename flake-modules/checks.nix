@@ -22,6 +22,24 @@
           python3 -m unittest discover -v -s . -p 'test_*.py'
           touch $out
         '';
+      router-dashboard-test =
+        inputs.nixpkgs.legacyPackages.${system}.runCommand "router-dashboard-test" {
+          nativeBuildInputs = [inputs.nixpkgs.legacyPackages.${system}.python3];
+        } ''
+          cp ${../hosts/router/services}/router-dashboard.py ${../hosts/router/services}/test_router_dashboard.py .
+          python3 -m unittest discover -v -s . -p 'test_*.py'
+          touch $out
+        '';
+      router-dashboard-bench =
+        inputs.nixpkgs.legacyPackages.${system}.runCommand "router-dashboard-bench" {
+          nativeBuildInputs = [inputs.nixpkgs.legacyPackages.${system}.python3];
+        } ''
+          cp ${../hosts/router/services}/router-dashboard.py ${../hosts/router/services}/router-dashboard-bench.py .
+          # Latency depends on the builder, so CI compares allocations and round-trips
+          python3 router-dashboard-bench.py replay --clients 10,100 \
+            --baseline ${../hosts/router/services/router-dashboard-bench-baseline.json} --compare peak_kib,vm_requests
+          touch $out
+        '';
     };
   };
 }
@@ -19,6 +19,11 @@
       reverse_proxy localhost:8085
     }
 
+    # Dashboard page assets (content-hashed, cached immutably)
+    handle /static/* {
+      reverse_proxy localhost:8085
+    }
+
     # Grafana - Monitoring dashboards
     handle /grafana* {
       reverse_proxy localhost:3000
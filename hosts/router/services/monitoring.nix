@@ -107,6 +107,14 @@ in {
               }
             ];
           }
+          {
+            job_name = "router-dashboard";
+            static_configs = [
+              {
+                targets = ["localhost:8085"];
+              }
+            ];
+          }
         ];
       })}"
       "-storageDataPath=/var/lib/victoriametrics"
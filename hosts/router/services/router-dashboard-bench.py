@@ -0,0 +1,884 @@
+#!/usr/bin/env python3
+"""Benchmarks for router-dashboard.py that run off-router.
+
+Starts a stub VictoriaMetrics on a random local port, points the dashboard at
+it and measures the dashboard from the outside:
+
+    python3 router-dashboard-bench.py load --clients 20 --duration 10
+    python3 router-dashboard-bench.py load --server single   # baseline
+    python3 router-dashboard-bench.py vm-client
+    python3 router-dashboard-bench.py refresh
+    python3 router-dashboard-bench.py histories --clients 50
+    python3 router-dashboard-bench.py replay --clients 10,100,1000
+    python3 router-dashboard-bench.py replay --clients 10,100 --baseline router-dashboard-bench-baseline.json
+    python3 router-dashboard-bench.py record --fixtures fixtures/   # on the router
+    python3 router-dashboard-bench.py scheduler --clients 100 --duration 120
+
+Nothing here needs root or a real router; /proc is read from the host,
+except by `replay`, which reads everything (/proc, the neighbor table,
+VictoriaMetrics) from fixtures: either recorded on the router with `record`
+or generated for a given number of clients. The router-dashboard-bench flake
+check replays against router-dashboard-bench-baseline.json, comparing only
+allocations and VictoriaMetrics round-trips (latency depends on the builder);
+after an intended change, rewrite it with `replay --clients 10,100 --json <file>`.
+"""
+
+import argparse
+import asyncio
+import http.client
+import importlib.util
+import json
+import random
+import re
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
+from pathlib import Path
+
+DASHBOARD_PATH = Path(__file__).with_name('router-dashboard.py')
+
+
+def load_dashboard():
+    """Import router-dashboard.py as a module (its filename isn't importable)"""
+    spec = importlib.util.spec_from_file_location('router_dashboard', DASHBOARD_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.logger.setLevel('WARNING')
+    return module
+
+
+class StubVictoriaMetrics(BaseHTTPRequestHandler):
+    """Answers instant and range queries with synthetic client traffic"""
+    protocol_version = 'HTTP/1.1'
+    # Like VictoriaMetrics itself (Go sets TCP_NODELAY)
+    disable_nagle_algorithm = True
+    clients = 30
+    delay = 0.0
+    range_delay = 0.0
+    requests = 0
+    connections = 0
+    range_points = 0
+
+    def setup(self):
+        super().setup()
+        StubVictoriaMetrics.connections += 1
+
+    def do_GET(self):
+        StubVictoriaMetrics.requests += 1
+        parsed = urllib.parse.urlparse(self.path)
+        params = urllib.parse.parse_qs(parsed.query)
+        if parsed.path == '/api/v1/query_range':
+            time.sleep(self.range_delay)
+            result = self.range_result(params)
+        else:
+            time.sleep(self.delay)
+            result = self.instant_result(params.get('query', [''])[0])
+        body = json.dumps({'status': 'success', 'data': {'resultType': 'vector', 'result': result}}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def instant_result(self, query):
+        now = time.time()
+        batched = re.findall(r'"dashboard_query", "(\w+)"', query)
+        if batched:
+            return [{'metric': {'dashboard_query': name}, 'value': [now, '42']} for name in batched]
+        if query.startswith('client_') or 'client_traffic' in query:
+            series = []
+            for i in range(self.clients):
+                ip = f'10.1.1.{i + 10}'
+                for direction in ('rx', 'tx'):
+                    series.append({'metric': {'ip': ip, 'client': f'host-{i}', 'device_type': 'laptop',
+                                              'direction': direction},
+                                   'value': [now, str(random.uniform(0, 5e6))]})
+            return series
+        return [{'metric': {'client': '10.1.1.10', 'reason': 'BLOCKED (ads)'}, 'value': [now, '1234']}]
+
+    def range_result(self, params):
+        start = float(params['start'][0])
+        end = float(params['end'][0])
+        step = float(params['step'][0])
+        points = int((end - start) // step) + 1
+        query = params['query'][0]
+        ips = query.split('ip=~"', 1)[1].split('"', 1)[0].split('|') if 'ip=~"' in query else []
+        series = []
+        for ip in ips:
+            for direction in ('rx', 'tx'):
+                values = [[start + i * step, str(random.uniform(0, 5e6))] for i in range(points)]
+                series.append({'metric': {'ip': ip, 'direction': direction}, 'values': values})
+        StubVictoriaMetrics.range_points += len(series) * points
+        return series
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def percentile(samples, pct):
+    if not samples:
+        return float('nan')
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def poll(port, path, stop, samples, errors, interval):
+    """One dashboard client: keep-alive connection polling a single path"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+            if response.getheader('Connection', '').lower() == 'close':
+                conn.close()
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(type(e).__name__)
+            conn.close()
+        samples.append((time.perf_counter() - started) * 1000)
+        if interval:
+            stop.wait(interval)
+    conn.close()
+
+
+def run_load(args):
+    dashboard = load_dashboard()
+
+    StubVictoriaMetrics.clients = args.vm_clients
+    StubVictoriaMetrics.delay = args.vm_delay
+    StubVictoriaMetrics.range_delay = args.vm_range_delay
+    vm = start_server(ThreadingHTTPServer(('127.0.0.1', 0), StubVictoriaMetrics))
+    dashboard.victoriametrics = dashboard.VictoriaMetricsClient(f'http://127.0.0.1:{vm.server_address[1]}')
+    if args.collection == 'background':
+        dashboard.collector.start()
+
+    if args.server == 'single':
+        # What main() used to run: one thread, one HTTP/1.0 request at a time
+        class SingleHandler(dashboard.MetricsHandler):
+            protocol_version = 'HTTP/1.0'
+        server = HTTPServer(('127.0.0.1', 0), SingleHandler)
+    else:
+        server = dashboard.DashboardHTTPServer(('127.0.0.1', 0), dashboard.MetricsHandler,
+                                               max_workers=args.workers)
+    start_server(server)
+    port = server.server_address[1]
+
+    ips = ','.join(f'10.1.1.{i + 10}' for i in range(args.vm_clients))
+    routes = {
+        '/api/metrics': '/api/metrics',
+        '/api/client-histories': f'/api/client-histories?ips={ips}&duration=168h',
+    }
+    samples = {route: [] for route in routes}
+    errors = {route: [] for route in routes}
+    stop = threading.Event()
+    threads = []
+    for i in range(args.clients):
+        # One in five clients has its graphs expanded
+        route = '/api/client-histories' if i % 5 == 4 else '/api/metrics'
+        thread = threading.Thread(target=poll, args=(port, routes[route], stop, samples[route],
+                                                     errors[route], args.interval), daemon=True)
+        thread.start()
+        threads.append(thread)
+
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=30)
+    server.shutdown()
+    server.server_close()
+    dashboard.collector.stop()
+    vm.shutdown()
+
+    print(f"server={args.server} collection={args.collection} clients={args.clients} duration={args.duration}s "
+          f"vm_delay={args.vm_delay * 1000:.0f}ms vm_range_delay={args.vm_range_delay * 1000:.0f}ms")
+    print(f"{'route':<24} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for route, values in samples.items():
+        print(f"{route:<24} {len(values):>8} {len(errors[route]):>6} {len(values) / args.duration:>8.1f} "
+              f"{percentile(values, 50):>8.1f} {percentile(values, 99):>8.1f} "
+              f"{max(values, default=float('nan')):>8.1f}")
+        if values:
+            print(f"{'':<24} mean={statistics.fmean(values):.1f}ms")
+
+
+def timed(func, repeat):
+    """Mean milliseconds per call over `repeat` calls"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) * 1000 / repeat
+
+
+def run_vm_client(args):
+    dashboard = load_dashboard()
+    StubVictoriaMetrics.delay = args.vm_delay
+    vm = start_server(ThreadingHTTPServer(('127.0.0.1', 0), StubVictoriaMetrics))
+    base_url = f'http://127.0.0.1:{vm.server_address[1]}'
+    client = dashboard.VictoriaMetricsClient(base_url)
+    blocky_queries = {f'q{i}': f'sum(blocky_metric_{i})' for i in range(7)}
+
+    def urlopen_query(query='client_status'):
+        url = f"{base_url}/api/v1/query?query={urllib.parse.quote(query)}"
+        with urllib.request.urlopen(url, timeout=2) as response:
+            json.loads(response.read())
+
+    def reset():
+        StubVictoriaMetrics.requests = 0
+        StubVictoriaMetrics.connections = 0
+
+    print(f"vm_delay={args.vm_delay * 1000:.1f}ms repeat={args.repeat}")
+    print(f"{'case':<40} {'ms/op':>8} {'req/op':>7} {'new conns':>9}")
+
+    def report(name, func, repeat=args.repeat):
+        reset()
+        ms = timed(func, repeat)
+        print(f"{name:<40} {ms:>8.2f} {StubVictoriaMetrics.requests / repeat:>7.1f} "
+              f"{StubVictoriaMetrics.connections:>9}")
+
+    report('single query, urlopen per query', urlopen_query)
+    report('single query, pooled client', lambda: client.query('client_status'))
+    report('7 queries, urlopen each', lambda: [urlopen_query(q) for q in blocky_queries.values()])
+    report('7 queries, pooled client each', lambda: [client.query(q) for q in blocky_queries.values()])
+    report('7 queries, one query_many round-trip', lambda: client.query_many(blocky_queries))
+
+    # Concurrent identical queries: singleflight should collapse them
+    def burst():
+        threads = [threading.Thread(target=client.query, args=('client_status',)) for _ in range(args.burst)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    report(f'{args.burst} concurrent identical queries', burst, repeat=max(1, args.repeat // 10))
+
+    client.close()
+    vm.shutdown()
+
+
+def legacy_addresses(interfaces):
+    """What get_wan_ip/get_lan_network used to do: one `ip` fork per interface"""
+    for iface in interfaces:
+        subprocess.run(['ip', '-4', 'addr', 'show', iface], capture_output=True, text=True, timeout=1)
+
+
+def legacy_pings(hosts):
+    """What check_connectivity used to do: one `ping` fork per host, in threads"""
+    with ThreadPoolExecutor(max_workers=len(hosts)) as executor:
+        list(executor.map(lambda host: subprocess.run(['ping', '-c', '1', '-W', '1', host],
+                                                      capture_output=True, text=True, timeout=1.5), hosts))
+
+
+def run_refresh(args):
+    dashboard = load_dashboard()
+    metrics = dashboard.SystemMetrics()
+    # ppp0, four WAN candidates and br-lan, as the old code tried in the worst case
+    interfaces = ['ppp0', 'enp2s0', 'eth0', 'wan', 'enp1s0', 'br-lan']
+    hosts = args.targets.split(',')
+
+    print(f"repeat={args.repeat} targets={args.targets}")
+    print(f"{'case':<40} {'ms/op':>8}")
+    cases = [
+        ('addresses: fork ip x6 (before)', lambda: legacy_addresses(interfaces), shutil.which('ip')),
+        ('addresses: netlink dump (after)', lambda: dashboard.data_sources.run(metrics.netlink.aaddresses()), True),
+        ('network section (after)', lambda: dashboard.data_sources.run(metrics.get_network_info()), True),
+        (f'probe {len(hosts)} hosts: fork ping (before)', lambda: legacy_pings(hosts), shutil.which('ping')),
+        (f'probe {len(hosts)} hosts: ICMP sockets (after)',
+         lambda: dashboard.data_sources.run(metrics.icmp.probe(hosts)), True),
+    ]
+    for name, func, available in cases:
+        if not available:
+            print(f"{name:<40} {'skipped (command not found)':>8}")
+            continue
+        print(f"{name:<40} {timed(func, args.repeat):>8.2f}")
+
+
+class CannedRangeQueries:
+    """Stands in for the VictoriaMetrics client: replays one parsed range result"""
+    def __init__(self, result):
+        self.result = result
+
+    def query_range(self, query, start, end, step, timeout=10):
+        return self.result
+
+
+def run_histories(args):
+    dashboard = load_dashboard()
+    StubVictoriaMetrics.range_delay = 0.0
+    vm = start_server(ThreadingHTTPServer(('127.0.0.1', 0), StubVictoriaMetrics))
+    client = dashboard.VictoriaMetricsClient(f'http://127.0.0.1:{vm.server_address[1]}')
+    metrics = dashboard.SystemMetrics()
+    ips = [f'10.1.1.{i + 10}' for i in range(args.clients)]
+
+    def fetch(duration):
+        dashboard.client_series_cache.clear()
+        return metrics.get_bulk_client_histories(ips, duration)
+
+    print(f"clients={args.clients} repeat={args.repeat}")
+    print(f"{'duration':<10} {'end-to-end ms':>14} {'processing ms':>14} {'points/client':>14}")
+    for duration in args.durations.split(','):
+        dashboard.victoriametrics = client
+        points = len(fetch(duration)[ips[0]]['labels'])
+        total = timed(lambda: fetch(duration), args.repeat)
+        # Same request with the HTTP round-trip and JSON decoding taken out
+        seconds = dashboard.parse_duration(duration)
+        end = int(time.time())
+        step = dashboard.history_step(seconds)
+        dashboard.victoriametrics = CannedRangeQueries(client.query_range(
+            f'client_traffic_rate_bps{{ip=~"{"|".join(ips)}"}}', end - seconds, end, step))
+        processing = timed(lambda: fetch(duration), args.repeat)
+        print(f"{duration:<10} {total:>14.2f} {processing:>14.2f} {points:>14}")
+
+    # Cache reuse across IP subsets and incremental refresh
+    dashboard.victoriametrics = client
+    cache = dashboard.client_series_cache
+    duration = args.durations.split(',')[0]
+    subsets = [[ip] for ip in ips[:20]] + [random.sample(ips, len(ips) // 2) for _ in range(5)]
+
+    def case(name, func, repeat=1):
+        StubVictoriaMetrics.requests = 0
+        StubVictoriaMetrics.range_points = 0
+        ms = timed(func, repeat)
+        print(f"{name:<40} {ms:>8.2f} {StubVictoriaMetrics.requests / repeat:>7.1f} "
+              f"{StubVictoriaMetrics.range_points / repeat:>10.0f}")
+
+    print(f"\n{duration} window")
+    print(f"{'case':<40} {'ms/op':>8} {'req/op':>7} {'points/op':>10}")
+    case('all clients, cold', lambda: fetch(duration))
+    case('subsets after a full fetch', lambda: [metrics.get_bulk_client_histories(ips, duration) for ips in subsets])
+    cache.refresh_interval = 0
+    case('all clients, stale (tail only)', lambda: metrics.get_bulk_client_histories(ips, duration), args.repeat)
+    cache.refresh_interval = 15
+
+    # Wire size and encoding cost of the two response formats, from warm caches
+    def encode_json(duration):
+        return dashboard.PreparedResponse.json(metrics.get_bulk_client_histories(ips, duration))
+
+    def encode_binary(duration):
+        timestamps, columns, seconds, step = metrics.get_client_history_columns(ips, duration)
+        body = dashboard.encode_client_histories(timestamps, columns, ips, seconds, step)
+        return dashboard.PreparedResponse(body, dashboard.HISTORY_BINARY_TYPE)
+
+    print(f"\n{'duration':<10} {'format':<8} {'bytes':>10} {'gzipped':>10} {'encode ms':>10}")
+    for duration in args.durations.split(','):
+        for name, encoder in (('json', encode_json), ('binary', encode_binary)):
+            response = encoder(duration)
+            ms = timed(lambda: encoder(duration), args.repeat)
+            print(f"{duration:<10} {name:<8} {len(response.body):>10} {len(response.gzipped()):>10} {ms:>10.2f}")
+
+    client.close()
+    vm.shutdown()
+
+
+# Instant queries the dashboard issues, answered from the fixture by exact text
+FIXTURE_INSTANT_QUERIES = ('client_status', 'client_active_connections', 'client_traffic_rate_bps',
+                           'max by (ip, direction) (client_traffic_bytes)')
+# Series replayed for range queries, keyed by the metric a query names
+FIXTURE_SERIES = ('client_traffic_rate_bps', 'client_traffic_bytes')
+FIXTURE_PROC_FILES = ('stat', 'meminfo', 'uptime', 'loadavg', 'net/dev')
+
+
+def fixture_ip(index):
+    return f'10.1.{index // 250}.{index % 250 + 2}'
+
+
+def series_key(query):
+    """The replayed series a range query asks for"""
+    for name in FIXTURE_SERIES:
+        if name in query:
+            return name
+    return query
+
+
+def write_fixtures(directory, clients, blocky_queries, seed=1):
+    """Synthetic fixtures for `clients` LAN clients, in the format `record` writes"""
+    rng = random.Random(seed)
+    directory = Path(directory)
+    (directory / 'proc' / 'net').mkdir(parents=True, exist_ok=True)
+    cores = [[rng.randrange(10**6, 10**7) for _ in range(10)] for _ in range(4)]
+    cpu_lines = [f"cpu  {' '.join(str(sum(column)) for column in zip(*cores))}"]
+    cpu_lines += [f"cpu{i} {' '.join(map(str, times))}" for i, times in enumerate(cores)]
+    (directory / 'proc' / 'stat').write_text('\n'.join(cpu_lines) + '\nintr 0\nctxt 0\n')
+    (directory / 'proc' / 'meminfo').write_text(
+        'MemTotal:       16318928 kB\nMemFree:         9165304 kB\nMemAvailable:   12648212 kB\n')
+    (directory / 'proc' / 'uptime').write_text('1234567.89 4567890.12\n')
+    (directory / 'proc' / 'loadavg').write_text('0.42 0.35 0.30 2/345 67890\n')
+    interfaces = ''.join(
+        f"{name:>6}: {rng.randrange(10**12)} {rng.randrange(10**9)} 0 0 0 0 0 0 "
+        f"{rng.randrange(10**12)} {rng.randrange(10**9)} 0 0 0 0 0 0\n"
+        for name in ('lo', 'br-lan', 'enp2s0', 'ppp0'))
+    (directory / 'proc' / 'net' / 'dev').write_text(
+        'Inter-|   Receive                                                |  Transmit\n'
+        ' face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets errs drop fifo colls carrier compressed\n'
+        + interfaces)
+
+    states = ['REACHABLE'] * 6 + ['STALE'] * 3 + ['DELAY']
+    neighbors = []
+    instant = {query: [] for query in FIXTURE_INSTANT_QUERIES}
+    series = {name: {} for name in FIXTURE_SERIES}
+    for i in range(clients):
+        ip = fixture_ip(i)
+        mac = f'02:00:00:{i >> 16 & 0xff:02x}:{i >> 8 & 0xff:02x}:{i & 0xff:02x}'
+        labels = {'ip': ip, 'client': f'host-{i:04d}', 'device_type': rng.choice(['laptop', 'phone', 'tv', 'unknown'])}
+        neighbors.append({'ip': ip, 'family': 4, 'mac': mac, 'ifname': 'br-lan', 'state': rng.choice(states)})
+        if i % 4 == 0:
+            neighbors.append({'ip': f'fd00::{i:x}', 'family': 6, 'mac': mac, 'ifname': 'br-lan', 'state': 'STALE'})
+        instant['client_status'].append({'metric': labels, 'value': [0, '1' if i % 10 else '0']})
+        instant['client_active_connections'].append({'metric': labels, 'value': [0, str(rng.randrange(200))]})
+        # Busy clients are rare: a heavy-tailed rate distribution like a real LAN
+        rates, counters = {}, {}
+        for direction in ('rx', 'tx'):
+            scale = rng.paretovariate(1.2) * 1e4
+            rates[direction] = [round(scale * rng.uniform(0.2, 1.8)) for _ in range(60)]
+            counters[direction] = [round(value * 60 / 8) for value in rates[direction]]
+            instant['client_traffic_rate_bps'].append(
+                {'metric': dict(labels, direction=direction), 'value': [0, str(rates[direction][-1])]})
+            instant['max by (ip, direction) (client_traffic_bytes)'].append(
+                {'metric': {'ip': ip, 'direction': direction}, 'value': [0, str(sum(counters[direction]))]})
+        series['client_traffic_rate_bps'][ip] = rates
+        series['client_traffic_bytes'][ip] = counters
+
+    blocky = {
+        'total': [{'metric': {}, 'value': [0, '1843210']}],
+        'qpm': [{'metric': {}, 'value': [0, '212.5']}],
+        'cache_hits': [{'metric': {}, 'value': [0, '1203342']}],
+        'cache_misses': [{'metric': {}, 'value': [0, '639868']}],
+        'top_clients': [{'metric': {'client': fixture_ip(i)}, 'value': [0, str(50000 - i * 7000)]}
+                        for i in range(min(5, clients))],
+        'blocking': [{'metric': {'reason': f'BLOCKED ({name})'}, 'value': [0, str(count)]}
+                     for name, count in (('ads', 98765), ('malware', 4321), ('tracking', 23456))],
+    }
+    for part, query in blocky_queries.items():
+        instant[query] = blocky.get(part, [])
+    instant['count(blocky_build_info)'] = [{'metric': {}, 'value': [0, '1']}]
+
+    netlink = {'addresses': {'lo': [['127.0.0.1', 8]], 'br-lan': [['10.1.0.1', 16]], 'ppp0': [['203.0.113.7', 32]]},
+               'neighbors': neighbors}
+    (directory / 'netlink.json').write_text(json.dumps(netlink))
+    (directory / 'victoriametrics.json').write_text(json.dumps({'instant': instant, 'series': series}))
+    return directory
+
+
+class FixtureNetlink:
+    """Replays a recorded address and neighbor table; no events ever arrive"""
+    def __init__(self, directory):
+        data = json.loads((Path(directory) / 'netlink.json').read_text())
+        self.address_table = {iface: [tuple(address) for address in addresses]
+                              for iface, addresses in data['addresses'].items()}
+        self.neighbor_table = {(n['ifname'], n['ip']): n for n in data['neighbors']}
+        self.sockets = []
+
+    def subscribe(self, groups):
+        # A socket that never becomes readable, so trackers keep the initial dump
+        sock, peer = socket.socketpair()
+        self.sockets.append(peer)
+        return sock
+
+    def addresses(self, family=socket.AF_INET):
+        return self.address_table
+
+    def neighbors(self):
+        return dict(self.neighbor_table)
+
+    async def aaddresses(self, family=socket.AF_INET):
+        return self.addresses(family)
+
+    async def aneighbors(self):
+        return self.neighbors()
+
+
+class FixtureProber:
+    """Every connectivity target answers in 12 ms"""
+    async def probe(self, hosts, timeout=1.0):
+        return {host: 12.0 for host in hosts}
+
+
+class FixtureVictoriaMetrics:
+    """Stands in for VictoriaMetricsClient, answering from a fixture
+
+    Instant queries are matched by their exact text; range queries replay the
+    recorded per-client values onto the requested grid, for the IPs in the
+    query's ip=~"..." matcher (or every client without one). Each call counts
+    as one round-trip of `latency` seconds; the async twins used on the
+    data-source loop wait without blocking it. Queries the fixture doesn't
+    know are answered with an empty result and counted in `misses`.
+    """
+    def __init__(self, directory, latency=0.0):
+        data = json.loads((Path(directory) / 'victoriametrics.json').read_text())
+        self.instant = data['instant']
+        self.series = data['series']
+        self.latency = latency
+        self.requests = 0
+        self.misses = set()
+
+    def round_trip(self):
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    async def async_round_trip(self):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def lookup(self, query):
+        if query not in self.instant:
+            self.misses.add(query)
+        return self.instant.get(query, [])
+
+    def query(self, query, timeout=2, name='query'):
+        self.round_trip()
+        return self.lookup(query)
+
+    def query_many(self, queries, timeout=2, name='batch'):
+        self.round_trip()
+        return {part: self.lookup(query) for part, query in queries.items()}
+
+    async def aquery(self, query, timeout=2, name='query'):
+        await self.async_round_trip()
+        return self.lookup(query)
+
+    async def aquery_many(self, queries, timeout=2, name='batch'):
+        await self.async_round_trip()
+        return {part: self.lookup(query) for part, query in queries.items()}
+
+    async def aquery_range(self, query, start, end, step, timeout=10, name='query_range'):
+        await self.async_round_trip()
+        return self.replay_range(query, start, end, step)
+
+    def query_range(self, query, start, end, step, timeout=10, name='query_range'):
+        self.round_trip()
+        return self.replay_range(query, start, end, step)
+
+    def replay_range(self, query, start, end, step):
+        by_ip = self.series.get(series_key(query))
+        if by_ip is None:
+            self.misses.add(query)
+            return []
+        ips = query.split('ip=~"', 1)[1].split('"', 1)[0].split('|') if 'ip=~"' in query else list(by_ip)
+        grid = range(int(start) // step * step, int(end) + 1, step)
+        result = []
+        for ip in ips:
+            for direction, values in by_ip.get(ip, {}).items():
+                result.append({'metric': {'ip': ip, 'direction': direction},
+                               'values': [[ts, str(values[ts // step % len(values)])] for ts in grid]})
+        return result
+
+
+class RecordingVictoriaMetrics:
+    """Wraps the real client and keeps every answer, for `record`"""
+    def __init__(self, client):
+        self.client = client
+        self.instant = {}
+        self.series = {}
+
+    def query(self, query, timeout=2, name='query'):
+        self.instant[query] = result = self.client.query(query, timeout, name)
+        return result
+
+    def query_many(self, queries, timeout=2, name='batch'):
+        return self.keep_many(queries, self.client.query_many(queries, timeout, name))
+
+    def query_range(self, query, start, end, step, timeout=10, name='query_range'):
+        return self.keep_range(query, self.client.query_range(query, start, end, step, timeout, name))
+
+    async def aquery(self, query, timeout=2, name='query'):
+        self.instant[query] = result = await self.client.aquery(query, timeout, name)
+        return result
+
+    async def aquery_many(self, queries, timeout=2, name='batch'):
+        return self.keep_many(queries, await self.client.aquery_many(queries, timeout, name))
+
+    async def aquery_range(self, query, start, end, step, timeout=10, name='query_range'):
+        return self.keep_range(query, await self.client.aquery_range(query, start, end, step, timeout, name))
+
+    def keep_many(self, queries, results):
+        for part, query in queries.items():
+            self.instant[query] = results[part]
+        return results
+
+    def keep_range(self, query, result):
+        by_ip = self.series.setdefault(series_key(query), {})
+        for item in result:
+            metric = item['metric']
+            if 'ip' in metric and 'direction' in metric:
+                by_ip.setdefault(metric['ip'], {})[metric['direction']] = [float(v) for _, v in item['values']]
+        return result
+
+
+def run_record(args):
+    dashboard = load_dashboard()
+    directory = Path(args.fixtures)
+    (directory / 'proc' / 'net').mkdir(parents=True, exist_ok=True)
+    for name in FIXTURE_PROC_FILES:
+        shutil.copyfile(f'/proc/{name}', directory / 'proc' / name)
+
+    netlink = dashboard.RouteNetlink()
+    (directory / 'netlink.json').write_text(json.dumps({
+        'addresses': {iface: [list(address) for address in addresses]
+                      for iface, addresses in netlink.addresses().items()},
+        'neighbors': list(netlink.neighbors().values()),
+    }))
+
+    recorder = RecordingVictoriaMetrics(dashboard.VictoriaMetricsClient(args.victoriametrics_url))
+    dashboard.victoriametrics = recorder
+    metrics = dashboard.SystemMetrics()
+    dashboard.data_sources.run(metrics.get_connected_clients(), timeout=30)
+    dashboard.data_sources.run(metrics.get_blocky_stats(), timeout=30)
+    ips = [client['ip'] for client in metrics.get_client_index().clients]
+    for duration in args.durations.split(','):
+        metrics.get_bulk_client_histories(ips, duration)
+    (directory / 'victoriametrics.json').write_text(json.dumps({'instant': recorder.instant,
+                                                                 'series': recorder.series}))
+    print(f"Recorded {len(ips)} clients, {len(recorder.instant)} instant queries to {directory}")
+
+
+def reset_caches(dashboard):
+    """Forget everything cached, so the next request does all of its work"""
+    for cache in (dashboard.metrics_cache, dashboard.connectivity_cache, dashboard.blocky_cache,
+                  dashboard.client_series_cache):
+        cache.clear()
+    dashboard.client_info_cache.last_update = 0
+    dashboard.system_metrics.client_index = dashboard.ClientIndex([], created=0)
+
+
+def measure(func, repeat, before=None):
+    """Latency samples (ms) for `repeat` calls, then peak and retained KiB from one traced call"""
+    samples = []
+    for _ in range(repeat):
+        if before:
+            before()
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    if before:
+        before()
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        func()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'p50_ms': round(percentile(samples, 50), 3),
+        'p95_ms': round(percentile(samples, 95), 3),
+        'ops_per_s': round(1000 * len(samples) / sum(samples), 1),
+        'peak_kib': round((peak - baseline) / 1024, 1),
+        'retained_kib': round((current - baseline) / 1024, 1),
+    }
+
+
+def replay_case(dashboard, fixtures, args):
+    """Results for one fixture directory: {case: measurements}"""
+    vm = FixtureVictoriaMetrics(fixtures, latency=args.vm_latency)
+    dashboard.victoriametrics = vm
+    metrics = dashboard.SystemMetrics(netlink=FixtureNetlink(fixtures),
+                                      procfs=dashboard.ProcSampler(str(Path(fixtures) / 'proc')),
+                                      icmp=FixtureProber())
+    dashboard.system_metrics = metrics
+    before = None if args.warm else lambda: reset_caches(dashboard)
+    ips = [client['ip'] for client in metrics.get_client_index().clients]
+
+    server = dashboard.DashboardHTTPServer(('127.0.0.1', 0), dashboard.MetricsHandler)
+    start_server(server)
+    conn = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=30)
+
+    def get(path):
+        conn.request('GET', path)
+        response = conn.getresponse()
+        response.read()
+        if response.status != 200:
+            raise RuntimeError(f'{path}: HTTP {response.status}')
+
+    cases = {
+        'get_connected_clients': lambda: dashboard.data_sources.run(metrics.get_connected_clients()),
+        f'get_bulk_client_histories {args.duration}': lambda: metrics.get_bulk_client_histories(ips, args.duration),
+        'GET /api/metrics': lambda: get('/api/metrics'),
+        'GET /api/clients': lambda: get('/api/clients?limit=50'),
+        f'GET /api/client-histories {args.duration}': lambda: get(f'/api/client-histories?duration={args.duration}'),
+        'GET /api/traffic': lambda: get('/api/traffic?window=24h'),
+    }
+    results = {}
+    try:
+        for name, func in cases.items():
+            vm.requests = 0
+            results[name] = measure(func, args.repeat, before)
+            results[name]['vm_requests'] = round(vm.requests / (args.repeat + 1), 1)
+    finally:
+        conn.close()
+        server.shutdown()
+        server.server_close()
+    if vm.misses:
+        print(f"warning: {len(vm.misses)} queries not in the fixture: {sorted(vm.misses)[:3]}", file=sys.stderr)
+    return results
+
+
+# What --baseline compares: key -> floor below which differences are noise.
+# VictoriaMetrics round-trips are exact, so any extra one is a regression.
+COMPARED = {'p50_ms': 1.0, 'peak_kib': 64.0, 'vm_requests': None}
+
+
+def compare(results, baseline, tolerance, keys=tuple(COMPARED)):
+    """Regressions beyond `tolerance` (a ratio) against a saved run"""
+    regressions = []
+    for clients, cases in results.items():
+        for name, values in cases.items():
+            old = baseline.get(clients, {}).get(name)
+            if not old:
+                continue
+            for key in keys:
+                floor = COMPARED[key]
+                limit = old[key] if floor is None else max(old[key], floor) * tolerance
+                if values[key] > limit:
+                    regressions.append(f"{clients} clients, {name}: {key} {old[key]} -> {values[key]}")
+    return regressions
+
+
+def run_replay(args):
+    dashboard = load_dashboard()
+    dashboard.logger.setLevel('ERROR')
+    results = {}
+    with tempfile.TemporaryDirectory() as scratch:
+        if args.fixtures:
+            runs = {'recorded': Path(args.fixtures)}
+        else:
+            runs = {count: write_fixtures(Path(scratch) / count, int(count), dashboard.BLOCKY_QUERIES)
+                    for count in args.clients.split(',')}
+        for label, fixtures in runs.items():
+            results[label] = replay_case(dashboard, fixtures, args)
+
+    print(f"repeat={args.repeat} cache={'warm' if args.warm else 'cold'} vm_latency={args.vm_latency * 1000:.1f}ms")
+    print(f"{'clients':>8} {'case':<40} {'p50 ms':>8} {'p95 ms':>8} {'ops/s':>8} "
+          f"{'peak KiB':>9} {'kept KiB':>9} {'vm req':>6}")
+    for label, cases in results.items():
+        for name, values in cases.items():
+            print(f"{label:>8} {name:<40} {values['p50_ms']:>8.2f} {values['p95_ms']:>8.2f} "
+                  f"{values['ops_per_s']:>8.1f} {values['peak_kib']:>9.1f} {values['retained_kib']:>9.1f} "
+                  f"{values['vm_requests']:>6.1f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2) + '\n')
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.tolerance,
+                              args.compare.split(','))
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+def run_scheduler(args):
+    dashboard = load_dashboard()
+    dashboard.logger.setLevel('ERROR')
+    with tempfile.TemporaryDirectory() as scratch:
+        fixtures = write_fixtures(Path(scratch), args.clients, dashboard.BLOCKY_QUERIES)
+        dashboard.victoriametrics = FixtureVictoriaMetrics(fixtures, latency=args.vm_latency)
+        reports = {}
+        for adaptive in (False, True):
+            # The host's live /proc, so CPU, memory and uptime really move
+            metrics = dashboard.SystemMetrics(netlink=FixtureNetlink(fixtures), icmp=FixtureProber())
+            collector = dashboard.MetricsCollector(metrics, adaptive=adaptive)
+            collector.start()
+            time.sleep(args.duration)
+            collector.stop()
+            reports['adaptive' if adaptive else 'fixed'] = collector.scheduler_report()
+
+    print(f"clients={args.clients} duration={args.duration}s (client and Blocky fixtures are static)")
+    print(f"{'section':<14} {'fixed s':>8} {'fixed n':>8} {'adapt s':>8} {'adapt n':>8} {'interval':>9}")
+    fixed, adaptive = reports['fixed']['sections'], reports['adaptive']['sections']
+    for name in fixed:
+        print(f"{name:<14} {fixed[name]['cpu_seconds']:>8.3f} {fixed[name]['refreshes']:>8} "
+              f"{adaptive[name]['cpu_seconds']:>8.3f} {adaptive[name]['refreshes']:>8} "
+              f"{adaptive[name]['interval']:>9.1f}")
+    spent = reports['fixed']['cpu_seconds'], reports['adaptive']['cpu_seconds']
+    print(f"collection CPU: fixed {spent[0]:.3f}s, adaptive {spent[1]:.3f}s; adaptive run estimates "
+          f"{reports['adaptive']['cpu_saved_seconds']:.3f}s saved ({reports['adaptive']['cpu_saved_percent']}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Router dashboard benchmarks')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    load = subparsers.add_parser('load', help='Concurrent dashboard clients against a stub VictoriaMetrics')
+    load.add_argument('--server', choices=['threaded', 'single'], default='threaded',
+                      help='Serving mode to measure (single = plain HTTPServer baseline)')
+    load.add_argument('--collection', choices=['background', 'on-demand'], default='background',
+                      help='Metrics collection mode to measure')
+    load.add_argument('--clients', type=int, default=20, help='Concurrent dashboard clients')
+    load.add_argument('--duration', type=float, default=10, help='Seconds to run')
+    load.add_argument('--interval', type=float, default=0.5, help='Seconds between polls per client')
+    load.add_argument('--workers', type=int, default=8, help='Dashboard worker threads')
+    load.add_argument('--vm-clients', type=int, default=30, help='Clients reported by the stub')
+    load.add_argument('--vm-delay', type=float, default=0.005, help='Stub latency for instant queries')
+    load.add_argument('--vm-range-delay', type=float, default=2.0, help='Stub latency for range queries')
+    load.set_defaults(func=run_load)
+
+    vm_client = subparsers.add_parser('vm-client', help='VictoriaMetrics client microbenchmark')
+    vm_client.add_argument('--repeat', type=int, default=200, help='Calls per case')
+    vm_client.add_argument('--burst', type=int, default=20, help='Concurrent callers in the burst case')
+    vm_client.add_argument('--vm-delay', type=float, default=0.002, help='Stub latency per query')
+    vm_client.set_defaults(func=run_vm_client)
+
+    refresh = subparsers.add_parser('refresh', help='Address and connectivity refresh: fork/exec vs netlink/ICMP')
+    refresh.add_argument('--repeat', type=int, default=50, help='Calls per case')
+    refresh.add_argument('--targets', default='127.0.0.1,127.0.0.2,127.0.0.3',
+                         help='Comma-separated hosts to probe (default: loopback, so replies arrive)')
+    refresh.set_defaults(func=run_refresh)
+
+    histories = subparsers.add_parser('histories', help='Client history fetch and series processing')
+    histories.add_argument('--clients', type=int, default=50, help='Client IPs per request')
+    histories.add_argument('--durations', default='10m,1h,24h,7d,30d', help='Comma-separated durations')
+    histories.add_argument('--repeat', type=int, default=20, help='Calls per duration')
+    histories.set_defaults(func=run_histories)
+
+    replay = subparsers.add_parser('replay', help='Per-endpoint latency and allocations from fixtures')
+    replay.add_argument('--clients', default='10,100,1000',
+                        help='Comma-separated client counts to generate fixtures for')
+    replay.add_argument('--fixtures', help='Replay a directory written by `record` instead')
+    replay.add_argument('--duration', default='24h', help='History window for the histories cases')
+    replay.add_argument('--repeat', type=int, default=20, help='Calls per case')
+    replay.add_argument('--warm', action='store_true', help="Don't clear the caches between calls")
+    replay.add_argument('--vm-latency', type=float, default=0.0, help='Seconds added per VictoriaMetrics round-trip')
+    replay.add_argument('--json', help='Write the results to this file')
+    replay.add_argument('--baseline', help='Fail if results regress against this --json file')
+    replay.add_argument('--tolerance', type=float, default=1.5, help='Allowed ratio over the baseline')
+    replay.add_argument('--compare', default=','.join(COMPARED),
+                        help=f"Comma-separated results to compare with the baseline: {', '.join(COMPARED)}")
+    replay.set_defaults(func=run_replay)
+
+    scheduler = subparsers.add_parser('scheduler', help='Collection CPU with fixed and adaptive intervals')
+    scheduler.add_argument('--clients', type=int, default=100, help='Clients in the generated fixture')
+    scheduler.add_argument('--duration', type=float, default=120, help='Seconds to run each mode')
+    scheduler.add_argument('--vm-latency', type=float, default=0.002, help='Seconds per VictoriaMetrics round-trip')
+    scheduler.set_defaults(func=run_scheduler)
+
+    record = subparsers.add_parser('record', help='Record replay fixtures on the router')
+    record.add_argument('--fixtures', required=True, help='Directory to write')
+    record.add_argument('--victoriametrics-url', default='http://localhost:8428')
+    record.add_argument('--durations', default='10m,24h', help='History windows to record')
+    record.set_defaults(func=run_record)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,1286 @@
+// Global metrics store to avoid duplicate API calls
+let metricsStore = {
+    data: null,
+    subscribers: [],
+
+    subscribe(callback) {
+        this.subscribers.push(callback);
+    },
+
+    update(data) {
+        this.data = data;
+        this.subscribers.forEach(callback => callback(data));
+    }
+};
+
+// Chart instances stored outside of Alpine's reactive scope to prevent conflicts
+const chartInstances = {};
+
+// Alpine.js components
+document.addEventListener('alpine:init', () => {
+    // Stats component for top cards
+    Alpine.data('statsApp', () => ({
+        loading: true,
+        stats: {
+            connectivity: {
+                status: null,
+                status_text: '--',
+                ping: '-- ms avg'
+            },
+            uptime: '--',
+            cpu: {
+                load: '--',
+                info: '-- cores'
+            },
+            memory: {
+                percent: '--%',
+                info: '--'
+            },
+            clientCount: '--'
+        },
+
+        init() {
+            // Subscribe to metrics updates
+            metricsStore.subscribe((data) => {
+                this.updateStats(data);
+            });
+        },
+
+        updateStats(data) {
+            this.loading = false;
+
+            // Update connectivity
+            if (data.connectivity) {
+                this.stats.connectivity.status = data.connectivity.status;
+                this.stats.connectivity.status_text = data.connectivity.status_text || 'Unknown';
+                this.stats.connectivity.ping = data.connectivity.avg_response_time !== null 
+                    ? `${data.connectivity.avg_response_time} ms avg` 
+                    : 'No response';
+            }
+
+            // Update uptime
+            if (data.uptime) {
+                this.stats.uptime = data.uptime.formatted || '--';
+            }
+
+            // Update CPU
+            if (data.cpu) {
+                this.stats.cpu.load = data.cpu.load_1 ? data.cpu.load_1.toFixed(2) : '--';
+                this.stats.cpu.info = `${data.cpu.cores || '--'} cores | ${data.cpu.usage_percent || '--'}% usage`;
+            }
+
+            // Update memory
+            if (data.memory) {
+                this.stats.memory.percent = `${data.memory.percent || '--'}%`;
+                if (data.memory.formatted) {
+                    this.stats.memory.info = `${data.memory.formatted.used} / ${data.memory.formatted.total}`;
+                }
+            }
+
+            // Update client count
+            if (data.clients) {
+                this.stats.clientCount = data.clients.count || 0;
+            }
+        },
+
+        getConnectivityClasses() {
+            const status = this.stats.connectivity.status;
+            if (this.loading) return 'from-cyan-400 to-blue-500 animate-pulse';
+
+            switch(status) {
+                case 'online':
+                    return 'from-green-400 to-emerald-500';
+                case 'offline':
+                    return 'from-red-400 to-rose-500';
+                case 'partial':
+                    return 'from-amber-400 to-yellow-500';
+                default:
+                    return 'from-cyan-400 to-blue-500';
+            }
+        },
+
+        getCpuLoadClasses() {
+            if (this.loading) return 'from-cyan-400 to-blue-500 animate-pulse';
+
+            const load = parseFloat(this.stats.cpu.load);
+            if (isNaN(load)) return 'from-cyan-400 to-blue-500';
+
+            // Assuming 4 cores average, adjust thresholds
+            if (load > 8) return 'from-red-400 to-rose-500';
+            if (load > 4) return 'from-amber-400 to-yellow-500';
+            if (load > 2) return 'from-cyan-400 to-blue-500';
+            return 'from-green-400 to-emerald-500';
+        },
+
+        getMemoryClasses() {
+            if (this.loading) return 'from-cyan-400 to-blue-500 animate-pulse';
+
+            const percent = parseFloat(this.stats.memory.percent);
+            if (isNaN(percent)) return 'from-cyan-400 to-blue-500';
+
+            if (percent > 90) return 'from-red-400 to-rose-500';
+            if (percent > 75) return 'from-amber-400 to-yellow-500';
+            if (percent > 50) return 'from-cyan-400 to-blue-500';
+            return 'from-green-400 to-emerald-500';
+        }
+    }));
+
+    // Network component
+    Alpine.data('networkApp', () => ({
+        loading: true,
+        network: {
+            wanIp: '--',
+            lanNetwork: '--',
+            interfaces: {
+                brLan: {
+                    rx: 'RX: --',
+                    tx: 'TX: --'
+                },
+                tailscale: {
+                    rx: 'RX: --',
+                    tx: 'TX: --'
+                }
+            }
+        },
+
+        init() {
+            // Subscribe to metrics updates
+            metricsStore.subscribe((data) => {
+                this.updateNetwork(data);
+            });
+        },
+
+        updateNetwork(data) {
+            this.loading = false;
+
+            if (data.network) {
+                // Update WAN IP
+                this.network.wanIp = data.network.wan_ip || 'unknown';
+
+                // Update LAN Network
+                if (data.network.lan_network) {
+                    this.network.lanNetwork = data.network.lan_network.cidr || '10.1.1.0/24';
+                }
+
+                // Update interface stats
+                if (data.network.interfaces) {
+                    if (data.network.interfaces['br-lan']) {
+                        const stats = data.network.interfaces['br-lan'];
+                        this.network.interfaces.brLan.rx = `RX: ${stats.formatted.rx}`;
+                        this.network.interfaces.brLan.tx = `TX: ${stats.formatted.tx}`;
+                    }
+
+                    if (data.network.interfaces.tailscale0) {
+                        const stats = data.network.interfaces.tailscale0;
+                        this.network.interfaces.tailscale.rx = `RX: ${stats.formatted.rx}`;
+                        this.network.interfaces.tailscale.tx = `TX: ${stats.formatted.tx}`;
+                    }
+                }
+            }
+        }
+    }));
+
+    // Clients component
+    Alpine.data('clientsApp', () => ({
+        clients: [],  // Pages loaded so far, sorted and filtered by the server
+        count: 0,  // Clients matching the filter
+        total: 0,  // All connected clients
+        nextCursor: null,
+        pageSize: 50,
+        stateFilter: '',
+        loadingMore: false,
+        refreshing: false,
+        sortField: 'bandwidth',
+        sortDirection: 'desc',
+        expandedGraphs: {},
+        // charts: {}, // Removed - now using external chartInstances
+        allGraphsExpanded: false,
+        loadingGraphs: {},
+        updateInterval: null,  // Store interval ID for cleanup
+        useUnifiedScale: true,  // Use same scale for all charts
+        unifiedMaxValue: 0,  // Maximum value across all charts
+        timeRange: '10m',  // Default time range for charts
+        availableTimeRanges: [
+            { value: '5m', label: '5 min' },
+            { value: '10m', label: '10 min' },
+            { value: '30m', label: '30 min' },
+            { value: '1h', label: '1 hour' },
+            { value: '3h', label: '3 hours' },
+            { value: '6h', label: '6 hours' },
+            { value: '12h', label: '12 hours' },
+            { value: '24h', label: '24 hours' },
+            { value: '48h', label: '2 days' },
+            { value: '72h', label: '3 days' },
+            { value: '168h', label: '1 week' }
+        ],
+
+        init() {
+            // Re-read the loaded pages whenever the clients section changes
+            // (other sections' updates arrive as fresh copies too, so compare content)
+            let lastClients = null;
+            metricsStore.subscribe((data) => {
+                const clients = JSON.stringify(data.clients || null);
+                if (data.clients && clients !== lastClients) {
+                    lastClients = clients;
+                    this.refresh();
+                }
+            });
+
+            // Set up periodic chart updates (every 5 seconds)
+            this.updateInterval = setInterval(() => {
+                this.updateAllCharts();
+            }, 5000);
+
+            // Cleanup on component destroy
+            this.$watch('$destroy', () => {
+                if (this.updateInterval) {
+                    clearInterval(this.updateInterval);
+                }
+                // Destroy all charts
+                Object.keys(chartInstances).forEach(ip => {
+                    if (chartInstances[ip]) {
+                        try {
+                            chartInstances[ip].destroy();
+                        } catch (e) {
+                            console.warn(`Error destroying chart for ${ip}:`, e);
+                        }
+                        delete chartInstances[ip];
+                    }
+                });
+            });
+        },
+
+        calculateUnifiedScale(allHistories) {
+            // Calculate the maximum value across all charts
+            let maxValue = 0;
+
+            for (const history of Object.values(allHistories)) {
+                if (!history || history.error) continue;
+
+                // Find max in rx data
+                if (history.rx && Array.isArray(history.rx)) {
+                    const maxRx = Math.max(...history.rx.filter(v => !isNaN(v)));
+                    if (!isNaN(maxRx)) maxValue = Math.max(maxValue, maxRx);
+                }
+
+                // Find max in tx data
+                if (history.tx && Array.isArray(history.tx)) {
+                    const maxTx = Math.max(...history.tx.filter(v => !isNaN(v)));
+                    if (!isNaN(maxTx)) maxValue = Math.max(maxValue, maxTx);
+                }
+            }
+
+            // Add 10% padding to the top
+            this.unifiedMaxValue = maxValue * 1.1;
+
+            // Round up to nice values for better readability
+            if (this.unifiedMaxValue > 1000000000) {
+                // Round up to nearest 100 Mbps for Gbps range
+                this.unifiedMaxValue = Math.ceil(this.unifiedMaxValue / 100000000) * 100000000;
+            } else if (this.unifiedMaxValue > 1000000) {
+                // Round up to nearest 10 Mbps for Mbps range
+                this.unifiedMaxValue = Math.ceil(this.unifiedMaxValue / 10000000) * 10000000;
+            } else if (this.unifiedMaxValue > 1000) {
+                // Round up to nearest 100 Kbps for Kbps range
+                this.unifiedMaxValue = Math.ceil(this.unifiedMaxValue / 100000) * 100000;
+            }
+
+            console.log(`[SCALE] Unified max value: ${formatBandwidth(this.unifiedMaxValue)}`);
+        },
+
+        updateChartScale(chart) {
+            // Update chart's y-axis scale
+            if (this.useUnifiedScale && this.unifiedMaxValue > 0) {
+                chart.options.scales.y.max = this.unifiedMaxValue;
+                chart.options.scales.y.min = 0;
+            } else {
+                // Auto scale
+                delete chart.options.scales.y.max;
+                delete chart.options.scales.y.min;
+            }
+        },
+
+        async updateAllCharts() {
+            // Update all visible charts with latest data
+            const expandedIps = Object.keys(this.expandedGraphs).filter(ip => this.expandedGraphs[ip]);
+
+            if (expandedIps.length === 0) return;
+
+            try {
+                // Batch fetch only the histories we need with time range
+                const response = await fetchHistories(expandedIps.join(','), this.timeRange);
+                if (!response.ok) {
+                    console.error('Failed to fetch batch histories');
+                    return;
+                }
+
+                const allHistories = await response.json();
+
+                // Calculate unified scale if enabled
+                if (this.useUnifiedScale) {
+                    this.calculateUnifiedScale(allHistories);
+                }
+
+                // Update each chart with its data
+                for (const ip of expandedIps) {
+                    const history = allHistories[ip];
+                    if (!history || history.error) continue;
+
+                    const chart = chartInstances[ip];
+                    if (!chart || chart._destroyed) continue;
+
+                    // Clear existing data
+                    chart.data.labels.length = 0;
+                    chart.data.datasets[0].data.length = 0;
+                    chart.data.datasets[1].data.length = 0;
+
+                    // Add new data
+                    chart.data.labels.push(...history.labels);
+                    chart.data.datasets[0].data.push(...history.rx);
+                    chart.data.datasets[1].data.push(...history.tx);
+
+                    // Update scale if unified
+                    this.updateChartScale(chart);
+
+                    // Update chart without animation for smooth updates
+                    chart.update('none');
+                }
+            } catch (error) {
+                console.error('Error updating charts:', error);
+                // Fallback to individual updates
+                for (const ip of expandedIps) {
+                    if (chartInstances[ip] && !chartInstances[ip]._destroyed) {
+                        await this.updateChartData(ip);
+                    }
+                }
+            }
+        },
+
+        async updateChartData(ip) {
+            // Update chart with latest data without recreating it
+            try {
+                const response = await fetchHistories(ip, this.timeRange);
+                if (!response.ok) return;
+
+                const histories = await response.json();
+                const history = histories[ip];
+                if (!history || history.error) return;
+
+                const chart = chartInstances[ip];
+                if (!chart || chart._destroyed) return;
+
+                // Clear existing data
+                chart.data.labels.length = 0;
+                chart.data.datasets[0].data.length = 0;
+                chart.data.datasets[1].data.length = 0;
+
+                // Add new data
+                chart.data.labels.push(...history.labels);
+                chart.data.datasets[0].data.push(...history.rx);
+                chart.data.datasets[1].data.push(...history.tx);
+
+                // Update chart without animation for smooth updates
+                chart.update('none');
+            } catch (error) {
+                console.error(`Error updating chart for ${ip}:`, error);
+            }
+        },
+
+        async refreshChart(ip) {
+            console.log(`[REFRESH] Manual refresh requested for IP: ${ip}`);
+
+            try {
+                // Fetch fresh data using batch endpoint with time range
+                const response = await fetchHistories(ip, this.timeRange);
+                if (!response.ok) {
+                    console.error('Failed to refresh chart for IP:', ip);
+                    return;
+                }
+
+                const histories = await response.json();
+                const history = histories[ip];
+                if (!history || history.error) {
+                    console.error('No valid history data for IP:', ip);
+                    return;
+                }
+
+                if (chartInstances[ip] && !chartInstances[ip]._destroyed) {
+                    // Update existing chart
+                    const chart = chartInstances[ip];
+
+                    // Clear and update data
+                    chart.data.labels.length = 0;
+                    chart.data.datasets[0].data.length = 0;
+                    chart.data.datasets[1].data.length = 0;
+
+                    chart.data.labels.push(...history.labels);
+                    chart.data.datasets[0].data.push(...history.rx);
+                    chart.data.datasets[1].data.push(...history.tx);
+
+                    // Force update with animation for manual refresh
+                    chart.update();
+                } else {
+                    // Chart doesn't exist, create it
+                    this.fetchAndCreateChart(ip);
+                }
+            } catch (error) {
+                console.error('Error refreshing chart for IP:', ip, error);
+            }
+        },
+
+        toggleClientGraph(ip) {
+            console.log(`[TOGGLE] Toggling graph for IP: ${ip}, current state: ${this.expandedGraphs[ip]}`);
+            this.expandedGraphs[ip] = !this.expandedGraphs[ip];
+
+            if (this.expandedGraphs[ip]) {
+                console.log(`[TOGGLE] Expanding graph for IP: ${ip}`);
+                // Use Alpine's nextTick to ensure DOM is ready
+                this.$nextTick(() => {
+                    // Additional delay for transition to complete
+                    setTimeout(() => {
+                        console.log(`[TOGGLE] Creating chart for IP: ${ip}`);
+                        this.fetchAndCreateChart(ip);
+                    }, 100);
+                });
+            } else if (chartInstances[ip]) {
+                console.log(`[TOGGLE] Collapsing graph for IP: ${ip}, destroying chart`);
+                // Destroy chart when closing
+                try {
+                    chartInstances[ip].destroy();
+                    console.log(`[TOGGLE] Successfully destroyed chart for IP: ${ip}`);
+                } catch (e) {
+                    console.warn(`[TOGGLE] Error destroying chart for IP: ${ip}:`, e);
+                }
+                delete chartInstances[ip];
+                delete this.loadingGraphs[ip];
+            }
+        },
+
+        createChartFromData(ip, history) {
+            const canvasId = 'bandwidth-chart-' + ip.replace(/\./g, '-');
+            const canvas = document.getElementById(canvasId);
+            console.log(`[CREATE] Creating chart for IP: ${ip}, canvas: ${canvasId}, exists: ${!!canvas}`);
+
+            if (!canvas) {
+                console.error(`[CREATE] Canvas not found for IP: ${ip}, ID: ${canvasId}`);
+                return;
+            }
+
+            // Destroy existing chart if any
+            if (chartInstances[ip]) {
+                console.log(`[CREATE] Destroying existing chart for IP: ${ip} before creating new one`);
+                chartInstances[ip].destroy();
+                delete chartInstances[ip];
+            }
+
+            // Calculate scale for this chart if unified scale is enabled
+            const scaleOptions = {};
+            if (this.useUnifiedScale && this.unifiedMaxValue > 0) {
+                scaleOptions.max = this.unifiedMaxValue;
+                scaleOptions.min = 0;
+            }
+
+            // Create new chart with provided data
+            try {
+                chartInstances[ip] = new Chart(canvas, {
+                type: 'line',
+                data: {
+                    labels: history.labels,
+                    datasets: [
+                        {
+                            label: 'Download',
+                            data: history.rx,
+                            borderColor: 'rgb(34, 211, 238)',
+                            backgroundColor: 'rgba(34, 211, 238, 0.1)',
+                            borderWidth: 2,
+                            tension: 0.4,
+                            fill: true
+                        },
+                        {
+                            label: 'Upload',
+                            data: history.tx,
+                            borderColor: 'rgb(52, 211, 153)',
+                            backgroundColor: 'rgba(52, 211, 153, 0.1)',
+                            borderWidth: 2,
+                            tension: 0.4,
+                            fill: true
+                        }
+                    ]
+                },
+                options: {
+                    responsive: true,
+                    maintainAspectRatio: false,
+                    interaction: {
+                        intersect: false,
+                        mode: 'index'
+                    },
+                    plugins: {
+                        legend: {
+                            display: true,
+                            position: 'top',
+                            labels: {
+                                color: '#9CA3AF',
+                                font: {
+                                    size: 11
+                                },
+                                boxWidth: 12,
+                                boxHeight: 12
+                            }
+                        },
+                        tooltip: {
+                            callbacks: {
+                                label: function(context) {
+                                    let label = context.dataset.label || '';
+                                    if (label) {
+                                        label += ': ';
+                                    }
+                                    label += formatBandwidth(context.parsed.y);
+                                    return label;
+                                }
+                            }
+                        }
+                    },
+                    scales: {
+                        x: {
+                            display: true,
+                            grid: {
+                                color: 'rgba(255, 255, 255, 0.05)',
+                                drawBorder: false
+                            },
+                            ticks: {
+                                color: '#6B7280',
+                                font: {
+                                    size: 10
+                                },
+                                maxRotation: 0,
+                                autoSkip: true,
+                                maxTicksLimit: 8
+                            }
+                        },
+                        y: {
+                            display: true,
+                            grid: {
+                                color: 'rgba(255, 255, 255, 0.05)',
+                                drawBorder: false
+                            },
+                            ticks: {
+                                color: '#6B7280',
+                                font: {
+                                    size: 10
+                                },
+                                callback: function(value) {
+                                    return formatBandwidth(value);
+                                }
+                            },
+                            ...scaleOptions  // Apply unified scale if set
+                        }
+                    }
+                }
+            });
+                console.log(`[CREATE] Successfully created chart for IP: ${ip}`);
+            } catch (error) {
+                console.error(`[CREATE] Failed to create chart for IP: ${ip}:`, error);
+                delete chartInstances[ip];
+            }
+        },
+
+        async fetchAndCreateChart(ip) {
+            const canvasId = 'bandwidth-chart-' + ip.replace(/\./g, '-');
+            const canvas = document.getElementById(canvasId);
+            console.log(`[FETCH_CREATE] Starting chart creation for IP: ${ip}, canvas: ${canvasId}`);
+
+            if (!canvas) {
+                console.error(`[FETCH_CREATE] Canvas not found for IP: ${ip}, ID: ${canvasId}`);
+                return;
+            }
+
+            // Mark as just created to skip immediate updates
+            this.justCreatedCharts = this.justCreatedCharts || {};
+            this.justCreatedCharts[ip] = true;
+            setTimeout(() => {
+                delete this.justCreatedCharts[ip];
+                console.log(`[FETCH_CREATE] Chart for ${ip} is now ready for updates`);
+            }, 5000); // Wait 5 seconds before allowing updates
+
+            // Show loading state
+            this.loadingGraphs[ip] = true;
+
+            try {
+                // If unified scale is enabled and we need to calculate it
+                let ips = ip;
+                if (this.useUnifiedScale) {
+                    // Get all expanded IPs to calculate unified scale
+                    const expandedIps = Object.keys(this.expandedGraphs).filter(ip => this.expandedGraphs[ip]);
+                    if (expandedIps.length > 0) {
+                        ips = expandedIps.join(',');
+                    }
+                }
+
+                // Fetch history from server with time range
+                const response = await fetchHistories(ips, this.timeRange);
+
+                // Check if response is OK
+                if (!response.ok) {
+                    console.error('Failed to fetch history for IP:', ip, 'Status:', response.status);
+                    this.loadingGraphs[ip] = false;
+                    return;
+                }
+
+                const histories = await response.json();
+
+                // Calculate unified scale if needed
+                if (this.useUnifiedScale && Object.keys(histories).length > 0) {
+                    this.calculateUnifiedScale(histories);
+                }
+
+                const history = histories[ip];
+
+                if (!history || history.error) {
+                    console.error('Error fetching history for IP:', ip, history?.error || 'No data');
+                    this.loadingGraphs[ip] = false;
+                    return;
+                }
+
+                // Destroy existing chart if any
+                if (chartInstances[ip]) {
+                    chartInstances[ip].destroy();
+                    delete chartInstances[ip];
+                }
+
+                // Create new chart with server data
+                chartInstances[ip] = new Chart(canvas, {
+                    type: 'line',
+                    data: {
+                        labels: history.labels,
+                        datasets: [
+                            {
+                                label: 'Download',
+                                data: history.rx,
+                                borderColor: 'rgb(34, 211, 238)',
+                                backgroundColor: 'rgba(34, 211, 238, 0.1)',
+                                borderWidth: 2,
+                                tension: 0.4,
+                                fill: true
+                            },
+                            {
+                                label: 'Upload',
+                                data: history.tx,
+                                borderColor: 'rgb(52, 211, 153)',
+                                backgroundColor: 'rgba(52, 211, 153, 0.1)',
+                                borderWidth: 2,
+                                tension: 0.4,
+                                fill: true
+                            }
+                        ]
+                    },
+                options: {
+                    responsive: true,
+                    maintainAspectRatio: false,
+                    interaction: {
+                        intersect: false,
+                        mode: 'index'
+                    },
+                    plugins: {
+                        legend: {
+                            display: true,
+                            position: 'top',
+                            labels: {
+                                color: '#9CA3AF',
+                                font: {
+                                    size: 11
+                                },
+                                boxWidth: 12,
+                                boxHeight: 12
+                            }
+                        },
+                        tooltip: {
+                            callbacks: {
+                                label: function(context) {
+                                    let label = context.dataset.label || '';
+                                    if (label) {
+                                        label += ': ';
+                                    }
+                                    label += formatBandwidth(context.parsed.y);
+                                    return label;
+                                }
+                            }
+                        }
+                    },
+                    scales: {
+                        x: {
+                            display: true,
+                            grid: {
+                                color: 'rgba(255, 255, 255, 0.05)',
+                                drawBorder: false
+                            },
+                            ticks: {
+                                color: '#6B7280',
+                                font: {
+                                    size: 10
+                                },
+                                maxRotation: 0,
+                                autoSkip: true,
+                                maxTicksLimit: 8
+                            }
+                        },
+                        y: {
+                            display: true,
+                            grid: {
+                                color: 'rgba(255, 255, 255, 0.05)',
+                                drawBorder: false
+                            },
+                            ticks: {
+                                color: '#6B7280',
+                                font: {
+                                    size: 10
+                                },
+                                callback: function(value) {
+                                    return formatBandwidth(value);
+                                }
+                            },
+                            ...scaleOptions  // Apply unified scale if set
+                        }
+                        }
+                    }
+                });
+
+                this.loadingGraphs[ip] = false;
+
+            } catch (error) {
+                console.error('Error creating chart for IP:', ip, error);
+                this.loadingGraphs[ip] = false;
+            }
+        },
+
+        async toggleAllGraphs() {
+            this.allGraphsExpanded = !this.allGraphsExpanded;
+
+            if (this.allGraphsExpanded) {
+                // Get all client IPs to expand
+                const clientIps = this.clients.map(c => c.ip);
+
+                // Fetch all histories at once for better performance
+                try {
+                    const response = await fetchHistories(clientIps.join(','), this.timeRange);
+                    if (response.ok) {
+                        const allHistories = await response.json();
+
+                        // Calculate unified scale for all charts
+                        if (this.useUnifiedScale) {
+                            this.calculateUnifiedScale(allHistories);
+                        }
+
+                        // Process each client's history
+                        for (const ip of clientIps) {
+                            const history = allHistories[ip];
+                            if (!history || history.error) continue;
+
+                            if (!this.expandedGraphs[ip]) {
+                                this.expandedGraphs[ip] = true;
+
+                                // Wait for DOM to update
+                                await this.$nextTick();
+
+                                // Create chart with fetched data
+                                const canvasId = 'bandwidth-chart-' + ip.replace(/\./g, '-');
+                                const canvas = document.getElementById(canvasId);
+
+                                if (canvas && !chartInstances[ip]) {
+                                    this.createChartFromData(ip, history);
+                                }
+                            }
+                        }
+                    } else {
+                        // Fallback to individual fetching
+                        console.warn('Bulk fetch failed, falling back to individual requests');
+                        this.clients.forEach(client => {
+                            if (!this.expandedGraphs[client.ip]) {
+                                this.toggleClientGraph(client.ip);
+                            }
+                        });
+                    }
+                } catch (error) {
+                    console.error('Error fetching bulk histories:', error);
+                    // Fallback to individual fetching
+                    this.clients.forEach(client => {
+                        if (!this.expandedGraphs[client.ip]) {
+                            this.toggleClientGraph(client.ip);
+                        }
+                    });
+                }
+            } else {
+                // Collapse all graphs
+                Object.keys(this.expandedGraphs).forEach(ip => {
+                    if (this.expandedGraphs[ip]) {
+                        this.expandedGraphs[ip] = false;
+                        if (chartInstances[ip]) {
+                            try {
+                                chartInstances[ip].destroy();
+                            } catch (e) {
+                                console.warn('Error destroying chart:', e);
+                            }
+                            delete chartInstances[ip];
+                            delete this.loadingGraphs[ip];
+                        }
+                    }
+                });
+            }
+        },
+
+        get sortedClients() {
+            // Sorting and filtering happen server-side over the full client list
+            return this.clients;
+        },
+
+        clientsUrl(limit, cursor) {
+            const params = new URLSearchParams({
+                sort: this.sortField,
+                order: this.sortDirection,
+                limit: String(limit)
+            });
+            if (this.stateFilter) params.set('state', this.stateFilter);
+            if (cursor) params.set('cursor', cursor);
+            return `/api/clients?${params}`;
+        },
+
+        async fetchPage(limit, cursor) {
+            const response = await fetch(this.clientsUrl(limit, cursor));
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            return response.json();
+        },
+
+        async refresh() {
+            // Reload as many clients as are shown, so paging survives updates
+            if (this.refreshing) return;
+            this.refreshing = true;
+            try {
+                const page = await this.fetchPage(Math.max(this.pageSize, this.clients.length));
+                this.clients = page.clients;
+                this.count = page.count;
+                this.total = page.total;
+                this.nextCursor = page.next_cursor;
+            } catch (error) {
+                console.error('Error fetching clients:', error);
+            } finally {
+                this.refreshing = false;
+            }
+        },
+
+        reload() {
+            this.clients = [];
+            this.nextCursor = null;
+            this.refresh();
+        },
+
+        async loadMore() {
+            if (!this.nextCursor || this.loadingMore) return;
+            this.loadingMore = true;
+            try {
+                const page = await this.fetchPage(this.pageSize, this.nextCursor);
+                this.clients = this.clients.concat(page.clients);
+                this.count = page.count;
+                this.total = page.total;
+                this.nextCursor = page.next_cursor;
+            } catch (error) {
+                console.error('Error fetching more clients:', error);
+            } finally {
+                this.loadingMore = false;
+            }
+        },
+
+        setSortField(field) {
+            if (this.sortField === field) {
+                // Toggle direction if clicking same field
+                this.sortDirection = this.sortDirection === 'asc' ? 'desc' : 'asc';
+            } else {
+                // New field, set default direction
+                this.sortField = field;
+                this.sortDirection = field === 'bandwidth' ? 'desc' : 'asc';
+            }
+            this.reload();
+        },
+
+        async toggleUnifiedScale() {
+            this.useUnifiedScale = !this.useUnifiedScale;
+
+            // If enabling unified scale, recalculate and update all charts
+            if (this.useUnifiedScale) {
+                const expandedIps = Object.keys(this.expandedGraphs).filter(ip => this.expandedGraphs[ip]);
+                if (expandedIps.length > 0) {
+                    // Fetch all data to calculate unified scale
+                    const response = await fetchHistories(expandedIps.join(','), this.timeRange);
+                    if (response.ok) {
+                        const allHistories = await response.json();
+                        this.calculateUnifiedScale(allHistories);
+
+                        // Update all existing charts with the new scale
+                        for (const ip of expandedIps) {
+                            const chart = chartInstances[ip];
+                            if (chart && !chart._destroyed) {
+                                this.updateChartScale(chart);
+                                chart.update();
+                            }
+                        }
+                    }
+                }
+            } else {
+                // Disable unified scale, let charts auto-scale
+                this.unifiedMaxValue = 0;
+                for (const ip of Object.keys(chartInstances)) {
+                    const chart = chartInstances[ip];
+                    if (chart && !chart._destroyed) {
+                        delete chart.options.scales.y.max;
+                        delete chart.options.scales.y.min;
+                        chart.update();
+                    }
+                }
+            }
+        },
+
+        async onTimeRangeChange() {
+            console.log(`[TIME_RANGE] Changed to: ${this.timeRange}`);
+
+            // Clear and recreate all charts with new time range
+            const expandedIps = Object.keys(this.expandedGraphs).filter(ip => this.expandedGraphs[ip]);
+
+            if (expandedIps.length === 0) return;
+
+            // Show loading state for all charts
+            for (const ip of expandedIps) {
+                this.loadingGraphs[ip] = true;
+            }
+
+            try {
+                // Fetch all data with new time range
+                // Note: The backend automatically adapts data sampling based on duration
+                // - Short durations (<=1h): 30s-2m resolution, detailed time labels
+                // - Medium durations (1h-24h): 2m-30m resolution, hour:minute labels  
+                // - Long durations (>24h): 1h-6h resolution, date labels
+                // This keeps graphs responsive while showing appropriate detail level
+                const response = await fetchHistories(expandedIps.join(','), this.timeRange);
+                if (!response.ok) {
+                    console.error('Failed to fetch data with new time range');
+                    return;
+                }
+
+                const allHistories = await response.json();
+
+                // Calculate unified scale if enabled
+                if (this.useUnifiedScale) {
+                    this.calculateUnifiedScale(allHistories);
+                }
+
+                // Update all charts with new data
+                for (const ip of expandedIps) {
+                    const history = allHistories[ip];
+                    if (!history || history.error) {
+                        this.loadingGraphs[ip] = false;
+                        continue;
+                    }
+
+                    // Recreate chart with new data
+                    if (chartInstances[ip]) {
+                        chartInstances[ip].destroy();
+                        delete chartInstances[ip];
+                    }
+
+                    this.createChartFromData(ip, history);
+                    this.loadingGraphs[ip] = false;
+                }
+            } catch (error) {
+                console.error('Error changing time range:', error);
+                for (const ip of expandedIps) {
+                    this.loadingGraphs[ip] = false;
+                }
+            }
+        },
+
+        getClientName(client) {
+            return client.hostname && client.hostname !== 'unknown' 
+                ? client.hostname 
+                : client.mac.substring(0, 8).toUpperCase();
+        }
+    }));
+
+    // DNS Statistics component
+    Alpine.data('dnsApp', () => ({
+        loading: true,
+        stats: {
+            totalQueries: 0,
+            blockedQueries: 0,
+            blockedPercent: '--%',
+            queriesRate: '-- q/min',
+            cacheHitRate: '--%',
+            topClients: [],
+            blockingLists: {}
+        },
+
+        init() {
+            // Subscribe to metrics updates
+            metricsStore.subscribe((data) => {
+                this.updateStats(data);
+            });
+        },
+
+        updateStats(data) {
+            this.loading = false;
+
+            if (data.blocky && data.blocky.enabled) {
+                this.stats.totalQueries = data.blocky.total_queries || 0;
+                this.stats.blockedQueries = data.blocky.blocked_queries || 0;
+                this.stats.blockedPercent = `${data.blocky.block_percentage || 0}%`;
+                this.stats.queriesRate = `${data.blocky.queries_per_minute || 0} q/min`;
+                this.stats.cacheHitRate = `${data.blocky.cache_hit_rate || 0}%`;
+                this.stats.topClients = data.blocky.top_clients || [];
+                this.stats.blockingLists = data.blocky.blocking_lists || {};
+            }
+        },
+
+        formatNumber(num) {
+            if (num === undefined || num === null) return '--';
+            if (num >= 1000000) return `${(num / 1000000).toFixed(1)}M`;
+            if (num >= 1000) return `${(num / 1000).toFixed(1)}K`;
+            return num.toLocaleString();
+        },
+
+        getBlockedGradient() {
+            if (this.loading) return 'from-cyan-400 to-blue-500 animate-pulse';
+
+            const percent = parseFloat(this.stats.blockedPercent);
+            if (isNaN(percent)) return 'from-cyan-400 to-blue-500';
+
+            if (percent > 50) return 'from-red-400 to-rose-500';
+            if (percent > 30) return 'from-amber-400 to-yellow-500';
+            if (percent > 10) return 'from-cyan-400 to-blue-500';
+            return 'from-green-400 to-emerald-500';
+        },
+
+        getCacheGradient() {
+            if (this.loading) return 'from-cyan-400 to-blue-500 animate-pulse';
+
+            const percent = parseFloat(this.stats.cacheHitRate);
+            if (isNaN(percent)) return 'from-cyan-400 to-blue-500';
+
+            if (percent > 80) return 'from-green-400 to-emerald-500';
+            if (percent > 60) return 'from-cyan-400 to-blue-500';
+            if (percent > 40) return 'from-amber-400 to-yellow-500';
+            return 'from-red-400 to-rose-500';
+        }
+    }));
+
+    // Services component
+    Alpine.data('servicesApp', () => ({
+        services: [
+            {
+                name: 'Metrics',
+                icon: 'lni-stats-up',
+                url: '/grafana/d/router-metrics/router-metrics?kiosk&theme=sapphire-dusk'
+            },
+            {
+                name: 'Grafana',
+                icon: 'lni-bar-chart',
+                url: '/grafana'
+            },
+            {
+                name: 'VictoriaMetrics',
+                icon: 'lni-database',
+                url: '/victoriametrics'
+            },
+            {
+                name: 'Alertmanager',
+                icon: 'lni-alarm',
+                url: '/alertmanager'
+            },
+            {
+                name: 'System Logs',
+                icon: 'lni-files',
+                url: '/logs/'
+            },
+            {
+                name: 'VPN Manager',
+                icon: 'lni-shield',
+                url: '/vpn-manager'
+            }
+        ],
+
+        init() {
+            // Services are static, no need to subscribe to updates
+        }
+    }));
+});
+
+// Helper function to format bandwidth for display
+function formatBandwidth(bps) {
+    if (bps < 1000) {
+        return bps.toFixed(0) + ' bps';
+    } else if (bps < 1000000) {
+        return (bps / 1000).toFixed(1) + ' Kbps';
+    } else if (bps < 1000000000) {
+        return (bps / 1000000).toFixed(1) + ' Mbps';
+    } else {
+        return (bps / 1000000000).toFixed(1) + ' Gbps';
+    }
+}
+
+// Binary client histories: one shared timestamp vector plus per-client
+// rx/tx Float32 columns, each word XORed with the previous one
+// (see encode_client_histories in router-dashboard.py)
+const HISTORY_BINARY_TYPE = 'application/vnd.router-dashboard.histories';
+
+function pad2(value) {
+    return String(value).padStart(2, '0');
+}
+
+// Same formats the server uses for JSON labels, in browser local time
+function formatHistoryLabel(timestamp, duration) {
+    const date = new Date(timestamp * 1000);
+    const time = `${pad2(date.getHours())}:${pad2(date.getMinutes())}`;
+    const day = `${pad2(date.getMonth() + 1)}/${pad2(date.getDate())}`;
+    if (duration <= 3600) {
+        return `${time}:${pad2(date.getSeconds())}`;
+    } else if (duration <= 86400) {
+        return time;
+    } else if (duration <= 604800) {
+        return `${day} ${time}`;
+    }
+    return day;
+}
+
+function decodeHistories(buffer) {
+    const view = new DataView(buffer);
+    const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+    if (magic !== 'RDH1') {
+        throw new Error(`Unexpected client histories format ${magic}`);
+    }
+    const headerLength = view.getUint32(4, true);
+    const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 8, headerLength)));
+    const points = header.points;
+    let offset = 8 + headerLength;
+
+    const timestamps = new Float64Array(buffer, offset, points);
+    offset += points * 8;
+    const labels = Array.from(timestamps, timestamp => formatHistoryLabel(timestamp, header.duration));
+
+    const column = () => {
+        const words = new Uint32Array(buffer, offset, points);
+        offset += points * 4;
+        const bits = new Uint32Array(points);
+        let previous = 0;
+        for (let i = 0; i < points; i++) {
+            previous = (previous ^ words[i]) >>> 0;
+            bits[i] = previous;
+        }
+        return Array.from(new Float32Array(bits.buffer));
+    };
+
+    const histories = {};
+    for (const ip of header.ips) {
+        const rx = column();
+        const tx = column();
+        histories[ip] = {ip, labels, rx, tx};
+    }
+    return histories;
+}
+
+// Fetch /api/client-histories in the binary format, falling back to JSON
+// when the server answers with it. Resolves to a Response-like object, so
+// callers keep using ok/status/json().
+async function fetchHistories(ips, duration) {
+    const params = new URLSearchParams({ips, duration});
+    const response = await fetch(`/api/client-histories?${params}`, {
+        headers: {Accept: `${HISTORY_BINARY_TYPE}, application/json;q=0.9`}
+    });
+    if (!response.ok || !(response.headers.get('Content-Type') || '').startsWith(HISTORY_BINARY_TYPE)) {
+        return response;
+    }
+    const histories = decodeHistories(await response.arrayBuffer());
+    return {ok: true, status: response.status, json: async () => histories};
+}
+
+// Function to fetch and update metrics (for non-Alpine parts)
+async function updateMetrics() {
+    const startTime = Date.now();
+
+    try {
+        const response = await fetch('/api/metrics');
+        const fetchTime = Date.now() - startTime;
+
+        if (!response.ok) {
+            throw new Error('Failed to fetch metrics');
+        }
+
+        const data = await response.json();
+
+        // Update the shared store for Alpine components
+        metricsStore.update(data);
+
+    } catch (error) {
+        console.error('Error fetching metrics:', error);
+        // On error, remove loading class but show error state
+        document.querySelectorAll('.loading').forEach(el => {
+            el.classList.remove('loading');
+            if (!el.textContent || el.textContent === '--') {
+                el.textContent = 'N/A';
+            }
+        });
+    }
+}
+
+// Function to continuously update metrics with delay after completion
+async function updateMetricsContinuously() {
+    await updateMetrics();
+    // Wait 5 seconds after the request completes before starting the next one
+    setTimeout(updateMetricsContinuously, 5000);
+}
+
+// Apply an RFC 6902 patch (as produced by the server) to a document
+function applyPatch(doc, ops) {
+    for (const op of ops) {
+        const tokens = op.path.split('/').slice(1).map(t => t.replace(/~1/g, '/').replace(/~0/g, '~'));
+        const key = tokens.pop();
+        let parent = doc;
+        for (const token of tokens) {
+            parent = parent[token];
+        }
+        if (op.op === 'remove') {
+            if (Array.isArray(parent)) {
+                parent.splice(Number(key), 1);
+            } else {
+                delete parent[key];
+            }
+        } else if (key === undefined) {
+            doc = op.value;
+        } else {
+            parent[key] = op.value;
+        }
+    }
+    return doc;
+}
+
+// Receive metrics pushed by the server; returns false if unsupported
+function startMetricsStream() {
+    if (!window.EventSource) return false;
+
+    const source = new EventSource('/api/stream');
+    source.addEventListener('snapshot', (event) => {
+        metricsStore.update(JSON.parse(event.data));
+    });
+    source.addEventListener('patch', (event) => {
+        if (!metricsStore.data) return;
+        // Patch a copy so Alpine sees new objects
+        metricsStore.update(applyPatch(structuredClone(metricsStore.data), JSON.parse(event.data)));
+    });
+    source.onerror = () => {
+        // EventSource retries on its own unless the server refused the stream
+        if (source.readyState === EventSource.CLOSED) {
+            console.warn('Metrics stream unavailable, falling back to polling');
+            updateMetricsContinuously();
+        }
+    };
+    return true;
+}
+
+// Start the update cycle
+if (!startMetricsStream()) {
+    updateMetricsContinuously();
+}
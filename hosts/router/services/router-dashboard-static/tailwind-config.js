@@ -0,0 +1,22 @@
+// Used by the in-browser JIT, and by the Tailwind CLI in router-dashboard.nix
+const tailwindConfig = {
+    darkMode: 'class',
+    theme: {
+        extend: {
+            colors: {
+                gray: {
+                    900: '#0f0f0f',
+                    800: '#1a1a1a',
+                    700: '#2a2a2a',
+                }
+            }
+        }
+    }
+}
+
+if (typeof tailwind !== 'undefined') {
+    tailwind.config = tailwindConfig;
+}
+if (typeof module !== 'undefined') {
+    module.exports = tailwindConfig;
+}
@@ -12,8 +12,13 @@
         python3.pkgs.pyflakes
         python3.pkgs.flake8
         python3.pkgs.pylint
+        # The page is written against Tailwind 3, as the CDN JIT serves it
+        tailwindcss_3
+        esbuild
       ];
       src = ./router-dashboard.py;
+      # The page and its assets, served with content-hashed names
+      static = ./router-dashboard-static;
     } ''
       # Copy the script
       cp $src router-dashboard.py
@@ -43,7 +48,23 @@
 
       # If we get here, the script is valid
       echo "Python validation successful!"
-      cp router-dashboard.py $out
+      mkdir -p $out
+      cp router-dashboard.py $out/
+      cp -r --no-preserve=mode $static $out/router-dashboard-static
+
+      # Lineicons, Chart.js and Alpine still load from their CDN URLs, as
+      # nothing is in vendor/ for them; only the stylesheet is built here
+      cd $out/router-dashboard-static
+      mkdir -p vendor
+
+      # Compile only the utilities the page and script use, replacing the JIT
+      echo "Compiling Tailwind stylesheet..."
+      tailwindcss --config tailwind-config.js --content index.html,dashboard.js \
+        --output vendor/tailwind.css --minify
+
+      # Minify our own script and stylesheet in place
+      esbuild dashboard.js --minify --outfile=dashboard.js --allow-overwrite
+      esbuild dashboard.css --minify --outfile=dashboard.css --allow-overwrite
     '';
 in {
   # Create systemd service for the router dashboard
@@ -54,17 +75,18 @@ in {
 
     # Add required packages to the service's PATH
     path = with pkgs; [
-      iputils # for ping
-      iproute2 # for ip command
+      iputils # for ping, only if ICMP sockets are unavailable
       conntrack-tools # for conntrack
     ];
 
     serviceConfig = {
       Type = "simple";
       # Bind to localhost only since Caddy proxies to it
-      ExecStart = "${pkgs.python3}/bin/python3 -u ${routerDashboardScript} --host localhost --port 8085";
+      ExecStart = "${pkgs.python3}/bin/python3 -u ${routerDashboardScript}/router-dashboard.py --host localhost --port 8085 --state-dir /var/lib/router-dashboard";
       Restart = "always";
       RestartSec = 5;
+      # Client history rollups, kept across restarts
+      StateDirectory = "router-dashboard";
 
       # Security hardening
       DynamicUser = true;
@@ -92,7 +114,7 @@ in {
       # Allow writing hostname cache
       ReadWritePaths = ["/tmp"];
 
-      # Network capabilities for getting interface info
+      # Network capabilities for getting interface info and raw ICMP probes
       AmbientCapabilities = ["CAP_NET_ADMIN" "CAP_NET_RAW"];
       CapabilityBoundingSet = ["CAP_NET_ADMIN" "CAP_NET_RAW"];
     };
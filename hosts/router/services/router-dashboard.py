@@ -1,18 +1,34 @@
 #!/usr/bin/env python3
 
 import argparse
+import asyncio
+import base64
+import bisect
+import csv
+import gzip
+import hashlib
+import heapq
+import inspect
+import ipaddress
 import json
 import logging
+import itertools
+import math
+import mmap
 import os
+import queue
+import random
+import re
 import socket
-import subprocess
+import struct
 import sys
 import time
-import urllib.request
 import urllib.parse
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from typing import Dict, Any, Optional
 
 # Configure logging
@@ -25,1523 +41,1440 @@ logging.basicConfig(
 )
 logger = logging.getLogger('router-dashboard')
 
-# Read the dashboard HTML file
-DASHBOARD_HTML = """
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Router Dashboard</title>
-    <link href="https://cdn.lineicons.com/4.0/lineicons.css" rel="stylesheet" />
-    <script src="https://cdn.tailwindcss.com"></script>
-    <script>
-        tailwind.config = {
-            darkMode: 'class',
-            theme: {
-                extend: {
-                    colors: {
-                        gray: {
-                            900: '#0f0f0f',
-                            800: '#1a1a1a',
-                            700: '#2a2a2a',
-                        }
-                    }
-                }
-            }
-        }
-    </script>
-    <script src="https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.min.js"></script>
-    <script defer src="https://cdn.jsdelivr.net/npm/alpinejs@3.x.x/dist/cdn.min.js"></script>
-    <style>
-        /* Minimal custom styles */
-        body {
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Oxygen, Ubuntu, Cantarell, sans-serif;
-            background: linear-gradient(135deg, #0f0f0f 0%, #1a1a1a 100%);
-        }
-    </style>
-</head>
-<body class="dark min-h-screen text-gray-200 p-5">
-    <div class="max-w-[1400px] w-full mx-auto">
-        <div class="text-center mb-8">
-            <h1 class="text-5xl font-light tracking-tight mb-2 bg-gradient-to-r from-cyan-400 to-blue-500 bg-clip-text text-transparent">Router Dashboard</h1>
-            <p class="text-lg text-gray-400 font-light">Network Services & Monitoring</p>
-        </div>
-
-        <!-- System Statistics -->
-        <div x-data="statsApp" x-init="init()" class="grid grid-cols-1 sm:grid-cols-2 md:grid-cols-3 lg:grid-cols-5 gap-4 mb-10 p-6 bg-gray-900/30 border border-gray-800 rounded-2xl backdrop-blur-sm">
-            <!-- Internet Status Card -->
-            <div class="bg-gray-800/50 backdrop-blur-sm border border-gray-700/50 rounded-xl p-4 text-center hover:bg-gray-800/70 transition-colors">
-                <div class="text-xs font-medium text-gray-400 uppercase tracking-wider mb-2">Internet</div>
-                <div class="text-2xl font-bold bg-gradient-to-r bg-clip-text text-transparent"
-                     :class="getConnectivityClasses()"
-                     x-text="stats.connectivity.status_text || '--'">--</div>
-                <div class="text-xs text-gray-500 mt-1" 
-                     x-text="stats.connectivity.ping || '-- ms avg'">-- ms avg</div>
-            </div>
-            
-            <!-- Uptime Card -->
-            <div class="bg-gray-800/50 backdrop-blur-sm border border-gray-700/50 rounded-xl p-4 text-center hover:bg-gray-800/70 transition-colors">
-                <div class="text-xs font-medium text-gray-400 uppercase tracking-wider mb-2">Uptime</div>
-                <div class="text-2xl font-bold bg-gradient-to-r from-cyan-400 to-blue-500 bg-clip-text text-transparent"
-                     :class="{ 'animate-pulse': loading }"
-                     x-text="stats.uptime || '--'">--</div>
-            </div>
-            
-            <!-- CPU Load Card -->
-            <div class="bg-gray-800/50 backdrop-blur-sm border border-gray-700/50 rounded-xl p-4 text-center hover:bg-gray-800/70 transition-colors">
-                <div class="text-xs font-medium text-gray-400 uppercase tracking-wider mb-2">CPU Load</div>
-                <div class="text-2xl font-bold bg-gradient-to-r bg-clip-text text-transparent"
-                     :class="getCpuLoadClasses()"
-                     x-text="stats.cpu.load || '--'">--</div>
-                <div class="text-xs text-gray-500 mt-1" 
-                     x-text="stats.cpu.info || '-- cores'">-- cores</div>
-            </div>
-            
-            <!-- Memory Card -->
-            <div class="bg-gray-800/50 backdrop-blur-sm border border-gray-700/50 rounded-xl p-4 text-center hover:bg-gray-800/70 transition-colors">
-                <div class="text-xs font-medium text-gray-400 uppercase tracking-wider mb-2">Memory</div>
-                <div class="text-2xl font-bold bg-gradient-to-r bg-clip-text text-transparent"
-                     :class="getMemoryClasses()"
-                     x-text="stats.memory.percent || '--%'">--%</div>
-                <div class="text-xs text-gray-500 mt-1" 
-                     x-text="stats.memory.info || '--'">--</div>
-            </div>
-            
-            <!-- Connected Clients Card -->
-            <div class="bg-gray-800/50 backdrop-blur-sm border border-gray-700/50 rounded-xl p-4 text-center hover:bg-gray-800/70 transition-colors">
-                <div class="text-xs font-medium text-gray-400 uppercase tracking-wider mb-2">Connected Clients</div>
-                <div class="text-2xl font-bold bg-gradient-to-r from-cyan-400 to-blue-500 bg-clip-text text-transparent"
-                     :class="{ 'animate-pulse': loading }"
-                     x-text="stats.clientCount || '--'">--</div>
-                <div class="text-xs text-gray-500 mt-1">Active devices</div>
-            </div>
-        </div>
-
-        <!-- Network Information -->
-        <div x-data="networkApp" x-init="init()" class="bg-gray-900/30 border border-gray-800 rounded-2xl backdrop-blur-sm p-6 mb-10">
-            <h3 class="text-lg font-semibold text-white mb-4 flex items-center">
-                <i class="lni lni-network text-cyan-400 mr-2"></i>
-                Network Topology
-            </h3>
-            <div class="grid grid-cols-1 md:grid-cols-2 gap-4">
-                <div class="flex justify-between items-center p-3 bg-gray-800/50 backdrop-blur-sm border border-gray-700/50 rounded-lg hover:bg-gray-800/70 transition-colors">
-                    <span class="text-sm text-gray-400 flex items-center">
-                        <i class="lni lni-world text-blue-400 mr-2 text-xs"></i>
-                        WAN Address:
-                    </span>
-                    <span class="text-sm font-mono text-white" 
-                          :class="{ 'animate-pulse': loading }"
-                          x-text="network.wanIp">--</span>
-                </div>
-                <div class="flex justify-between items-center p-3 bg-gray-800/50 backdrop-blur-sm border border-gray-700/50 rounded-lg hover:bg-gray-800/70 transition-colors">
-                    <span class="text-sm text-gray-400 flex items-center">
-                        <i class="lni lni-home text-green-400 mr-2 text-xs"></i>
-                        LAN Network:
-                    </span>
-                    <span class="text-sm font-mono text-white"
-                          :class="{ 'animate-pulse': loading }"
-                          x-text="network.lanNetwork">--</span>
-                </div>
-                <div class="flex justify-between items-center p-3 bg-gray-800/50 backdrop-blur-sm border border-gray-700/50 rounded-lg hover:bg-gray-800/70 transition-colors group">
-                    <span class="text-sm text-gray-400 flex items-center">
-                        <i class="lni lni-bridge text-purple-400 mr-2 text-xs"></i>
-                        Bridge (br-lan):
-                    </span>
-                    <div class="text-sm font-mono flex items-center">
-                        <i class="lni lni-download text-cyan-400 mr-1 text-xs"></i>
-                        <span class="text-cyan-400" x-text="network.interfaces.brLan.rx">--</span>
-                        <span class="text-gray-500 mx-2">/</span>
-                        <i class="lni lni-upload text-emerald-400 mr-1 text-xs"></i>
-                        <span class="text-emerald-400" x-text="network.interfaces.brLan.tx">--</span>
-                    </div>
-                </div>
-                <div class="flex justify-between items-center p-3 bg-gray-800/50 backdrop-blur-sm border border-gray-700/50 rounded-lg hover:bg-gray-800/70 transition-colors group">
-                    <span class="text-sm text-gray-400 flex items-center">
-                        <i class="lni lni-shield text-orange-400 mr-2 text-xs"></i>
-                        Tailscale:
-                    </span>
-                    <div class="text-sm font-mono flex items-center">
-                        <i class="lni lni-download text-cyan-400 mr-1 text-xs"></i>
-                        <span class="text-cyan-400" x-text="network.interfaces.tailscale.rx">--</span>
-                        <span class="text-gray-500 mx-2">/</span>
-                        <i class="lni lni-upload text-emerald-400 mr-1 text-xs"></i>
-                        <span class="text-emerald-400" x-text="network.interfaces.tailscale.tx">--</span>
-                    </div>
-                </div>
-            </div>
-        </div>
-
-        <!-- Connected Devices -->
-        <div x-data="clientsApp" x-init="init()" class="bg-gray-900/30 border border-gray-800 rounded-2xl backdrop-blur-sm p-6 mb-10">
-            <div class="flex justify-between items-center mb-5">
-                <h3 class="text-lg font-semibold text-white flex items-center">
-                    <i class="lni lni-users text-cyan-400 mr-2"></i>
-                    Connected Devices (<span x-text="clients.length">0</span>)
-                </h3>
-                <div class="flex gap-2">
-                    <button 
-                        class="px-3 py-1.5 text-xs font-medium rounded-md border transition-all duration-200 flex items-center gap-1"
-                        :class="allGraphsExpanded 
-                            ? 'bg-purple-500/20 border-purple-500/50 text-purple-400' 
-                            : 'bg-gray-800/50 border-gray-700/50 text-gray-400 hover:bg-gray-700/50 hover:text-white'"
-                        @click="toggleAllGraphs()">
-                        <i class="lni lni-stats-up text-[10px]"></i>
-                        <span x-text="allGraphsExpanded ? 'Hide All Graphs' : 'Show All Graphs'">Show All Graphs</span>
-                    </button>
-                    <button 
-                        x-show="Object.keys(expandedGraphs).filter(ip => expandedGraphs[ip]).length > 0"
-                        class="px-3 py-1.5 text-xs font-medium rounded-md border transition-all duration-200 flex items-center gap-1"
-                        :class="useUnifiedScale 
-                            ? 'bg-blue-500/20 border-blue-500/50 text-blue-400' 
-                            : 'bg-gray-800/50 border-gray-700/50 text-gray-400 hover:bg-gray-700/50 hover:text-white'"
-                        @click="toggleUnifiedScale()">
-                        <i class="lni lni-ruler text-[10px]"></i>
-                        <span x-text="useUnifiedScale ? 'Unified Scale' : 'Auto Scale'">Unified Scale</span>
-                    </button>
-                    <select 
-                        x-show="Object.keys(expandedGraphs).filter(ip => expandedGraphs[ip]).length > 0"
-                        x-model="timeRange"
-                        @change="onTimeRangeChange()"
-                        class="px-3 py-1.5 text-xs font-medium rounded-md border bg-gray-800/50 border-gray-700/50 text-gray-300 hover:bg-gray-700/50 hover:text-white transition-all duration-200 cursor-pointer">
-                        <template x-for="range in availableTimeRanges" :key="range.value">
-                            <option :value="range.value" x-text="range.label"></option>
-                        </template>
-                    </select>
-                    <div class="w-px bg-gray-700"></div>
-                    <button 
-                        class="px-3 py-1.5 text-xs font-medium rounded-md border transition-all duration-200 flex items-center gap-1"
-                        :class="sortField === 'name' 
-                            ? 'bg-cyan-500/20 border-cyan-500/50 text-cyan-400' 
-                            : 'bg-gray-800/50 border-gray-700/50 text-gray-400 hover:bg-gray-700/50 hover:text-white'"
-                        @click="setSortField('name')">
-                        <span>Name</span>
-                        <i class="lni lni-chevron-up text-[10px]" 
-                           :class="{ 'rotate-180': sortField === 'name' && sortDirection === 'desc' }"></i>
-                    </button>
-                    <button 
-                        class="px-3 py-1.5 text-xs font-medium rounded-md border transition-all duration-200 flex items-center gap-1"
-                        :class="sortField === 'bandwidth' 
-                            ? 'bg-cyan-500/20 border-cyan-500/50 text-cyan-400' 
-                            : 'bg-gray-800/50 border-gray-700/50 text-gray-400 hover:bg-gray-700/50 hover:text-white'"
-                        @click="setSortField('bandwidth')">
-                        <span>Bandwidth</span>
-                        <i class="lni lni-chevron-up text-[10px]" 
-                           :class="{ 'rotate-180': sortField === 'bandwidth' && sortDirection === 'desc' }"></i>
-                    </button>
-                    <button 
-                        class="px-3 py-1.5 text-xs font-medium rounded-md border transition-all duration-200 flex items-center gap-1"
-                        :class="sortField === 'status' 
-                            ? 'bg-cyan-500/20 border-cyan-500/50 text-cyan-400' 
-                            : 'bg-gray-800/50 border-gray-700/50 text-gray-400 hover:bg-gray-700/50 hover:text-white'"
-                        @click="setSortField('status')">
-                        <span>Status</span>
-                        <i class="lni lni-chevron-up text-[10px]" 
-                           :class="{ 'rotate-180': sortField === 'status' && sortDirection === 'desc' }"></i>
-                    </button>
-                </div>
-            </div>
-            <div class="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 xl:grid-cols-3 2xl:grid-cols-4 gap-3">
-                <template x-for="client in sortedClients" :key="client.ip">
-                    <div class="bg-gray-800/50 backdrop-blur-sm border border-gray-700/50 rounded-lg overflow-hidden">
-                        <!-- Client info row -->
-                        <div class="flex items-center p-3 hover:bg-gray-800/70 transition-all duration-200">
-                            <i class="lni text-xl mr-3 text-cyan-400 opacity-60" :class="client.icon || 'lni-mobile'"></i>
-                            <div class="flex-1 min-w-0">
-                                <div class="font-medium text-white text-sm truncate" x-text="getClientName(client)"></div>
-                                <div class="text-xs text-gray-400 truncate">
-                                    <span x-text="client.ip"></span>
-                                    <span class="text-gray-500" x-show="client.mac && client.mac !== 'unknown'"> • <span x-text="client.mac.toUpperCase()"></span></span>
-                                </div>
-                            </div>
-                            <div class="ml-auto pl-3 text-right min-w-[90px]">
-                                <div class="flex items-center justify-end gap-1 text-xs">
-                                    <i class="lni lni-download text-cyan-400 text-[10px]"></i>
-                                    <span class="font-mono text-[11px]" 
-                                          :class="(client.bandwidth_rx_bps || 0) > 1000 ? 'text-cyan-400 font-semibold' : 'text-gray-500'"
-                                          x-text="client.bandwidth_rx_formatted || '0 bps'"></span>
-                                </div>
-                                <div class="flex items-center justify-end gap-1 text-xs">
-                                    <i class="lni lni-upload text-emerald-400 text-[10px]"></i>
-                                    <span class="font-mono text-[11px]" 
-                                          :class="(client.bandwidth_tx_bps || 0) > 1000 ? 'text-emerald-400 font-semibold' : 'text-gray-500'"
-                                          x-text="client.bandwidth_tx_formatted || '0 bps'"></span>
-                                </div>
-                            </div>
-                            <!-- Graph toggle button -->
-                            <button class="ml-3 p-1.5 rounded-md bg-gray-700/50 hover:bg-gray-700 transition-colors"
-                                    :class="{'bg-cyan-500/20 border-cyan-500/50': expandedGraphs[client.ip]}"
-                                    @click="toggleClientGraph(client.ip)">
-                                <i class="lni lni-stats-up text-sm" 
-                                   :class="expandedGraphs[client.ip] ? 'text-cyan-400' : 'text-gray-400'"></i>
-                            </button>
-                            <div class="ml-2 w-2 h-2 rounded-full flex-shrink-0"
-                                 :class="{
-                                    'bg-green-400 shadow-[0_0_8px_rgba(74,222,128,0.6)] animate-pulse': (client.state || '').toLowerCase() === 'reachable',
-                                    'bg-yellow-400 shadow-[0_0_6px_rgba(251,191,36,0.6)]': (client.state || '').toLowerCase() === 'stale',
-                                    'bg-gray-600': (client.state || '').toLowerCase() === 'failed' || (client.state || '').toLowerCase() === 'unknown'
-                                 }"
-                                 :title="client.state || 'unknown'"></div>
-                        </div>
-                        <!-- Expandable graph section - spans full width of card -->
-                        <div x-show="expandedGraphs[client.ip]" 
-                             x-transition:enter="transition ease-out duration-300"
-                             x-transition:enter-start="opacity-0 transform scale-95"
-                             x-transition:enter-end="opacity-100 transform scale-100"
-                             x-transition:leave="transition ease-in duration-200"
-                             x-transition:leave-start="opacity-100 transform scale-100"
-                             x-transition:leave-end="opacity-0 transform scale-95"
-                             class="border-t border-gray-700/50 p-4 bg-gray-900/50">
-                            <div class="flex justify-between items-center mb-2">
-                                <div class="text-xs text-gray-400">Auto-refreshing every 5 seconds</div>
-                                <button @click="refreshChart(client.ip)" 
-                                        class="px-2 py-1 text-xs bg-gray-700/50 hover:bg-gray-700 border border-gray-600 rounded transition-colors flex items-center gap-1">
-                                    <i class="lni lni-reload text-[10px]"></i>
-                                    <span>Refresh Now</span>
-                                </button>
-                            </div>
-                            <div class="h-48 relative">
-                                <canvas :id="'bandwidth-chart-' + client.ip.replace(/\\./g, '-')"></canvas>
-                                <div x-show="loadingGraphs[client.ip]" 
-                                     class="absolute inset-0 flex items-center justify-center bg-gray-900/75">
-                                    <div class="text-cyan-400">
-                                        <i class="lni lni-spinner-arrow animate-spin text-2xl"></i>
-                                        <p class="text-xs mt-2">Loading bandwidth history...</p>
-                                    </div>
-                                </div>
-                            </div>
-                        </div>
-                    </div>
-                </template>
-            </div>
-        </div>
-
-        <!-- DNS Statistics -->
-        <div x-data="dnsApp" x-init="init()" class="bg-gray-900/30 border border-gray-800 rounded-2xl backdrop-blur-sm p-6 mb-10">
-            <h3 class="text-lg font-semibold text-white mb-4 flex items-center">
-                <i class="lni lni-shield-check text-cyan-400 mr-2"></i>
-                DNS Statistics (Blocky)
-            </h3>
-            <div class="grid grid-cols-2 md:grid-cols-4 gap-4 mb-6">
-                <!-- Total Queries -->
-                <div class="bg-gray-800/50 backdrop-blur-sm border border-gray-700/50 rounded-lg p-4 hover:bg-gray-800/70 transition-colors">
-                    <div class="text-xs font-medium text-gray-400 uppercase tracking-wider mb-2">Total Queries</div>
-                    <div class="text-2xl font-bold bg-gradient-to-r from-cyan-400 to-blue-500 bg-clip-text text-transparent" 
-                         :class="{ 'animate-pulse': loading }"
-                         x-text="formatNumber(stats.totalQueries)">--</div>
-                    <div class="text-xs text-gray-500 mt-1" x-text="stats.queriesRate">-- q/min</div>
-                </div>
-                <!-- Blocked -->
-                <div class="bg-gray-800/50 backdrop-blur-sm border border-gray-700/50 rounded-lg p-4 hover:bg-gray-800/70 transition-colors">
-                    <div class="text-xs font-medium text-gray-400 uppercase tracking-wider mb-2">Blocked</div>
-                    <div class="text-2xl font-bold bg-gradient-to-r bg-clip-text text-transparent" 
-                         :class="getBlockedGradient()"
-                         x-text="stats.blockedPercent">--%</div>
-                    <div class="text-xs text-gray-500 mt-1" x-text="formatNumber(stats.blockedQueries) + ' queries'">-- queries</div>
-                </div>
-                <!-- Cache Hit Rate -->
-                <div class="bg-gray-800/50 backdrop-blur-sm border border-gray-700/50 rounded-lg p-4 hover:bg-gray-800/70 transition-colors">
-                    <div class="text-xs font-medium text-gray-400 uppercase tracking-wider mb-2">Cache Hit Rate</div>
-                    <div class="text-2xl font-bold bg-gradient-to-r bg-clip-text text-transparent"
-                         :class="getCacheGradient()"
-                         x-text="stats.cacheHitRate">--%</div>
-                </div>
-                <!-- Block Lists -->
-                <div class="bg-gray-800/50 backdrop-blur-sm border border-gray-700/50 rounded-lg p-4 hover:bg-gray-800/70 transition-colors">
-                    <div class="text-xs font-medium text-gray-400 uppercase tracking-wider mb-2">Block Lists</div>
-                    <div class="flex flex-wrap gap-1 justify-center mt-2">
-                        <template x-for="(count, list) in stats.blockingLists" :key="list">
-                            <div class="px-2 py-1 bg-red-500/20 border border-red-500/30 rounded-full text-[10px] text-red-300">
-                                <span x-text="`${list}: ${formatNumber(count)}`"></span>
-                            </div>
-                        </template>
-                        <div x-show="Object.keys(stats.blockingLists).length === 0" 
-                             class="text-xs text-gray-500">No data</div>
-                    </div>
-                </div>
-            </div>
-            <!-- Top Clients -->
-            <div class="bg-gray-800/50 backdrop-blur-sm border border-gray-700/50 rounded-lg p-4">
-                <h4 class="text-sm font-medium text-gray-300 mb-3 flex items-center">
-                    <i class="lni lni-users text-purple-400 mr-2 text-xs"></i>
-                    Top DNS Clients
-                </h4>
-                <div class="space-y-2">
-                    <template x-for="client in stats.topClients" :key="client.ip">
-                        <div class="flex justify-between items-center p-2 bg-gray-700/30 rounded-md hover:bg-gray-700/50 transition-colors">
-                            <span class="text-sm text-gray-200 truncate flex-1" x-text="client.hostname || client.ip"></span>
-                            <span class="text-sm font-mono text-cyan-400 ml-3" x-text="formatNumber(client.queries)"></span>
-                        </div>
-                    </template>
-                    <div x-show="stats.topClients.length === 0" 
-                         class="text-center text-sm text-gray-500 py-2">No DNS data available</div>
-                </div>
-            </div>
-        </div>
-
-        <!-- Services -->
-        <div x-data="servicesApp" x-init="init()" class="bg-gray-900/30 border border-gray-800 rounded-2xl backdrop-blur-sm p-6 mb-10">
-            <h3 class="text-lg font-semibold text-white mb-4 flex items-center">
-                <i class="lni lni-apps text-cyan-400 mr-2"></i>
-                Services
-            </h3>
-            <div class="grid grid-cols-2 sm:grid-cols-3 md:grid-cols-4 lg:grid-cols-6 gap-3">
-                <template x-for="service in services" :key="service.name">
-                    <a :href="service.url" 
-                       class="group bg-gray-800/50 backdrop-blur-sm border border-gray-700/50 rounded-xl p-4 text-center hover:bg-gray-800/70 hover:border-cyan-500/50 hover:scale-105 transition-all duration-200 block">
-                        <i class="lni text-2xl mb-2 block text-cyan-400 opacity-80 group-hover:opacity-100 transition-opacity" 
-                           :class="service.icon"></i>
-                        <div class="text-xs font-medium text-gray-300 group-hover:text-white transition-colors" 
-                             x-text="service.name"></div>
-                    </a>
-                </template>
-            </div>
-        </div>
-    </div>
-
-    <script>
-        // Global metrics store to avoid duplicate API calls
-        let metricsStore = {
-            data: null,
-            subscribers: [],
-            
-            subscribe(callback) {
-                this.subscribers.push(callback);
-            },
-            
-            update(data) {
-                this.data = data;
-                this.subscribers.forEach(callback => callback(data));
-            }
-        };
-        
-        // Chart instances stored outside of Alpine's reactive scope to prevent conflicts
-        const chartInstances = {};
-        
-        // Alpine.js components
-        document.addEventListener('alpine:init', () => {
-            // Stats component for top cards
-            Alpine.data('statsApp', () => ({
-                loading: true,
-                stats: {
-                    connectivity: {
-                        status: null,
-                        status_text: '--',
-                        ping: '-- ms avg'
-                    },
-                    uptime: '--',
-                    cpu: {
-                        load: '--',
-                        info: '-- cores'
-                    },
-                    memory: {
-                        percent: '--%',
-                        info: '--'
-                    },
-                    clientCount: '--'
-                },
-                
-                init() {
-                    // Subscribe to metrics updates
-                    metricsStore.subscribe((data) => {
-                        this.updateStats(data);
-                    });
-                },
-                
-                updateStats(data) {
-                    this.loading = false;
-                    
-                    // Update connectivity
-                    if (data.connectivity) {
-                        this.stats.connectivity.status = data.connectivity.status;
-                        this.stats.connectivity.status_text = data.connectivity.status_text || 'Unknown';
-                        this.stats.connectivity.ping = data.connectivity.avg_response_time !== null 
-                            ? `${data.connectivity.avg_response_time} ms avg` 
-                            : 'No response';
-                    }
-                    
-                    // Update uptime
-                    if (data.uptime) {
-                        this.stats.uptime = data.uptime.formatted || '--';
-                    }
-                    
-                    // Update CPU
-                    if (data.cpu) {
-                        this.stats.cpu.load = data.cpu.load_1 ? data.cpu.load_1.toFixed(2) : '--';
-                        this.stats.cpu.info = `${data.cpu.cores || '--'} cores | ${data.cpu.usage_percent || '--'}% usage`;
-                    }
-                    
-                    // Update memory
-                    if (data.memory) {
-                        this.stats.memory.percent = `${data.memory.percent || '--'}%`;
-                        if (data.memory.formatted) {
-                            this.stats.memory.info = `${data.memory.formatted.used} / ${data.memory.formatted.total}`;
-                        }
-                    }
-                    
-                    // Update client count
-                    if (data.clients) {
-                        this.stats.clientCount = data.clients.count || 0;
-                    }
-                },
-                
-                getConnectivityClasses() {
-                    const status = this.stats.connectivity.status;
-                    if (this.loading) return 'from-cyan-400 to-blue-500 animate-pulse';
-                    
-                    switch(status) {
-                        case 'online':
-                            return 'from-green-400 to-emerald-500';
-                        case 'offline':
-                            return 'from-red-400 to-rose-500';
-                        case 'partial':
-                            return 'from-amber-400 to-yellow-500';
-                        default:
-                            return 'from-cyan-400 to-blue-500';
-                    }
-                },
-                
-                getCpuLoadClasses() {
-                    if (this.loading) return 'from-cyan-400 to-blue-500 animate-pulse';
-                    
-                    const load = parseFloat(this.stats.cpu.load);
-                    if (isNaN(load)) return 'from-cyan-400 to-blue-500';
-                    
-                    // Assuming 4 cores average, adjust thresholds
-                    if (load > 8) return 'from-red-400 to-rose-500';
-                    if (load > 4) return 'from-amber-400 to-yellow-500';
-                    if (load > 2) return 'from-cyan-400 to-blue-500';
-                    return 'from-green-400 to-emerald-500';
-                },
-                
-                getMemoryClasses() {
-                    if (this.loading) return 'from-cyan-400 to-blue-500 animate-pulse';
-                    
-                    const percent = parseFloat(this.stats.memory.percent);
-                    if (isNaN(percent)) return 'from-cyan-400 to-blue-500';
-                    
-                    if (percent > 90) return 'from-red-400 to-rose-500';
-                    if (percent > 75) return 'from-amber-400 to-yellow-500';
-                    if (percent > 50) return 'from-cyan-400 to-blue-500';
-                    return 'from-green-400 to-emerald-500';
-                }
-            }));
-            
-            // Network component
-            Alpine.data('networkApp', () => ({
-                loading: true,
-                network: {
-                    wanIp: '--',
-                    lanNetwork: '--',
-                    interfaces: {
-                        brLan: {
-                            rx: 'RX: --',
-                            tx: 'TX: --'
-                        },
-                        tailscale: {
-                            rx: 'RX: --',
-                            tx: 'TX: --'
-                        }
-                    }
-                },
-                
-                init() {
-                    // Subscribe to metrics updates
-                    metricsStore.subscribe((data) => {
-                        this.updateNetwork(data);
-                    });
-                },
-                
-                updateNetwork(data) {
-                    this.loading = false;
-                    
-                    if (data.network) {
-                        // Update WAN IP
-                        this.network.wanIp = data.network.wan_ip || 'unknown';
-                        
-                        // Update LAN Network
-                        if (data.network.lan_network) {
-                            this.network.lanNetwork = data.network.lan_network.cidr || '10.1.1.0/24';
-                        }
-                        
-                        // Update interface stats
-                        if (data.network.interfaces) {
-                            if (data.network.interfaces['br-lan']) {
-                                const stats = data.network.interfaces['br-lan'];
-                                this.network.interfaces.brLan.rx = `RX: ${stats.formatted.rx}`;
-                                this.network.interfaces.brLan.tx = `TX: ${stats.formatted.tx}`;
-                            }
-                            
-                            if (data.network.interfaces.tailscale0) {
-                                const stats = data.network.interfaces.tailscale0;
-                                this.network.interfaces.tailscale.rx = `RX: ${stats.formatted.rx}`;
-                                this.network.interfaces.tailscale.tx = `TX: ${stats.formatted.tx}`;
-                            }
-                        }
-                    }
-                }
-            }));
-            
-            // Clients component
-            Alpine.data('clientsApp', () => ({
-                clients: [],
-                sortField: 'bandwidth',
-                sortDirection: 'desc',
-                expandedGraphs: {},
-                // charts: {}, // Removed - now using external chartInstances
-                allGraphsExpanded: false,
-                loadingGraphs: {},
-                updateInterval: null,  // Store interval ID for cleanup
-                useUnifiedScale: true,  // Use same scale for all charts
-                unifiedMaxValue: 0,  // Maximum value across all charts
-                timeRange: '10m',  // Default time range for charts
-                availableTimeRanges: [
-                    { value: '5m', label: '5 min' },
-                    { value: '10m', label: '10 min' },
-                    { value: '30m', label: '30 min' },
-                    { value: '1h', label: '1 hour' },
-                    { value: '3h', label: '3 hours' },
-                    { value: '6h', label: '6 hours' },
-                    { value: '12h', label: '12 hours' },
-                    { value: '24h', label: '24 hours' },
-                    { value: '48h', label: '2 days' },
-                    { value: '72h', label: '3 days' },
-                    { value: '168h', label: '1 week' }
-                ],
-                
-                init() {
-                    // Subscribe to metrics updates
-                    metricsStore.subscribe((data) => {
-                        if (data.clients && data.clients.clients) {
-                            this.clients = data.clients.clients;
-                        }
-                    });
-                    
-                    // Set up periodic chart updates (every 5 seconds)
-                    this.updateInterval = setInterval(() => {
-                        this.updateAllCharts();
-                    }, 5000);
-                    
-                    // Cleanup on component destroy
-                    this.$watch('$destroy', () => {
-                        if (this.updateInterval) {
-                            clearInterval(this.updateInterval);
-                        }
-                        // Destroy all charts
-                        Object.keys(chartInstances).forEach(ip => {
-                            if (chartInstances[ip]) {
-                                try {
-                                    chartInstances[ip].destroy();
-                                } catch (e) {
-                                    console.warn(`Error destroying chart for ${ip}:`, e);
-                                }
-                                delete chartInstances[ip];
-                            }
-                        });
-                    });
-                },
-                
-                calculateUnifiedScale(allHistories) {
-                    // Calculate the maximum value across all charts
-                    let maxValue = 0;
-                    
-                    for (const history of Object.values(allHistories)) {
-                        if (!history || history.error) continue;
-                        
-                        // Find max in rx data
-                        if (history.rx && Array.isArray(history.rx)) {
-                            const maxRx = Math.max(...history.rx.filter(v => !isNaN(v)));
-                            if (!isNaN(maxRx)) maxValue = Math.max(maxValue, maxRx);
-                        }
-                        
-                        // Find max in tx data
-                        if (history.tx && Array.isArray(history.tx)) {
-                            const maxTx = Math.max(...history.tx.filter(v => !isNaN(v)));
-                            if (!isNaN(maxTx)) maxValue = Math.max(maxValue, maxTx);
-                        }
-                    }
-                    
-                    // Add 10% padding to the top
-                    this.unifiedMaxValue = maxValue * 1.1;
-                    
-                    // Round up to nice values for better readability
-                    if (this.unifiedMaxValue > 1000000000) {
-                        // Round up to nearest 100 Mbps for Gbps range
-                        this.unifiedMaxValue = Math.ceil(this.unifiedMaxValue / 100000000) * 100000000;
-                    } else if (this.unifiedMaxValue > 1000000) {
-                        // Round up to nearest 10 Mbps for Mbps range
-                        this.unifiedMaxValue = Math.ceil(this.unifiedMaxValue / 10000000) * 10000000;
-                    } else if (this.unifiedMaxValue > 1000) {
-                        // Round up to nearest 100 Kbps for Kbps range
-                        this.unifiedMaxValue = Math.ceil(this.unifiedMaxValue / 100000) * 100000;
-                    }
-                    
-                    console.log(`[SCALE] Unified max value: ${formatBandwidth(this.unifiedMaxValue)}`);
-                },
-                
-                updateChartScale(chart) {
-                    // Update chart's y-axis scale
-                    if (this.useUnifiedScale && this.unifiedMaxValue > 0) {
-                        chart.options.scales.y.max = this.unifiedMaxValue;
-                        chart.options.scales.y.min = 0;
-                    } else {
-                        // Auto scale
-                        delete chart.options.scales.y.max;
-                        delete chart.options.scales.y.min;
-                    }
-                },
-                
-                async updateAllCharts() {
-                    // Update all visible charts with latest data
-                    const expandedIps = Object.keys(this.expandedGraphs).filter(ip => this.expandedGraphs[ip]);
-                    
-                    if (expandedIps.length === 0) return;
-                    
-                    try {
-                        // Batch fetch only the histories we need with time range
-                        const response = await fetch(`/api/client-histories?ips=${expandedIps.join(',')}&duration=${this.timeRange}`);
-                        if (!response.ok) {
-                            console.error('Failed to fetch batch histories');
-                            return;
-                        }
-                        
-                        const allHistories = await response.json();
-                        
-                        // Calculate unified scale if enabled
-                        if (this.useUnifiedScale) {
-                            this.calculateUnifiedScale(allHistories);
-                        }
-                        
-                        // Update each chart with its data
-                        for (const ip of expandedIps) {
-                            const history = allHistories[ip];
-                            if (!history || history.error) continue;
-                            
-                            const chart = chartInstances[ip];
-                            if (!chart || chart._destroyed) continue;
-                            
-                            // Clear existing data
-                            chart.data.labels.length = 0;
-                            chart.data.datasets[0].data.length = 0;
-                            chart.data.datasets[1].data.length = 0;
-                            
-                            // Add new data
-                            chart.data.labels.push(...history.labels);
-                            chart.data.datasets[0].data.push(...history.rx);
-                            chart.data.datasets[1].data.push(...history.tx);
-                            
-                            // Update scale if unified
-                            this.updateChartScale(chart);
-                            
-                            // Update chart without animation for smooth updates
-                            chart.update('none');
-                        }
-                    } catch (error) {
-                        console.error('Error updating charts:', error);
-                        // Fallback to individual updates
-                        for (const ip of expandedIps) {
-                            if (chartInstances[ip] && !chartInstances[ip]._destroyed) {
-                                await this.updateChartData(ip);
-                            }
-                        }
-                    }
-                },
-                
-                async updateChartData(ip) {
-                    // Update chart with latest data without recreating it
-                    try {
-                        const response = await fetch(`/api/client-histories?ips=${ip}&duration=${this.timeRange}`);
-                        if (!response.ok) return;
-                        
-                        const histories = await response.json();
-                        const history = histories[ip];
-                        if (!history || history.error) return;
-                        
-                        const chart = chartInstances[ip];
-                        if (!chart || chart._destroyed) return;
-                        
-                        // Clear existing data
-                        chart.data.labels.length = 0;
-                        chart.data.datasets[0].data.length = 0;
-                        chart.data.datasets[1].data.length = 0;
-                        
-                        // Add new data
-                        chart.data.labels.push(...history.labels);
-                        chart.data.datasets[0].data.push(...history.rx);
-                        chart.data.datasets[1].data.push(...history.tx);
-                        
-                        // Update chart without animation for smooth updates
-                        chart.update('none');
-                    } catch (error) {
-                        console.error(`Error updating chart for ${ip}:`, error);
-                    }
-                },
-                
-                async refreshChart(ip) {
-                    console.log(`[REFRESH] Manual refresh requested for IP: ${ip}`);
-                    
-                    try {
-                        // Fetch fresh data using batch endpoint with time range
-                        const response = await fetch(`/api/client-histories?ips=${ip}&duration=${this.timeRange}`);
-                        if (!response.ok) {
-                            console.error('Failed to refresh chart for IP:', ip);
-                            return;
-                        }
-                        
-                        const histories = await response.json();
-                        const history = histories[ip];
-                        if (!history || history.error) {
-                            console.error('No valid history data for IP:', ip);
-                            return;
-                        }
-                        
-                        if (chartInstances[ip] && !chartInstances[ip]._destroyed) {
-                            // Update existing chart
-                            const chart = chartInstances[ip];
-                            
-                            // Clear and update data
-                            chart.data.labels.length = 0;
-                            chart.data.datasets[0].data.length = 0;
-                            chart.data.datasets[1].data.length = 0;
-                            
-                            chart.data.labels.push(...history.labels);
-                            chart.data.datasets[0].data.push(...history.rx);
-                            chart.data.datasets[1].data.push(...history.tx);
-                            
-                            // Force update with animation for manual refresh
-                            chart.update();
-                        } else {
-                            // Chart doesn't exist, create it
-                            this.fetchAndCreateChart(ip);
-                        }
-                    } catch (error) {
-                        console.error('Error refreshing chart for IP:', ip, error);
-                    }
-                },
-                
-                toggleClientGraph(ip) {
-                    console.log(`[TOGGLE] Toggling graph for IP: ${ip}, current state: ${this.expandedGraphs[ip]}`);
-                    this.expandedGraphs[ip] = !this.expandedGraphs[ip];
-                    
-                    if (this.expandedGraphs[ip]) {
-                        console.log(`[TOGGLE] Expanding graph for IP: ${ip}`);
-                        // Use Alpine's nextTick to ensure DOM is ready
-                        this.$nextTick(() => {
-                            // Additional delay for transition to complete
-                            setTimeout(() => {
-                                console.log(`[TOGGLE] Creating chart for IP: ${ip}`);
-                                this.fetchAndCreateChart(ip);
-                            }, 100);
-                        });
-                    } else if (chartInstances[ip]) {
-                        console.log(`[TOGGLE] Collapsing graph for IP: ${ip}, destroying chart`);
-                        // Destroy chart when closing
-                        try {
-                            chartInstances[ip].destroy();
-                            console.log(`[TOGGLE] Successfully destroyed chart for IP: ${ip}`);
-                        } catch (e) {
-                            console.warn(`[TOGGLE] Error destroying chart for IP: ${ip}:`, e);
-                        }
-                        delete chartInstances[ip];
-                        delete this.loadingGraphs[ip];
-                    }
-                },
-                
-                createChartFromData(ip, history) {
-                    const canvasId = 'bandwidth-chart-' + ip.replace(/\\./g, '-');
-                    const canvas = document.getElementById(canvasId);
-                    console.log(`[CREATE] Creating chart for IP: ${ip}, canvas: ${canvasId}, exists: ${!!canvas}`);
-                    
-                    if (!canvas) {
-                        console.error(`[CREATE] Canvas not found for IP: ${ip}, ID: ${canvasId}`);
-                        return;
-                    }
-                    
-                    // Destroy existing chart if any
-                    if (chartInstances[ip]) {
-                        console.log(`[CREATE] Destroying existing chart for IP: ${ip} before creating new one`);
-                        chartInstances[ip].destroy();
-                        delete chartInstances[ip];
-                    }
-                    
-                    // Calculate scale for this chart if unified scale is enabled
-                    const scaleOptions = {};
-                    if (this.useUnifiedScale && this.unifiedMaxValue > 0) {
-                        scaleOptions.max = this.unifiedMaxValue;
-                        scaleOptions.min = 0;
-                    }
-                    
-                    // Create new chart with provided data
-                    try {
-                        chartInstances[ip] = new Chart(canvas, {
-                        type: 'line',
-                        data: {
-                            labels: history.labels,
-                            datasets: [
-                                {
-                                    label: 'Download',
-                                    data: history.rx,
-                                    borderColor: 'rgb(34, 211, 238)',
-                                    backgroundColor: 'rgba(34, 211, 238, 0.1)',
-                                    borderWidth: 2,
-                                    tension: 0.4,
-                                    fill: true
-                                },
-                                {
-                                    label: 'Upload',
-                                    data: history.tx,
-                                    borderColor: 'rgb(52, 211, 153)',
-                                    backgroundColor: 'rgba(52, 211, 153, 0.1)',
-                                    borderWidth: 2,
-                                    tension: 0.4,
-                                    fill: true
-                                }
-                            ]
-                        },
-                        options: {
-                            responsive: true,
-                            maintainAspectRatio: false,
-                            interaction: {
-                                intersect: false,
-                                mode: 'index'
-                            },
-                            plugins: {
-                                legend: {
-                                    display: true,
-                                    position: 'top',
-                                    labels: {
-                                        color: '#9CA3AF',
-                                        font: {
-                                            size: 11
-                                        },
-                                        boxWidth: 12,
-                                        boxHeight: 12
-                                    }
-                                },
-                                tooltip: {
-                                    callbacks: {
-                                        label: function(context) {
-                                            let label = context.dataset.label || '';
-                                            if (label) {
-                                                label += ': ';
-                                            }
-                                            label += formatBandwidth(context.parsed.y);
-                                            return label;
-                                        }
-                                    }
-                                }
-                            },
-                            scales: {
-                                x: {
-                                    display: true,
-                                    grid: {
-                                        color: 'rgba(255, 255, 255, 0.05)',
-                                        drawBorder: false
-                                    },
-                                    ticks: {
-                                        color: '#6B7280',
-                                        font: {
-                                            size: 10
-                                        },
-                                        maxRotation: 0,
-                                        autoSkip: true,
-                                        maxTicksLimit: 8
-                                    }
-                                },
-                                y: {
-                                    display: true,
-                                    grid: {
-                                        color: 'rgba(255, 255, 255, 0.05)',
-                                        drawBorder: false
-                                    },
-                                    ticks: {
-                                        color: '#6B7280',
-                                        font: {
-                                            size: 10
-                                        },
-                                        callback: function(value) {
-                                            return formatBandwidth(value);
-                                        }
-                                    },
-                                    ...scaleOptions  // Apply unified scale if set
-                                }
-                            }
-                        }
-                    });
-                        console.log(`[CREATE] Successfully created chart for IP: ${ip}`);
-                    } catch (error) {
-                        console.error(`[CREATE] Failed to create chart for IP: ${ip}:`, error);
-                        delete chartInstances[ip];
-                    }
-                },
-                
-                async fetchAndCreateChart(ip) {
-                    const canvasId = 'bandwidth-chart-' + ip.replace(/\\./g, '-');
-                    const canvas = document.getElementById(canvasId);
-                    console.log(`[FETCH_CREATE] Starting chart creation for IP: ${ip}, canvas: ${canvasId}`);
-                    
-                    if (!canvas) {
-                        console.error(`[FETCH_CREATE] Canvas not found for IP: ${ip}, ID: ${canvasId}`);
-                        return;
-                    }
-                    
-                    // Mark as just created to skip immediate updates
-                    this.justCreatedCharts = this.justCreatedCharts || {};
-                    this.justCreatedCharts[ip] = true;
-                    setTimeout(() => {
-                        delete this.justCreatedCharts[ip];
-                        console.log(`[FETCH_CREATE] Chart for ${ip} is now ready for updates`);
-                    }, 5000); // Wait 5 seconds before allowing updates
-                    
-                    // Show loading state
-                    this.loadingGraphs[ip] = true;
-                    
-                    try {
-                        // If unified scale is enabled and we need to calculate it
-                        let ips = ip;
-                        if (this.useUnifiedScale) {
-                            // Get all expanded IPs to calculate unified scale
-                            const expandedIps = Object.keys(this.expandedGraphs).filter(ip => this.expandedGraphs[ip]);
-                            if (expandedIps.length > 0) {
-                                ips = expandedIps.join(',');
-                            }
-                        }
-                        
-                        // Fetch history from server with time range
-                        const response = await fetch(`/api/client-histories?ips=${ips}&duration=${this.timeRange}`);
-                        
-                        // Check if response is OK
-                        if (!response.ok) {
-                            console.error('Failed to fetch history for IP:', ip, 'Status:', response.status);
-                            this.loadingGraphs[ip] = false;
-                            return;
-                        }
-                        
-                        const histories = await response.json();
-                        
-                        // Calculate unified scale if needed
-                        if (this.useUnifiedScale && Object.keys(histories).length > 0) {
-                            this.calculateUnifiedScale(histories);
-                        }
-                        
-                        const history = histories[ip];
-                        
-                        if (!history || history.error) {
-                            console.error('Error fetching history for IP:', ip, history?.error || 'No data');
-                            this.loadingGraphs[ip] = false;
-                            return;
-                        }
-                        
-                        // Destroy existing chart if any
-                        if (chartInstances[ip]) {
-                            chartInstances[ip].destroy();
-                            delete chartInstances[ip];
-                        }
-                        
-                        // Create new chart with server data
-                        chartInstances[ip] = new Chart(canvas, {
-                            type: 'line',
-                            data: {
-                                labels: history.labels,
-                                datasets: [
-                                    {
-                                        label: 'Download',
-                                        data: history.rx,
-                                        borderColor: 'rgb(34, 211, 238)',
-                                        backgroundColor: 'rgba(34, 211, 238, 0.1)',
-                                        borderWidth: 2,
-                                        tension: 0.4,
-                                        fill: true
-                                    },
-                                    {
-                                        label: 'Upload',
-                                        data: history.tx,
-                                        borderColor: 'rgb(52, 211, 153)',
-                                        backgroundColor: 'rgba(52, 211, 153, 0.1)',
-                                        borderWidth: 2,
-                                        tension: 0.4,
-                                        fill: true
-                                    }
-                                ]
-                            },
-                        options: {
-                            responsive: true,
-                            maintainAspectRatio: false,
-                            interaction: {
-                                intersect: false,
-                                mode: 'index'
-                            },
-                            plugins: {
-                                legend: {
-                                    display: true,
-                                    position: 'top',
-                                    labels: {
-                                        color: '#9CA3AF',
-                                        font: {
-                                            size: 11
-                                        },
-                                        boxWidth: 12,
-                                        boxHeight: 12
-                                    }
-                                },
-                                tooltip: {
-                                    callbacks: {
-                                        label: function(context) {
-                                            let label = context.dataset.label || '';
-                                            if (label) {
-                                                label += ': ';
-                                            }
-                                            label += formatBandwidth(context.parsed.y);
-                                            return label;
-                                        }
-                                    }
-                                }
-                            },
-                            scales: {
-                                x: {
-                                    display: true,
-                                    grid: {
-                                        color: 'rgba(255, 255, 255, 0.05)',
-                                        drawBorder: false
-                                    },
-                                    ticks: {
-                                        color: '#6B7280',
-                                        font: {
-                                            size: 10
-                                        },
-                                        maxRotation: 0,
-                                        autoSkip: true,
-                                        maxTicksLimit: 8
-                                    }
-                                },
-                                y: {
-                                    display: true,
-                                    grid: {
-                                        color: 'rgba(255, 255, 255, 0.05)',
-                                        drawBorder: false
-                                    },
-                                    ticks: {
-                                        color: '#6B7280',
-                                        font: {
-                                            size: 10
-                                        },
-                                        callback: function(value) {
-                                            return formatBandwidth(value);
-                                        }
-                                    },
-                                    ...scaleOptions  // Apply unified scale if set
-                                }
-                                }
-                            }
-                        });
-                        
-                        this.loadingGraphs[ip] = false;
-                        
-                    } catch (error) {
-                        console.error('Error creating chart for IP:', ip, error);
-                        this.loadingGraphs[ip] = false;
-                    }
-                },
-                
-                async toggleAllGraphs() {
-                    this.allGraphsExpanded = !this.allGraphsExpanded;
-                    
-                    if (this.allGraphsExpanded) {
-                        // Get all client IPs to expand
-                        const clientIps = this.clients.map(c => c.ip);
-                        
-                        // Fetch all histories at once for better performance
-                        try {
-                            const response = await fetch(`/api/client-histories?ips=${clientIps.join(',')}&duration=${this.timeRange}`);
-                            if (response.ok) {
-                                const allHistories = await response.json();
-                                
-                                // Calculate unified scale for all charts
-                                if (this.useUnifiedScale) {
-                                    this.calculateUnifiedScale(allHistories);
-                                }
-                                
-                                // Process each client's history
-                                for (const ip of clientIps) {
-                                    const history = allHistories[ip];
-                                    if (!history || history.error) continue;
-                                    
-                                    if (!this.expandedGraphs[ip]) {
-                                        this.expandedGraphs[ip] = true;
-                                        
-                                        // Wait for DOM to update
-                                        await this.$nextTick();
-                                        
-                                        // Create chart with fetched data
-                                        const canvasId = 'bandwidth-chart-' + ip.replace(/\\./g, '-');
-                                        const canvas = document.getElementById(canvasId);
-                                        
-                                        if (canvas && !chartInstances[ip]) {
-                                            this.createChartFromData(ip, history);
-                                        }
-                                    }
-                                }
-                            } else {
-                                // Fallback to individual fetching
-                                console.warn('Bulk fetch failed, falling back to individual requests');
-                                this.clients.forEach(client => {
-                                    if (!this.expandedGraphs[client.ip]) {
-                                        this.toggleClientGraph(client.ip);
-                                    }
-                                });
-                            }
-                        } catch (error) {
-                            console.error('Error fetching bulk histories:', error);
-                            // Fallback to individual fetching
-                            this.clients.forEach(client => {
-                                if (!this.expandedGraphs[client.ip]) {
-                                    this.toggleClientGraph(client.ip);
-                                }
-                            });
-                        }
-                    } else {
-                        // Collapse all graphs
-                        Object.keys(this.expandedGraphs).forEach(ip => {
-                            if (this.expandedGraphs[ip]) {
-                                this.expandedGraphs[ip] = false;
-                                if (chartInstances[ip]) {
-                                    try {
-                                        chartInstances[ip].destroy();
-                                    } catch (e) {
-                                        console.warn('Error destroying chart:', e);
-                                    }
-                                    delete chartInstances[ip];
-                                    delete this.loadingGraphs[ip];
-                                }
-                            }
-                        });
-                    }
-                },
-                
-                get sortedClients() {
-                    return [...this.clients].sort((a, b) => {
-                        let compareValue = 0;
-                        
-                        switch (this.sortField) {
-                            case 'name':
-                                const nameA = this.getClientName(a).toLowerCase();
-                                const nameB = this.getClientName(b).toLowerCase();
-                                compareValue = nameA.localeCompare(nameB);
-                                break;
-                                
-                            case 'bandwidth':
-                                const bwA = (a.bandwidth_rx_bps || 0) + (a.bandwidth_tx_bps || 0);
-                                const bwB = (b.bandwidth_rx_bps || 0) + (b.bandwidth_tx_bps || 0);
-                                compareValue = bwA - bwB; // Lower first (will be reversed for desc)
-                                break;
-                                
-                            case 'status':
-                                const statusOrder = { 'reachable': 3, 'stale': 2, 'failed': 1, 'unknown': 0 };
-                                const stateA = (a.state || 'unknown').toLowerCase();
-                                const stateB = (b.state || 'unknown').toLowerCase();
-                                compareValue = (statusOrder[stateB] || 0) - (statusOrder[stateA] || 0);
-                                break;
-                        }
-                        
-                        return this.sortDirection === 'asc' ? compareValue : -compareValue;
-                    });
-                },
-                
-                setSortField(field) {
-                    if (this.sortField === field) {
-                        // Toggle direction if clicking same field
-                        this.sortDirection = this.sortDirection === 'asc' ? 'desc' : 'asc';
-                    } else {
-                        // New field, set default direction
-                        this.sortField = field;
-                        this.sortDirection = field === 'bandwidth' ? 'desc' : 'asc';
-                    }
-                },
-                
-                async toggleUnifiedScale() {
-                    this.useUnifiedScale = !this.useUnifiedScale;
-                    
-                    // If enabling unified scale, recalculate and update all charts
-                    if (this.useUnifiedScale) {
-                        const expandedIps = Object.keys(this.expandedGraphs).filter(ip => this.expandedGraphs[ip]);
-                        if (expandedIps.length > 0) {
-                            // Fetch all data to calculate unified scale
-                            const response = await fetch(`/api/client-histories?ips=${expandedIps.join(',')}&duration=${this.timeRange}`);
-                            if (response.ok) {
-                                const allHistories = await response.json();
-                                this.calculateUnifiedScale(allHistories);
-                                
-                                // Update all existing charts with the new scale
-                                for (const ip of expandedIps) {
-                                    const chart = chartInstances[ip];
-                                    if (chart && !chart._destroyed) {
-                                        this.updateChartScale(chart);
-                                        chart.update();
-                                    }
-                                }
-                            }
-                        }
-                    } else {
-                        // Disable unified scale, let charts auto-scale
-                        this.unifiedMaxValue = 0;
-                        for (const ip of Object.keys(chartInstances)) {
-                            const chart = chartInstances[ip];
-                            if (chart && !chart._destroyed) {
-                                delete chart.options.scales.y.max;
-                                delete chart.options.scales.y.min;
-                                chart.update();
-                            }
-                        }
-                    }
-                },
-                
-                async onTimeRangeChange() {
-                    console.log(`[TIME_RANGE] Changed to: ${this.timeRange}`);
-                    
-                    // Clear and recreate all charts with new time range
-                    const expandedIps = Object.keys(this.expandedGraphs).filter(ip => this.expandedGraphs[ip]);
-                    
-                    if (expandedIps.length === 0) return;
-                    
-                    // Show loading state for all charts
-                    for (const ip of expandedIps) {
-                        this.loadingGraphs[ip] = true;
-                    }
-                    
-                    try {
-                        // Fetch all data with new time range
-                        // Note: The backend automatically adapts data sampling based on duration
-                        // - Short durations (<=1h): 30s-2m resolution, detailed time labels
-                        // - Medium durations (1h-24h): 2m-30m resolution, hour:minute labels  
-                        // - Long durations (>24h): 1h-6h resolution, date labels
-                        // This keeps graphs responsive while showing appropriate detail level
-                        const response = await fetch(`/api/client-histories?ips=${expandedIps.join(',')}&duration=${this.timeRange}`);
-                        if (!response.ok) {
-                            console.error('Failed to fetch data with new time range');
-                            return;
-                        }
-                        
-                        const allHistories = await response.json();
-                        
-                        // Calculate unified scale if enabled
-                        if (this.useUnifiedScale) {
-                            this.calculateUnifiedScale(allHistories);
-                        }
-                        
-                        // Update all charts with new data
-                        for (const ip of expandedIps) {
-                            const history = allHistories[ip];
-                            if (!history || history.error) {
-                                this.loadingGraphs[ip] = false;
-                                continue;
-                            }
-                            
-                            // Recreate chart with new data
-                            if (chartInstances[ip]) {
-                                chartInstances[ip].destroy();
-                                delete chartInstances[ip];
-                            }
-                            
-                            this.createChartFromData(ip, history);
-                            this.loadingGraphs[ip] = false;
-                        }
-                    } catch (error) {
-                        console.error('Error changing time range:', error);
-                        for (const ip of expandedIps) {
-                            this.loadingGraphs[ip] = false;
-                        }
-                    }
-                },
-                
-                getClientName(client) {
-                    return client.hostname && client.hostname !== 'unknown' 
-                        ? client.hostname 
-                        : client.mac.substring(0, 8).toUpperCase();
-                }
-            }));
-            
-            // DNS Statistics component
-            Alpine.data('dnsApp', () => ({
-                loading: true,
-                stats: {
-                    totalQueries: 0,
-                    blockedQueries: 0,
-                    blockedPercent: '--%',
-                    queriesRate: '-- q/min',
-                    cacheHitRate: '--%',
-                    topClients: [],
-                    blockingLists: {}
-                },
-                
-                init() {
-                    // Subscribe to metrics updates
-                    metricsStore.subscribe((data) => {
-                        this.updateStats(data);
-                    });
-                },
-                
-                updateStats(data) {
-                    this.loading = false;
-                    
-                    if (data.blocky && data.blocky.enabled) {
-                        this.stats.totalQueries = data.blocky.total_queries || 0;
-                        this.stats.blockedQueries = data.blocky.blocked_queries || 0;
-                        this.stats.blockedPercent = `${data.blocky.block_percentage || 0}%`;
-                        this.stats.queriesRate = `${data.blocky.queries_per_minute || 0} q/min`;
-                        this.stats.cacheHitRate = `${data.blocky.cache_hit_rate || 0}%`;
-                        this.stats.topClients = data.blocky.top_clients || [];
-                        this.stats.blockingLists = data.blocky.blocking_lists || {};
-                    }
-                },
-                
-                formatNumber(num) {
-                    if (num === undefined || num === null) return '--';
-                    if (num >= 1000000) return `${(num / 1000000).toFixed(1)}M`;
-                    if (num >= 1000) return `${(num / 1000).toFixed(1)}K`;
-                    return num.toLocaleString();
-                },
-                
-                getBlockedGradient() {
-                    if (this.loading) return 'from-cyan-400 to-blue-500 animate-pulse';
-                    
-                    const percent = parseFloat(this.stats.blockedPercent);
-                    if (isNaN(percent)) return 'from-cyan-400 to-blue-500';
-                    
-                    if (percent > 50) return 'from-red-400 to-rose-500';
-                    if (percent > 30) return 'from-amber-400 to-yellow-500';
-                    if (percent > 10) return 'from-cyan-400 to-blue-500';
-                    return 'from-green-400 to-emerald-500';
-                },
+# VictoriaMetrics endpoint, overridable with --victoriametrics-url
+VICTORIAMETRICS_URL = 'http://localhost:8428'
+
+# The page and its assets; --static-dir overrides
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'router-dashboard-static')
+
+class PreparedResponse:
+    """A response body encoded once, with a lazily built gzip variant and an ETag"""
+    # Bodies smaller than this aren't worth compressing
+    min_gzip_size = 1024
+    
+    def __init__(self, body: bytes, content_type: str, cache_control: str = 'no-cache'):
+        self.body = body
+        self.content_type = content_type
+        self.cache_control = cache_control
+        self.etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+        self._gzipped = None
+    
+    @classmethod
+    def json(cls, data: Any) -> 'PreparedResponse':
+        return cls(json.dumps(data, separators=(',', ':')).encode(), 'application/json')
+    
+    def gzipped(self) -> Optional[bytes]:
+        """Gzip-encoded body, or None when compression isn't worthwhile"""
+        if len(self.body) < self.min_gzip_size:
+            return None
+        if self._gzipped is None:
+            # Concurrent callers may both compress; they produce the same bytes
+            self._gzipped = gzip.compress(self.body, compresslevel=6, mtime=0)
+        return self._gzipped
+
+STATIC_TYPES = {
+    '.html': 'text/html; charset=utf-8',
+    '.css': 'text/css; charset=utf-8',
+    '.js': 'text/javascript; charset=utf-8',
+    '.svg': 'image/svg+xml',
+    '.woff2': 'font/woff2',
+    '.woff': 'font/woff',
+    '.ttf': 'font/ttf',
+    '.eot': 'application/vnd.ms-fontobject'
+}
+# Hashed asset names never change content, so browsers may keep them for a year
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# Third-party files the page loads from CDNs, used from <static dir>/vendor
+# instead whenever they have been placed there; until pinned copies are
+# vendored by router-dashboard.nix the page keeps using the CDN URLs
+VENDOR_ASSETS = {
+    'https://cdn.lineicons.com/4.0/lineicons.css': 'vendor/lineicons.css',
+    'https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.min.js': 'vendor/chart.umd.min.js',
+    'https://cdn.jsdelivr.net/npm/alpinejs@3.14.9/dist/cdn.min.js': 'vendor/alpine.min.js'
+}
+# The in-browser Tailwind JIT and its config, replaced by the stylesheet
+# compiled from the same config at build time when there is one
+TAILWIND_JIT = re.compile(r'<script src="https://cdn\.tailwindcss\.com"></script>\s*'
+                          r'<script src="/static/tailwind-config\.js"></script>')
+TAILWIND_CSS = 'vendor/tailwind.css'
+STATIC_REFERENCE = re.compile(r'/static/([\w./-]+)')
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+class StaticAssets:
+    """The dashboard page and its assets, read once and served from memory
+    
+    Every asset the page references as /static/<name> is also served as
+    /static/<stem>.<content hash><ext> with a year-long immutable
+    Cache-Control, and the page is rewritten to use those names, so a
+    reload costs one revalidated request for the page. Relative url()s in
+    stylesheets (icon fonts) are hashed the same way.
+    """
+    def __init__(self, directory: str):
+        self.directory = os.path.realpath(directory)
+        self.files = {}  # URL path -> PreparedResponse
+        self.hashed = {}  # asset name -> hashed URL path
+        
+        with open(os.path.join(self.directory, 'index.html'), 'rb') as f:
+            page = f.read().decode()
+        vendored = 0
+        for url, name in VENDOR_ASSETS.items():
+            if os.path.isfile(os.path.join(self.directory, name)):
+                page = page.replace(url, f'/static/{name}')
+                vendored += 1
+        if os.path.isfile(os.path.join(self.directory, TAILWIND_CSS)):
+            page = TAILWIND_JIT.sub(f'<link href="/static/{TAILWIND_CSS}" rel="stylesheet" />', page)
+            vendored += 1
+        page = STATIC_REFERENCE.sub(lambda match: self.asset(match.group(1)), page)
+        self.page = PreparedResponse(page.encode(), STATIC_TYPES['.html'])
+        self.page.gzipped()
+        logger.info(f"Loaded {len(self.hashed)} static assets from {self.directory} "
+                    f"({vendored} of {len(VENDOR_ASSETS) + 1} third-party files vendored)")
+    
+    def asset(self, name: str) -> str:
+        """Hashed URL path for `name` (relative to the static directory), loading it once"""
+        if name in self.hashed:
+            return self.hashed[name]
+        path = os.path.realpath(os.path.join(self.directory, name))
+        if not path.startswith(self.directory + os.sep):
+            raise ValueError(f'{name} is outside {self.directory}')
+        with open(path, 'rb') as f:
+            body = f.read()
+        stem, ext = os.path.splitext(name)
+        if ext == '.css':
+            body = self.rewrite_css(body, os.path.dirname(name))
+        
+        digest = hashlib.blake2b(body, digest_size=5).hexdigest()
+        content_type = STATIC_TYPES.get(ext, 'application/octet-stream')
+        hashed = f'/static/{stem}.{digest}{ext}'
+        self.files[hashed] = response = PreparedResponse(body, content_type, IMMUTABLE)
+        if content_type.startswith('text/'):
+            response.gzipped()
+        # The plain name keeps working, revalidated like the page
+        self.files[f'/static/{name}'] = PreparedResponse(body, content_type)
+        self.hashed[name] = hashed
+        return hashed
+    
+    def rewrite_css(self, body: bytes, base: str) -> bytes:
+        def replace(match):
+            url = match.group(2)
+            if ':' in url or url.startswith(('/', '#')):
+                return match.group(0)
+            # Font URLs often carry ?v=... or #iefix suffixes
+            path, sep, suffix = url.partition('?') if '?' in url else url.partition('#')
+            try:
+                hashed = self.asset(os.path.normpath(os.path.join(base, path)))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Stylesheet references a missing asset {url}: {e}")
+                return match.group(0)
+            return f'url({hashed}{sep}{suffix})'
+        return CSS_URL.sub(replace, body.decode()).encode()
+    
+    def get(self, path: str) -> Optional[PreparedResponse]:
+        return self.files.get(path)
+
+# Loaded by main(); None until then
+static_assets: Optional[StaticAssets] = None
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one execution
+    
+    The first caller runs the function; callers arriving while it is in
+    flight wait for and share its result (or exception). Shared results must
+    be treated as read-only.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+    
+    def do(self, key, func, *args, **kwargs):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = Future()
+        if not leader:
+            return call.result()
+        
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self.lock:
+                del self.calls[key]
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines on one event loop
+    
+    Concurrent awaits of a key share one task. Each waiter is shielded from
+    the others, so one giving up (timeout, cancellation) leaves the call
+    running for the rest.
+    """
+    def __init__(self):
+        self.calls = {}
+    
+    async def do(self, key, func, *args):
+        task = self.calls.get(key)
+        if task is None:
+            task = self.calls[key] = asyncio.ensure_future(func(*args))
+            task.add_done_callback(lambda done: self.calls.pop(key) if self.calls.get(key) is done else None)
+        return await asyncio.shield(task)
+
+async def settle(value):
+    """`value`, awaited first if it is awaitable
+    
+    Sections and cache loaders may be plain functions (procfs reads, test
+    fakes) or coroutine functions (anything doing I/O).
+    """
+    return await value if inspect.isawaitable(value) else value
+
+class EventLoopThread:
+    """The asyncio event loop every data source runs on, on one daemon thread
+    
+    Collectors, VictoriaMetrics requests, ICMP probes and netlink listeners
+    are tasks or readers on this loop, so a hung source holds a task rather
+    than a thread. Other threads (HTTP handlers) hand it work with run();
+    code already on the loop must await instead, as run() would wait on
+    itself.
+    """
+    def __init__(self, name: str = 'data-sources'):
+        self.name = name
+        self.lock = threading.Lock()
+        self.loop = None
+        self.thread = None
+    
+    def ensure_started(self) -> asyncio.AbstractEventLoop:
+        with self.lock:
+            if self.loop is None:
+                loop = asyncio.new_event_loop()
+                self.thread = threading.Thread(target=loop.run_forever, name=self.name, daemon=True)
+                self.thread.start()
+                self.loop = loop
+            return self.loop
+    
+    def submit(self, coro) -> Future:
+        """Schedule `coro` on the loop from any thread"""
+        return asyncio.run_coroutine_threadsafe(coro, self.ensure_started())
+    
+    def run(self, coro, timeout: Optional[float] = None):
+        """Run `coro` on the loop and wait for it; it is cancelled if it outlasts `timeout`"""
+        if self.thread is not None and threading.current_thread() is self.thread:
+            coro.close()
+            raise RuntimeError("EventLoopThread.run() called on the loop itself; await instead")
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+    
+    def call_soon(self, callback, *args):
+        self.ensure_started().call_soon_threadsafe(callback, *args)
+
+data_sources = EventLoopThread()
+
+async def read_http_response(reader: asyncio.StreamReader) -> tuple:
+    """(status, headers, body, keep_alive) of one HTTP/1.x response"""
+    version, status = (await reader.readuntil(b'\r\n')).split(None, 2)[:2]
+    headers = {}
+    while True:
+        line = await reader.readuntil(b'\r\n')
+        if line == b'\r\n':
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    connection = headers.get('connection', '').lower()
+    keep_alive = connection == 'keep-alive' or (version == b'HTTP/1.1' and connection != 'close')
+    
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        chunks = []
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            if not size:
+                # Skip trailers up to the blank line
+                while await reader.readuntil(b'\r\n') != b'\r\n':
+                    pass
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        body = b''.join(chunks)
+    elif 'content-length' in headers:
+        body = await reader.readexactly(int(headers['content-length']))
+    else:
+        body = await reader.read()
+        keep_alive = False
+    return int(status), headers, body, keep_alive
+
+# Histogram buckets: seconds from cache hits to slow range queries, and body bytes
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+def prometheus_labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+class Counter:
+    """Labelled Prometheus counter"""
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+        self.lock = threading.Lock()
+    
+    def inc(self, *labels, amount: float = 1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+    
+    def render(self) -> list:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self.lock:
+            for labels, value in sorted(self.values.items()):
+                lines.append(f'{self.name}{prometheus_labels(self.labels, labels)} {value}')
+        return lines
+
+class Histogram:
+    """Labelled Prometheus histogram; observe() is cheap enough for hot paths"""
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}  # label values -> [per-bucket counts (+Inf last), sum]
+        self.lock = threading.Lock()
+    
+    def observe(self, value: float, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+    
+    def render(self) -> list:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            snapshot = sorted((labels, list(counts), total) for labels, (counts, total) in self.series.items())
+        for labels, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                le = prometheus_labels(self.labels + ('le',), labels + (bound,))
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            label_text = prometheus_labels(self.labels, labels)
+            lines.append(f'{self.name}_sum{label_text} {total:.6f}')
+            lines.append(f'{self.name}_count{label_text} {cumulative}')
+        return lines
+
+class MetricsRegistry:
+    """Everything /metrics exposes: registered metrics plus callbacks rendered at scrape time"""
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+    
+    def counter(self, name: str, help: str, labels: tuple = ()) -> Counter:
+        metric = Counter(name, help, labels)
+        self.metrics.append(metric)
+        return metric
+    
+    def histogram(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+    
+    def render(self) -> bytes:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collect in self.collectors:
+            try:
+                lines.extend(collect())
+            except Exception as e:
+                logger.error(f"Error rendering metrics: {e}")
+        return ('\n'.join(lines) + '\n').encode()
+
+instrumentation = MetricsRegistry()
+SECTION_DURATION = instrumentation.histogram(
+    'dashboard_section_duration_seconds', 'Time to collect one dashboard section', ('section',))
+SECTION_ERRORS = instrumentation.counter(
+    'dashboard_section_errors_total', 'Dashboard section collections that failed', ('section',))
+VM_QUERY_DURATION = instrumentation.histogram(
+    'dashboard_victoriametrics_query_duration_seconds', 'VictoriaMetrics round-trip time by query', ('query', 'endpoint'))
+VM_QUERY_ERRORS = instrumentation.counter(
+    'dashboard_victoriametrics_query_errors_total', 'VictoriaMetrics requests that failed', ('query', 'endpoint'))
+HTTP_DURATION = instrumentation.histogram(
+    'dashboard_http_request_duration_seconds', 'HTTP request handling time by route', ('route',))
+HTTP_RESPONSE_SIZE = instrumentation.histogram(
+    'dashboard_http_response_size_bytes', 'HTTP response body size by route', ('route',), SIZE_BUCKETS)
+HTTP_RESPONSES = instrumentation.counter(
+    'dashboard_http_responses_total', 'HTTP responses by route and status', ('route', 'code'))
+
+class VictoriaMetricsError(Exception):
+    """VictoriaMetrics answered, but not with a successful query result"""
+
+class VictoriaMetricsClient:
+    """VictoriaMetrics query client shared by every collector
+    
+    Requests run on the data-source loop over a small pool of HTTP/1.1
+    keep-alive connections, identical in-flight requests are coalesced, and
+    several instant queries can share one round-trip (query_many). The
+    coroutines (aquery, aquery_range, aquery_many) are for code on the loop;
+    the plain methods are for other threads and block until the loop
+    answers.
+    """
+    # Label query_many tags each sub-query's series with
+    batch_label = 'dashboard_query'
+    
+    def __init__(self, base_url: str, max_idle: int = 8):
+        parsed = urllib.parse.urlsplit(base_url)
+        self.base_url = base_url.rstrip('/')
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 80
+        self.prefix = parsed.path.rstrip('/')
+        self.max_idle = max_idle
+        self.idle = deque()  # (reader, writer); only touched on the loop
+        # Resolved once: connecting to numeric addresses skips the resolver's executor thread
+        self.addresses = None
+        self.single_flight = AsyncSingleFlight()
+    
+    async def acquire(self) -> tuple:
+        while self.idle:
+            reader, writer = self.idle.pop()
+            # The server may have closed it while it sat idle
+            if not reader.at_eof() and not writer.is_closing():
+                return reader, writer, True
+            writer.close()
+        if self.addresses is None:
+            infos = await asyncio.get_running_loop().getaddrinfo(self.host, self.port, type=socket.SOCK_STREAM)
+            self.addresses = [info[4][:2] for info in infos]
+        error = None
+        for host, port in self.addresses:
+            try:
+                reader, writer = await asyncio.open_connection(host, port)
+                return reader, writer, False
+            except OSError as e:
+                error = e
+        raise error or OSError(f"no address for {self.host}")
+    
+    def release(self, reader, writer):
+        if len(self.idle) < self.max_idle:
+            self.idle.append((reader, writer))
+        else:
+            writer.close()
+    
+    def close(self):
+        def close_idle():
+            while self.idle:
+                self.idle.pop()[1].close()
+        data_sources.call_soon(close_idle)
+    
+    async def aget(self, path: str, params: Dict[str, Any], timeout: float = 2, name: str = 'query') -> Dict[str, Any]:
+        """GET a JSON API path; identical concurrent requests share one round-trip
+        
+        `name` labels the request's latency in /metrics.
+        """
+        target = f"{self.prefix}{path}?{urllib.parse.urlencode(params)}"
+        return await self.single_flight.do(target, self.timed_fetch, target, timeout, name, path.rsplit('/', 1)[-1])
+    
+    async def timed_fetch(self, target: str, timeout: float, name: str, endpoint: str) -> Dict[str, Any]:
+        start = time.monotonic()
+        try:
+            return await self.fetch(target, timeout)
+        except Exception:
+            VM_QUERY_ERRORS.inc(name, endpoint)
+            raise
+        finally:
+            VM_QUERY_DURATION.observe(time.monotonic() - start, name, endpoint)
+    
+    async def fetch(self, target: str, timeout: float) -> Dict[str, Any]:
+        request = (f"GET {target} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                   f"Accept: application/json\r\n\r\n").encode()
+        async with asyncio.timeout(timeout):
+            # A pooled connection may have been closed by the server while idle;
+            # that only shows up on use, so retry once on a fresh connection
+            for attempt in range(2):
+                reader, writer, reused = await self.acquire()
+                try:
+                    writer.write(request)
+                    await writer.drain()
+                    status, _, body, keep_alive = await read_http_response(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    writer.close()
+                    if reused and attempt == 0:
+                        continue
+                    raise
+                except BaseException:
+                    # Including cancellation: a half-read response can't be reused
+                    writer.close()
+                    raise
                 
-                getCacheGradient() {
-                    if (this.loading) return 'from-cyan-400 to-blue-500 animate-pulse';
-                    
-                    const percent = parseFloat(this.stats.cacheHitRate);
-                    if (isNaN(percent)) return 'from-cyan-400 to-blue-500';
-                    
-                    if (percent > 80) return 'from-green-400 to-emerald-500';
-                    if (percent > 60) return 'from-cyan-400 to-blue-500';
-                    if (percent > 40) return 'from-amber-400 to-yellow-500';
-                    return 'from-red-400 to-rose-500';
-                }
-            }));
+                if keep_alive:
+                    self.release(reader, writer)
+                else:
+                    writer.close()
+                if status != 200:
+                    raise VictoriaMetricsError(f"HTTP {status}: {body[:200].decode(errors='replace')}")
+                return json.loads(body)
+    
+    async def aquery(self, query: str, timeout: float = 2, name: str = 'query') -> list:
+        """Instant query; returns the result vector (possibly empty)"""
+        data = await self.aget('/api/v1/query', {'query': query}, timeout, name)
+        if data.get('status') != 'success':
+            raise VictoriaMetricsError(data.get('error', 'query failed'))
+        return data.get('data', {}).get('result') or []
+    
+    async def aquery_range(self, query: str, start: int, end: int, step: int, timeout: float = 10,
+                           name: str = 'query_range') -> list:
+        """Range query; returns the result matrix (possibly empty)"""
+        data = await self.aget('/api/v1/query_range', {'query': query, 'start': start, 'end': end, 'step': step},
+                               timeout, name)
+        if data.get('status') != 'success':
+            raise VictoriaMetricsError(data.get('error', 'query failed'))
+        return data.get('data', {}).get('result') or []
+    
+    async def aquery_many(self, queries: Dict[str, str], timeout: float = 2, name: str = 'batch') -> Dict[str, list]:
+        """Run several instant queries in one round-trip
+        
+        Each query's series are tagged with a distinct `dashboard_query` label
+        via label_replace and the parts are joined with `or`; the combined
+        result is split back up by that label. If VictoriaMetrics rejects
+        the combined query, the queries are sent separately (concurrently)
+        instead.
+        """
+        parts = [
+            f'label_replace({query}, "{self.batch_label}", "{name}", "", "")'
+            for name, query in queries.items()
+        ]
+        try:
+            combined = await self.aquery(' or '.join(parts), timeout, name)
+        except VictoriaMetricsError as e:
+            logger.warning(f"Batched query rejected, falling back to single queries: {e}")
+            results = await asyncio.gather(*(self.aquery(query, timeout, f'{name}.{part}')
+                                             for part, query in queries.items()))
+            return dict(zip(queries, results))
+        
+        results = {part: [] for part in queries}
+        for item in combined:
+            metric = dict(item.get('metric', {}))
+            part = metric.pop(self.batch_label, None)
+            if part in results:
+                results[part].append(dict(item, metric=metric))
+        return results
+    
+    # Blocking versions for threads off the loop; the loop's own timeout fires first
+    def query(self, query: str, timeout: float = 2, name: str = 'query') -> list:
+        return data_sources.run(self.aquery(query, timeout, name), timeout + 1)
+    
+    def query_range(self, query: str, start: int, end: int, step: int, timeout: float = 10,
+                    name: str = 'query_range') -> list:
+        return data_sources.run(self.aquery_range(query, start, end, step, timeout, name), timeout + 1)
+    
+    def query_many(self, queries: Dict[str, str], timeout: float = 2, name: str = 'batch') -> Dict[str, list]:
+        return data_sources.run(self.aquery_many(queries, timeout, name), timeout + 1)
+
+# rtnetlink constants (linux/netlink.h, linux/rtnetlink.h, linux/if_addr.h)
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+NLM_F_REQUEST = 0x1
+NLM_F_DUMP = 0x300
+RTM_NEWADDR = 20
+RTM_DELADDR = 21
+RTM_GETADDR = 22
+RTM_NEWNEIGH = 28
+RTM_DELNEIGH = 29
+RTM_GETNEIGH = 30
+RTMGRP_NEIGH = 0x4  # 1 << (RTNLGRP_NEIGH - 1)
+RTMGRP_IPV4_IFADDR = 0x10
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+IFA_LABEL = 3
+NDA_DST = 1
+NDA_LLADDR = 2
+NLMSG_HEADER = struct.Struct('=IHHII')  # len, type, flags, seq, pid
+IFADDRMSG = struct.Struct('=BBBBI')  # family, prefixlen, flags, scope, index
+NDMSG = struct.Struct('=BxxxiHBB')  # family, ifindex, state, flags, type
+# Neighbor (NUD_*) states, linux/neighbour.h
+NUD_STATES = {
+    0x01: 'INCOMPLETE',
+    0x02: 'REACHABLE',
+    0x04: 'STALE',
+    0x08: 'DELAY',
+    0x10: 'PROBE',
+    0x20: 'FAILED',
+    0x40: 'NOARP',
+    0x80: 'PERMANENT'
+}
+# States in which a neighbor has a usable link-layer address, i.e. is present
+NUD_PRESENT = frozenset(['REACHABLE', 'STALE', 'DELAY', 'PROBE', 'PERMANENT'])
+RTATTR_HEADER = struct.Struct('=HH')  # len, type
+
+def nlmsg_align(length: int) -> int:
+    return (length + 3) & ~3
+
+def parse_nlmsgs(data: bytes):
+    """Yield (type, flags, seq, payload) for each netlink message in a buffer"""
+    offset = 0
+    while offset + NLMSG_HEADER.size <= len(data):
+        length, msg_type, flags, seq, _ = NLMSG_HEADER.unpack_from(data, offset)
+        if length < NLMSG_HEADER.size:
+            break
+        yield msg_type, flags, seq, data[offset + NLMSG_HEADER.size:offset + length]
+        offset += nlmsg_align(length)
+
+def parse_rtattrs(data: bytes, offset: int) -> Dict[int, bytes]:
+    """Route attributes (type -> payload) starting at offset"""
+    attrs = {}
+    while offset + RTATTR_HEADER.size <= len(data):
+        length, attr_type = RTATTR_HEADER.unpack_from(data, offset)
+        if length < RTATTR_HEADER.size:
+            break
+        attrs[attr_type] = data[offset + RTATTR_HEADER.size:offset + length]
+        offset += nlmsg_align(length)
+    return attrs
+
+class RouteNetlink:
+    """Minimal rtnetlink client: reads interface addresses without running `ip`
+    
+    Every read comes as a blocking method for threads and an a-prefixed
+    coroutine (aaddresses, aneighbors) that waits on the event loop instead.
+    """
+    def __init__(self):
+        self.sequence = itertools.count(1)
+    
+    def dump_request(self, msg_type: int, payload: bytes) -> tuple:
+        seq = next(self.sequence) & 0xffffffff
+        return seq, NLMSG_HEADER.pack(NLMSG_HEADER.size + len(payload), msg_type,
+                                      NLM_F_REQUEST | NLM_F_DUMP, seq, 0) + payload
+    
+    def collect(self, data: bytes, seq: int, replies: list) -> bool:
+        """Append the (type, payload) replies to `seq` in `data` to `replies`; True once the dump is done"""
+        for reply_type, _, reply_seq, body in parse_nlmsgs(data):
+            if reply_seq != seq:
+                continue
+            if reply_type == NLMSG_DONE:
+                return True
+            if reply_type == NLMSG_ERROR:
+                errno = -struct.unpack_from('=i', body)[0]
+                if errno:
+                    raise OSError(errno, os.strerror(errno))
+                return True
+            replies.append((reply_type, body))
+        return False
+    
+    def dump(self, msg_type: int, payload: bytes, timeout: float = 1.0) -> list:
+        """Send a dump request and return (type, payload) for every reply message"""
+        seq, request = self.dump_request(msg_type, payload)
+        replies = []
+        with socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE) as sock:
+            sock.settimeout(timeout)
+            sock.sendto(request, (0, 0))
+            while not self.collect(sock.recv(65536), seq, replies):
+                pass
+        return replies
+    
+    async def adump(self, msg_type: int, payload: bytes, timeout: float = 1.0) -> list:
+        """dump() on the event loop"""
+        seq, request = self.dump_request(msg_type, payload)
+        replies = []
+        loop = asyncio.get_running_loop()
+        with socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE) as sock:
+            sock.setblocking(False)
+            sock.sendto(request, (0, 0))
+            async with asyncio.timeout(timeout):
+                while not self.collect(await loop.sock_recv(sock, 65536), seq, replies):
+                    pass
+        return replies
+    
+    def subscribe(self, groups: int) -> socket.socket:
+        """A socket receiving the events of the given RTMGRP_* multicast groups"""
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+        try:
+            sock.bind((0, groups))
+        except OSError:
+            sock.close()
+            raise
+        return sock
+    
+    def addresses(self, family: int = socket.AF_INET) -> Dict[str, list]:
+        """Interface name -> [(address, prefix_length), ...] from RTM_GETADDR"""
+        return self.parse_addresses(self.dump(RTM_GETADDR, IFADDRMSG.pack(family, 0, 0, 0, 0)))
+    
+    async def aaddresses(self, family: int = socket.AF_INET) -> Dict[str, list]:
+        return self.parse_addresses(await self.adump(RTM_GETADDR, IFADDRMSG.pack(family, 0, 0, 0, 0)))
+    
+    def parse_addresses(self, replies: list) -> Dict[str, list]:
+        result = {}
+        for msg_type, body in replies:
+            if msg_type != RTM_NEWADDR or len(body) < IFADDRMSG.size:
+                continue
+            addr_family, prefix_length, _, _, index = IFADDRMSG.unpack_from(body)
+            attrs = parse_rtattrs(body, IFADDRMSG.size)
+            # On point-to-point links (ppp0) IFA_ADDRESS is the peer; IFA_LOCAL is ours
+            raw = attrs.get(IFA_LOCAL) or attrs.get(IFA_ADDRESS)
+            if raw is None:
+                continue
+            try:
+                name = socket.if_indextoname(index)
+            except OSError:
+                name = attrs.get(IFA_LABEL, b'').rstrip(b'\0').decode()
+            result.setdefault(name, []).append((socket.inet_ntop(addr_family, raw), prefix_length))
+        return result
+
+    def neighbors(self) -> Dict[tuple, Dict[str, Any]]:
+        """(interface, IP) -> neighbor entry for every IPv4 and IPv6 neighbor, from RTM_GETNEIGH"""
+        return self.parse_neighbors(self.dump(RTM_GETNEIGH, NDMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0)))
+    
+    async def aneighbors(self) -> Dict[tuple, Dict[str, Any]]:
+        return self.parse_neighbors(await self.adump(RTM_GETNEIGH, NDMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0)))
+    
+    def parse_neighbors(self, replies: list) -> Dict[tuple, Dict[str, Any]]:
+        result = {}
+        for msg_type, body in replies:
+            neighbor = parse_neighbor(body) if msg_type == RTM_NEWNEIGH else None
+            if neighbor is not None:
+                result[neighbor['ifname'], neighbor['ip']] = neighbor
+        return result
+
+def parse_neighbor(body: bytes) -> Optional[Dict[str, Any]]:
+    """A neighbor entry from an RTM_NEWNEIGH/RTM_DELNEIGH payload, or None if it has no address"""
+    if len(body) < NDMSG.size:
+        return None
+    family, index, state, _, _ = NDMSG.unpack_from(body)
+    if family not in (socket.AF_INET, socket.AF_INET6):
+        return None
+    attrs = parse_rtattrs(body, NDMSG.size)
+    if NDA_DST not in attrs:
+        return None
+    lladdr = attrs.get(NDA_LLADDR, b'')
+    try:
+        ifname = socket.if_indextoname(index)
+    except OSError:
+        ifname = str(index)
+    return {
+        'ip': socket.inet_ntop(family, attrs[NDA_DST]),
+        'family': 6 if family == socket.AF_INET6 else 4,
+        'mac': ':'.join(f'{b:02x}' for b in lladdr) if lladdr else None,
+        'ifname': ifname,
+        'state': NUD_STATES.get(state, 'NONE')
+    }
+
+class NeighborTable:
+    """The kernel neighbor table (ARP and IPv6 ND), kept current from netlink events
+    
+    After one RTM_GETNEIGH dump, a reader on the data-source loop applies
+    RTM_NEWNEIGH and RTM_DELNEIGH events as they arrive, so reading the table costs nothing
+    and states are the kernel's own (REACHABLE, STALE, DELAY, PROBE, ...).
+    The table is replaced, never mutated, so readers need no lock. Every
+    dump waits on the loop rather than blocking it.
+    """
+    def __init__(self, netlink: RouteNetlink):
+        self.netlink = netlink
+        self.lock = asyncio.Lock()
+        self.neighbors = {}
+        self.sock = None
+        self.started = False
+        self.resync_task = None
+        self.dirty = False
+    
+    async def ensure_started(self):
+        async with self.lock:
+            if self.started:
+                return
+            try:
+                sock = self.netlink.subscribe(RTMGRP_NEIGH)
+            except OSError as e:
+                logger.warning(f"Can't subscribe to neighbor changes, dumping the table on every refresh: {e}")
+                self.started = True
+                return
+            try:
+                # Subscribe before the initial dump so no change falls in between
+                self.neighbors = await self.netlink.aneighbors()
+            except OSError as e:
+                # Not started, so the next refresh subscribes and dumps again
+                logger.warning(f"Error dumping the neighbor table, retrying on the next refresh: {e}")
+                sock.close()
+                return
+            self.sock = sock
+            self.started = True
+            asyncio.get_running_loop().add_reader(sock, self.handle_events)
+    
+    async def get_neighbors(self) -> Dict[tuple, Dict[str, Any]]:
+        """(interface, IP) -> {ip, family, mac, ifname, state}; treat as read-only"""
+        await self.ensure_started()
+        if self.sock is None:
+            return await self.netlink.aneighbors()
+        return self.neighbors
+    
+    def handle_events(self):
+        updates = []
+        resync = False
+        try:
+            while True:
+                data = self.sock.recv(65536, socket.MSG_DONTWAIT)
+                for msg_type, _, _, body in parse_nlmsgs(data):
+                    if msg_type in (RTM_NEWNEIGH, RTM_DELNEIGH):
+                        updates.append((msg_type, parse_neighbor(body)))
+        except BlockingIOError:
+            pass
+        except OSError as e:
+            # ENOBUFS: events were dropped, so the table can't be patched any more
+            logger.debug(f"Neighbor event socket: {e}")
+            resync = True
+        
+        if resync or self.resync_task is not None:
+            # A dump in flight may predate these events, so it runs again after them
+            self.dirty = True
+            if self.resync_task is None:
+                self.resync_task = asyncio.ensure_future(self.resync())
+            return
+        if not updates:
+            return
+        neighbors = dict(self.neighbors)
+        for msg_type, neighbor in updates:
+            if neighbor is None:
+                continue
+            key = (neighbor['ifname'], neighbor['ip'])
+            if msg_type == RTM_NEWNEIGH:
+                neighbors[key] = neighbor
+            else:
+                neighbors.pop(key, None)
+        self.neighbors = neighbors
+    
+    async def resync(self):
+        try:
+            while self.dirty:
+                self.dirty = False
+                try:
+                    self.neighbors = await self.netlink.aneighbors()
+                except OSError as e:
+                    logger.error(f"Error re-reading the neighbor table: {e}")
+                    return
+        finally:
+            self.resync_task = None
+
+class AddressTracker:
+    """Interface addresses and the external WAN IP, kept current from netlink events
+    
+    A reader on the data-source loop listens for RTM_NEWADDR/RTM_DELADDR and
+    re-reads the address table (without blocking the loop) only when it
+    changes, so refreshes cost nothing. The external IP (only needed behind
+    CGNAT, when no WAN interface has a public address) is looked up over
+    HTTPS by a task on that loop, cached for `external_ttl`, and re-resolved
+    early whenever an address changes.
+    """
+    external_url = 'https://ifconfig.me/ip'
+    external_ttl = 6 * 3600
+    retry_interval = 300
+    
+    def __init__(self, netlink: RouteNetlink):
+        self.netlink = netlink
+        self.lock = threading.Lock()
+        self.start_lock = asyncio.Lock()
+        self.addresses = {}
+        self.external_ip = None
+        self.resolved_at = None  # wall-clock time of the last successful lookup
+        self.external_stale = True
+        self.next_lookup = 0.0
+        self.resolving = False
+        self.sock = None
+        self.started = False
+        self.reload_task = None
+        self.dirty = False
+    
+    async def ensure_started(self):
+        async with self.start_lock:
+            if self.started:
+                return
+            try:
+                sock = self.netlink.subscribe(RTMGRP_IPV4_IFADDR)
+            except OSError as e:
+                logger.warning(f"Can't subscribe to address changes, reading them on every refresh: {e}")
+                self.started = True
+                return
+            try:
+                # Subscribe before the initial dump so no change falls in between
+                self.addresses = await self.netlink.aaddresses()
+            except OSError as e:
+                # Not started, so the next refresh subscribes and dumps again
+                logger.warning(f"Error reading interface addresses, retrying on the next refresh: {e}")
+                sock.close()
+                return
+            self.sock = sock
+            self.started = True
+            asyncio.get_running_loop().add_reader(sock, self.handle_events)
+    
+    async def get_addresses(self) -> Dict[str, list]:
+        await self.ensure_started()
+        if self.sock is None:
+            return await self.netlink.aaddresses()
+        return self.addresses
+    
+    def get_external_ip(self) -> Optional[str]:
+        """Cached external IP (possibly from before the last change); schedules a lookup if stale"""
+        with self.lock:
+            expired = self.resolved_at is None or time.time() - self.resolved_at > self.external_ttl
+            if (self.external_stale or expired) and not self.resolving and time.monotonic() >= self.next_lookup:
+                self.resolving = True
+                data_sources.submit(self.resolve_external())
+            return self.external_ip
+    
+    def handle_events(self):
+        changed = False
+        try:
+            while True:
+                data = self.sock.recv(65536, socket.MSG_DONTWAIT)
+                changed |= any(msg_type in (RTM_NEWADDR, RTM_DELADDR) for msg_type, _, _, _ in parse_nlmsgs(data))
+        except BlockingIOError:
+            pass
+        except OSError as e:
+            # ENOBUFS: events were dropped, so assume something changed
+            logger.debug(f"Address event socket: {e}")
+            changed = True
+        if not changed:
+            return
+        # A dump in flight may predate this change, so it runs again after it
+        self.dirty = True
+        if self.reload_task is None:
+            self.reload_task = asyncio.ensure_future(self.reload())
+    
+    async def reload(self):
+        try:
+            while self.dirty:
+                self.dirty = False
+                try:
+                    addresses = await self.netlink.aaddresses()
+                except OSError as e:
+                    logger.error(f"Error re-reading interface addresses: {e}")
+                    return
+                with self.lock:
+                    self.addresses = addresses
+                    self.external_stale = True
+                    self.next_lookup = 0.0
+                logger.info("Interface addresses changed, external IP will be re-resolved")
+        finally:
+            self.reload_task = None
+    
+    async def resolve_external(self):
+        # Only needed behind CGNAT, so most routers never load ssl
+        import ssl
+        url = urllib.parse.urlsplit(self.external_url)
+        try:
+            async with asyncio.timeout(3):
+                reader, writer = await asyncio.open_connection(url.hostname, url.port or 443,
+                                                               ssl=ssl.create_default_context())
+                try:
+                    writer.write(f"GET {url.path or '/'} HTTP/1.1\r\nHost: {url.hostname}\r\n"
+                                 f"User-Agent: router-dashboard\r\nConnection: close\r\n\r\n".encode())
+                    status, _, body, _ = await read_http_response(reader)
+                finally:
+                    writer.close()
+            if status != 200:
+                raise ValueError(f"HTTP {status}")
+            ip = body[:64].decode().strip()
+            if ipaddress.ip_address(ip).version != 4:
+                raise ValueError(f"not an IPv4 address: {ip!r}")
+        except Exception as e:
+            logger.warning(f"External IP lookup failed: {e}")
+            with self.lock:
+                self.resolving = False
+                self.next_lookup = time.monotonic() + self.retry_interval
+            return
+        with self.lock:
+            self.resolving = False
+            if ip != self.external_ip:
+                logger.info(f"External IP is {ip}")
+            self.external_ip = ip
+            self.resolved_at = time.time()
+            self.external_stale = False
+            self.next_lookup = time.monotonic() + self.retry_interval
+
+ICMP_ECHO_REPLY = 0
+ICMP_ECHO_REQUEST = 8
+
+def icmp_checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b'\0'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+class IcmpProber:
+    """Concurrent ICMP echo probes as readers on the event loop, without forking `ping`
+    
+    Uses unprivileged ICMP datagram sockets (net.ipv4.ping_group_range) and
+    falls back to raw sockets, which the service's CAP_NET_RAW allows.
+    """
+    payload = b'router-dashboard'
+    
+    def __init__(self):
+        self.sequence = itertools.count(1)
+        self.raw = False
+    
+    def open_socket(self) -> socket.socket:
+        if not self.raw:
+            try:
+                return socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+            except PermissionError:
+                logger.info("ICMP datagram sockets not permitted, using raw sockets")
+                self.raw = True
+        return socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+    
+    async def probe(self, hosts: list, timeout: float = 1.0) -> Dict[str, Optional[float]]:
+        """Echo every host at once; returns host -> round-trip ms (None if no reply)"""
+        loop = asyncio.get_running_loop()
+        results = {host: None for host in hosts}
+        pending = {}
+        finished = loop.create_future()
+        
+        def receive(sock):
+            host, ident, seq, sent = pending[sock]
+            try:
+                data, address = sock.recvfrom(2048)
+            except OSError:
+                return
+            if self.raw:
+                # Raw sockets see every ICMP packet, IP header included
+                if address[0] != host:
+                    return
+                data = data[(data[0] & 0x0f) * 4:]
+            if len(data) < 8:
+                return
+            reply_type, _, _, reply_ident, reply_seq = struct.unpack_from('!BBHHH', data)
+            if reply_type != ICMP_ECHO_REPLY or reply_seq != seq:
+                return
+            if self.raw and reply_ident != ident:
+                return
+            results[host] = round((time.monotonic() - sent) * 1000, 2)
+            loop.remove_reader(sock)
+            del pending[sock]
+            sock.close()
+            if not pending and not finished.done():
+                finished.set_result(None)
+        
+        try:
+            for host in hosts:
+                sock = self.open_socket()
+                sock.setblocking(False)
+                # Datagram sockets get their ICMP id from the kernel; raw ones use ours
+                ident = random.getrandbits(16)
+                seq = next(self.sequence) & 0xffff
+                header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+                checksum = icmp_checksum(header + self.payload)
+                packet = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, checksum, ident, seq) + self.payload
+                pending[sock] = (host, ident, seq, time.monotonic())
+                try:
+                    sock.sendto(packet, (host, 0))
+                except OSError as e:
+                    logger.debug(f"ICMP probe to {host} failed: {e}")
+                    del pending[sock]
+                    sock.close()
+                    continue
+                loop.add_reader(sock, receive, sock)
             
-            // Services component
-            Alpine.data('servicesApp', () => ({
-                services: [
-                    {
-                        name: 'Metrics',
-                        icon: 'lni-stats-up',
-                        url: '/grafana/d/router-metrics/router-metrics?kiosk&theme=sapphire-dusk'
-                    },
-                    {
-                        name: 'Grafana',
-                        icon: 'lni-bar-chart',
-                        url: '/grafana'
-                    },
-                    {
-                        name: 'VictoriaMetrics',
-                        icon: 'lni-database',
-                        url: '/victoriametrics'
-                    },
-                    {
-                        name: 'Alertmanager',
-                        icon: 'lni-alarm',
-                        url: '/alertmanager'
-                    },
-                    {
-                        name: 'System Logs',
-                        icon: 'lni-files',
-                        url: '/logs/'
-                    },
-                    {
-                        name: 'VPN Manager',
-                        icon: 'lni-shield',
-                        url: '/vpn-manager'
-                    }
-                ],
-                
-                init() {
-                    // Services are static, no need to subscribe to updates
-                }
-            }));
-        });
-        
-        // Helper function to format bandwidth for display
-        function formatBandwidth(bps) {
-            if (bps < 1000) {
-                return bps.toFixed(0) + ' bps';
-            } else if (bps < 1000000) {
-                return (bps / 1000).toFixed(1) + ' Kbps';
-            } else if (bps < 1000000000) {
-                return (bps / 1000000).toFixed(1) + ' Mbps';
-            } else {
-                return (bps / 1000000000).toFixed(1) + ' Gbps';
-            }
+            if pending:
+                await asyncio.wait([finished], timeout=timeout)
+        finally:
+            for sock in pending:
+                loop.remove_reader(sock)
+                sock.close()
+        return results
+
+class ProcFile:
+    """A /proc file kept open and re-read with pread into a reusable buffer"""
+    def __init__(self, path: str, size: int = 8192):
+        self.path = path
+        self.fd = None
+        self.buffer = bytearray(size)
+    
+    def read(self) -> int:
+        """Refresh the buffer from offset 0; returns the number of valid bytes"""
+        if self.fd is None:
+            self.fd = os.open(self.path, os.O_RDONLY | os.O_CLOEXEC)
+        while True:
+            length = os.preadv(self.fd, [self.buffer], 0)
+            if length < len(self.buffer):
+                return length
+            # Didn't fit: grow and read again from the start
+            self.buffer = bytearray(len(self.buffer) * 2)
+    
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+# Network interfaces shown on the dashboard
+# The bridge LAN clients sit behind
+LAN_INTERFACE = 'br-lan'
+DASHBOARD_INTERFACES = ('br-lan', 'eth0', 'ppp0', 'tailscale0', 'enp1s0', 'enp2s0', 'enp3s0', 'enp4s0')
+
+class ProcSampler:
+    """Persistent readers for the /proc files behind the system sections
+    
+    Files stay open and are re-read with pread into their own buffers; only
+    the fields the dashboard shows are parsed. CPU times from the previous
+    sample are kept here, so usage is a real delta (aggregate and per core)
+    from the very first request.
+    """
+    def __init__(self, root: str = '/proc'):
+        self.stat = ProcFile(f'{root}/stat')
+        self.meminfo = ProcFile(f'{root}/meminfo')
+        self.uptime_file = ProcFile(f'{root}/uptime', size=128)
+        self.loadavg_file = ProcFile(f'{root}/loadavg', size=128)
+        self.net_dev = ProcFile(f'{root}/net/dev')
+        self.lock = threading.Lock()
+        self.cpu_lock = threading.Lock()
+        self.last_cpu = None
+        try:
+            self.last_cpu = self.read_cpu_times()
+        except OSError as e:
+            logger.warning(f"Can't read CPU times: {e}")
+    
+    def read_cpu_times(self) -> list:
+        """[(total, idle, softirq), ...] for the aggregate line then each core"""
+        with self.lock:
+            length = self.stat.read()
+            # The cpu lines come first; stop parsing at the first other line
+            end = self.stat.buffer.find(b'\nintr', 0, length)
+            lines = bytes(self.stat.buffer[:end if end >= 0 else length]).split(b'\n')
+        times = []
+        for line in lines:
+            if not line.startswith(b'cpu'):
+                break
+            # user nice system idle iowait irq softirq steal
+            values = [int(value) for value in line.split()[1:9]]
+            times.append((sum(values), values[3] + values[4], values[6]))
+        return times
+    
+    def cpu_usage(self) -> Dict[str, Any]:
+        """CPU usage percentages since the previous call"""
+        with self.cpu_lock:
+            current = self.read_cpu_times()
+            previous, self.last_cpu = self.last_cpu, current
+        if not previous or len(previous) != len(current):
+            previous = [(0, 0, 0)] * len(current)
+        
+        usage = []
+        softirq = []
+        for (total, idle, soft), last in zip(current, previous):
+            if total < last[0]:
+                # The line's counters restarted (a core came back online)
+                last = (0, 0, 0)
+            last_total, last_idle, last_soft = last
+            total_diff = total - last_total
+            if total_diff > 0:
+                # iowait may step backwards, so keep the result within 0-100
+                usage.append(round(min(100.0, max(0.0, 100.0 * (1.0 - (idle - last_idle) / total_diff))), 1))
+                softirq.append(round(100.0 * (soft - last_soft) / total_diff, 1))
+            else:
+                usage.append(0.0)
+                softirq.append(0.0)
+        return {
+            'usage_percent': usage[0] if usage else 0.0,
+            'softirq_percent': softirq[0] if softirq else 0.0,
+            'per_core': usage[1:],
+            'per_core_softirq': softirq[1:]
         }
+    
+    def loadavg(self) -> tuple:
+        with self.lock:
+            length = self.loadavg_file.read()
+            fields = bytes(self.loadavg_file.buffer[:length]).split(None, 3)
+        return float(fields[0]), float(fields[1]), float(fields[2])
+    
+    def uptime(self) -> float:
+        with self.lock:
+            length = self.uptime_file.read()
+            return float(bytes(self.uptime_file.buffer[:length]).split(None, 1)[0])
+    
+    def memory(self, keys=(b'MemTotal', b'MemAvailable')) -> Dict[str, int]:
+        """Selected /proc/meminfo fields, in bytes"""
+        result = {}
+        with self.lock:
+            length = self.meminfo.read()
+            buffer = self.meminfo.buffer
+            for key in keys:
+                start = buffer.find(key + b':', 0, length)
+                if start < 0:
+                    continue
+                end = buffer.find(b'\n', start, length)
+                # "MemTotal:       16318928 kB"
+                result[key.decode()] = int(buffer[start + len(key) + 1:end].split()[0]) * 1024
+        return result
+    
+    def interfaces(self, names=DASHBOARD_INTERFACES) -> Dict[str, tuple]:
+        """Interface -> (rx_bytes, rx_packets, tx_bytes, tx_packets) from /proc/net/dev"""
+        wanted = {name.encode() for name in names}
+        result = {}
+        with self.lock:
+            length = self.net_dev.read()
+            lines = bytes(self.net_dev.buffer[:length]).split(b'\n')[2:]  # Skip header lines
+        for line in lines:
+            iface, sep, data = line.partition(b':')
+            iface = iface.strip()
+            if not sep or iface not in wanted:
+                continue
+            values = data.split()
+            result[iface.decode()] = (int(values[0]), int(values[1]), int(values[8]), int(values[9]))
+        return result
+
+class RingBuffer:
+    """Fixed-size ring of floats backed by array('d'); NaN marks a missing sample"""
+    def __init__(self, size: int):
+        self.values = array('d', [math.nan]) * size
+        self.size = size
+        self.index = 0  # next slot to write
+    
+    def append(self, value: float):
+        self.values[self.index] = value
+        self.index = (self.index + 1) % self.size
+    
+    def tail(self, count: int) -> list:
+        """The last `count` values, oldest first"""
+        count = min(count, self.size)
+        start = (self.index - count) % self.size
+        if start + count <= self.size:
+            return self.values[start:start + count].tolist()
+        return self.values[start:].tolist() + self.values[:self.index].tolist()
+
+class LocalHistory:
+    """One hour of 1 s samples for CPU, softirq and interface rates, in memory
+    
+    Sampled by a task on the data-source loop.
+    
+    Every series is a RingBuffer sharing one timestamp ring, so short-range
+    graphs are served by /api/local-history without touching
+    VictoriaMetrics. Series: cpu.total, cpu.<n>, softirq.total, softirq.<n>,
+    <iface>.rx_bps and <iface>.tx_bps.
+    """
+    def __init__(self, seconds: int = 3600, interval: float = 1.0):
+        self.size = int(seconds / interval)
+        self.interval = interval
+        # Own sampler, so its CPU deltas don't reset the cpu section's
+        self.procfs = ProcSampler()
+        self.timestamps = RingBuffer(self.size)
+        self.series = {}
+        self.count = 0
+        self.last_interfaces = None
+        self.lock = threading.Lock()
+        self.task = None
+    
+    def start(self):
+        self.task = data_sources.submit(self.run())
+    
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+    
+    async def run(self):
+        next_sample = time.monotonic()
+        while True:
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"Error sampling local history: {e}")
+            next_sample += self.interval
+            delay = next_sample - time.monotonic()
+            if delay < 0:
+                # Fell behind (suspend, overload): skip ahead rather than burst
+                next_sample = time.monotonic()
+                delay = 0
+            await asyncio.sleep(delay)
+    
+    def sample(self):
+        now = time.monotonic()
+        values = {}
         
-        // Function to fetch and update metrics (for non-Alpine parts)
-        async function updateMetrics() {
-            const startTime = Date.now();
-            
-            try {
-                const response = await fetch('/api/metrics');
-                const fetchTime = Date.now() - startTime;
-                
-                if (!response.ok) {
-                    throw new Error('Failed to fetch metrics');
-                }
-                
-                const data = await response.json();
-                
-                // Update the shared store for Alpine components
-                metricsStore.update(data);
-                
-            } catch (error) {
-                console.error('Error fetching metrics:', error);
-                // On error, remove loading class but show error state
-                document.querySelectorAll('.loading').forEach(el => {
-                    el.classList.remove('loading');
-                    if (!el.textContent || el.textContent === '--') {
-                        el.textContent = 'N/A';
-                    }
-                });
+        usage = self.procfs.cpu_usage()
+        values['cpu.total'] = usage['usage_percent']
+        values['softirq.total'] = usage['softirq_percent']
+        for core, (busy, soft) in enumerate(zip(usage['per_core'], usage['per_core_softirq'])):
+            values[f'cpu.{core}'] = busy
+            values[f'softirq.{core}'] = soft
+        
+        interfaces = self.procfs.interfaces()
+        if self.last_interfaces is not None:
+            last_time, last_counters = self.last_interfaces
+            elapsed = now - last_time
+            for iface, (rx_bytes, _, tx_bytes, _) in interfaces.items():
+                if iface in last_counters and elapsed > 0:
+                    last_rx, _, last_tx, _ = last_counters[iface]
+                    # Counters reset when an interface is re-created; skip that sample
+                    if rx_bytes >= last_rx and tx_bytes >= last_tx:
+                        values[f'{iface}.rx_bps'] = (rx_bytes - last_rx) * 8 / elapsed
+                        values[f'{iface}.tx_bps'] = (tx_bytes - last_tx) * 8 / elapsed
+        self.last_interfaces = (now, interfaces)
+        
+        with self.lock:
+            self.timestamps.append(time.time())
+            for name in values.keys() - self.series.keys():
+                self.series[name] = RingBuffer(self.size)
+            for name, ring in self.series.items():
+                ring.append(values.get(name, math.nan))
+            self.count = min(self.count + 1, self.size)
+    
+    def query(self, seconds: int = 600, step: int = 1, prefixes: Optional[list] = None) -> Dict[str, Any]:
+        """The last `seconds` of samples, averaged into `step`-sample buckets"""
+        count = min(self.count, max(1, int(seconds / self.interval)))
+        step = max(1, step)
+        with self.lock:
+            timestamps = self.timestamps.tail(count)
+            series = {
+                name: ring.tail(count) for name, ring in self.series.items()
+                if not prefixes or any(name.startswith(prefix) for prefix in prefixes)
             }
-        }
         
-        // Function to continuously update metrics with delay after completion
-        async function updateMetricsContinuously() {
-            await updateMetrics();
-            // Wait 5 seconds after the request completes before starting the next one
-            setTimeout(updateMetricsContinuously, 5000);
+        def bucket(values):
+            result = []
+            for start in range(0, len(values), step):
+                chunk = [v for v in values[start:start + step] if not math.isnan(v)]
+                # NaN isn't valid JSON; gaps become null
+                result.append(round(sum(chunk) / len(chunk), 2) if chunk else None)
+            return result
+        
+        return {
+            'interval': self.interval * step,
+            'timestamps': [round(ts, 1) for ts in timestamps[::step]],
+            'series': {name: bucket(values) for name, values in sorted(series.items())}
         }
-        
-        // Start the update cycle
-        updateMetricsContinuously();
-    </script>
-</body>
-</html>
-"""
 
 class MetricsCache:
-    """Simple time-based cache for metrics"""
-    def __init__(self, ttl_seconds=10):
-        self.cache = {}
+    """Bounded LRU cache with a TTL and stale-while-revalidate
+    
+    Entries are fresh for `ttl_seconds`. For `stale_seconds` after that,
+    get_or_refresh still returns them and refreshes in the background.
+    Least recently used entries are evicted beyond `max_entries` or
+    `max_bytes`, with sizes estimated from the compact JSON encoding.
+    """
+    def __init__(self, ttl_seconds=10, stale_seconds=0, max_entries=64, max_bytes=1 << 20):
+        self.cache = OrderedDict()  # key -> (value, timestamp, size)
         self.ttl = ttl_seconds
+        self.stale = stale_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.refreshing = {}  # key -> background refresh task
         self.lock = threading.Lock()
+        self.flight = AsyncSingleFlight()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def lookup(self, key):
+        """(value, age) for a key within ttl + stale, counting nothing; caller holds the lock"""
+        entry = self.cache.get(key)
+        if entry is None:
+            return None, None
+        value, timestamp, size = entry
+        age = time.time() - timestamp
+        if age >= self.ttl + self.stale:
+            del self.cache[key]
+            self.bytes -= size
+            self.expirations += 1
+            return None, None
+        self.cache.move_to_end(key)
+        return value, age
     
     def get(self, key):
+        """The fresh value for `key`, or None"""
         with self.lock:
-            if key in self.cache:
-                value, timestamp = self.cache[key]
-                if time.time() - timestamp < self.ttl:
-                    return value
-                del self.cache[key]
+            value, age = self.lookup(key)
+            if age is not None and age < self.ttl:
+                self.hits += 1
+                return value
+            self.misses += 1
             return None
     
     def set(self, key, value):
+        try:
+            size = len(json.dumps(value, separators=(',', ':'), default=str))
+        except (TypeError, ValueError):
+            size = sys.getsizeof(value)
+        with self.lock:
+            old = self.cache.pop(key, None)
+            if old is not None:
+                self.bytes -= old[2]
+            if size > self.max_bytes:
+                # Would evict everything else and still not fit
+                return
+            self.cache[key] = (value, time.time(), size)
+            self.bytes += size
+            while self.cache and (len(self.cache) > self.max_entries or self.bytes > self.max_bytes):
+                _, (_, _, evicted) = self.cache.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+    
+    async def get_or_refresh(self, key, func):
+        """Cached value for `key`, computing it with `func` on a miss
+        
+        Runs on the data-source loop; `func` may be a plain function or a
+        coroutine function. A stale value is returned as is while one
+        background task recomputes it, so callers never wait on a refresh
+        they can skip. Concurrent misses wait on a single call to `func`.
+        """
+        with self.lock:
+            value, age = self.lookup(key)
+            if age is not None and age < self.ttl:
+                self.hits += 1
+                return value
+            if age is not None:
+                self.stale_hits += 1
+                if key not in self.refreshing:
+                    self.refreshing[key] = asyncio.ensure_future(self.refresh(key, func))
+                return value
+            self.misses += 1
+        return await self.flight.do(key, self.compute, key, func)
+    
+    async def compute(self, key, func):
+        # A flight that finished between our miss and now has already filled the entry
+        with self.lock:
+            value, age = self.lookup(key)
+        if age is not None and age < self.ttl:
+            return value
+        value = await settle(func())
+        self.set(key, value)
+        return value
+    
+    async def refresh(self, key, func):
+        try:
+            self.set(key, await settle(func()))
+        except Exception as e:
+            logger.error(f"Error refreshing cached {key}: {e}")
+        finally:
+            with self.lock:
+                self.refreshing.pop(key, None)
+    
+    def clear(self):
         with self.lock:
-            self.cache[key] = (value, time.time())
+            self.cache.clear()
+            self.bytes = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                'entries': len(self.cache),
+                'bytes': self.bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'stale': self.stale,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'hit_ratio': round((self.hits + self.stale_hits) / lookups, 3) if lookups else None,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
 
 class ClientInfoCache:
     """Cache for client information from network-metrics-exporter"""
@@ -1549,172 +1482,1190 @@ class ClientInfoCache:
         self.cache = {}
         self.ttl = ttl_seconds
         self.lock = threading.Lock()
+        self.flight = AsyncSingleFlight()
         self.last_update = 0
+        self.hits = 0
+        self.misses = 0
     
-    def get_clients(self):
+    async def get_clients(self):
         """Get client information from VictoriaMetrics"""
         with self.lock:
             # Check if cache is still valid
             if time.time() - self.last_update < self.ttl and self.cache:
+                self.hits += 1
                 return self.cache
+            self.misses += 1
+        
+        # Concurrent misses share one query rather than each running their own
+        return await self.flight.do('clients', self.fetch_clients)
+    
+    async def fetch_clients(self):
+        try:
+            # Query client status from network-metrics-exporter
+            clients = {}
             
-            try:
-                # Query client status from network-metrics-exporter
-                clients = {}
-                
-                # Get client status (online/offline)
-                status_query = 'client_status'
-                url = f"http://localhost:8428/api/v1/query?query={urllib.parse.quote(status_query)}"
-                with urllib.request.urlopen(url, timeout=2) as response:
-                    data = json.loads(response.read().decode())
-                    if data.get('status') == 'success' and data.get('data', {}).get('result'):
-                        for item in data['data']['result']:
-                            metric = item['metric']
-                            ip = metric.get('ip', '')
-                            if ip:
-                                clients[ip] = {
-                                    'ip': ip,
-                                    'hostname': metric.get('client', 'unknown'),
-                                    'device_type': metric.get('device_type', 'unknown'),
-                                    'status': float(item['value'][1]) > 0
-                                }
-                
-                # Get active connections per client
-                conn_query = 'client_active_connections'
-                url = f"http://localhost:8428/api/v1/query?query={urllib.parse.quote(conn_query)}"
-                with urllib.request.urlopen(url, timeout=2) as response:
-                    data = json.loads(response.read().decode())
-                    if data.get('status') == 'success' and data.get('data', {}).get('result'):
-                        for item in data['data']['result']:
-                            ip = item['metric'].get('ip', '')
-                            if ip and ip in clients:
-                                clients[ip]['connections'] = int(float(item['value'][1]))
-                
+            results = await victoriametrics.aquery_many({
+                'status': 'client_status',
+                'connections': 'client_active_connections'
+            }, name='client_info')
+            
+            # Client status (online/offline)
+            for item in results['status']:
+                metric = item['metric']
+                ip = metric.get('ip', '')
+                if ip:
+                    clients[ip] = {
+                        'ip': ip,
+                        'hostname': metric.get('client', 'unknown'),
+                        'device_type': metric.get('device_type', 'unknown'),
+                        'status': float(item['value'][1]) > 0
+                    }
+            
+            # Active connections per client
+            for item in results['connections']:
+                ip = item['metric'].get('ip', '')
+                if ip and ip in clients:
+                    clients[ip]['connections'] = int(float(item['value'][1]))
+            
+            with self.lock:
                 self.cache = clients
                 self.last_update = time.time()
-                return clients
-            except Exception as e:
-                logger.error(f"Error getting client info from metrics: {e}")
-                return self.cache  # Return stale cache on error
+            return clients
+        except Exception as e:
+            logger.error(f"Error getting client info from metrics: {e}")
+            return self.cache  # Return stale cache on error
+    
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'entries': len(self.cache),
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / (self.hits + self.misses), 3) if self.hits + self.misses else None
+            }
 
-# Global cache instances
-metrics_cache = MetricsCache(ttl_seconds=5)  # Cache metrics for 5 seconds
-connectivity_cache = MetricsCache(ttl_seconds=30)  # Cache connectivity for 30 seconds
-blocky_cache = MetricsCache(ttl_seconds=10)  # Cache Blocky stats for 10 seconds
-client_info_cache = ClientInfoCache(ttl_seconds=30)  # Cache client info from network-metrics-exporter
-bandwidth_history_cache = MetricsCache(ttl_seconds=15)  # Cache bandwidth histories for 15 seconds
+# Kea's memfile lease database (see kea-dhcp.nix)
+KEA_LEASES_FILE = '/var/lib/kea/kea-leases4.csv'
 
-class MetricsHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        if self.path == '/' or self.path == '/index.html':
-            # Serve the dashboard HTML
-            logger.debug(f"Dashboard request from {self.address_string()}")
-            self.send_response(200)
-            self.send_header('Content-Type', 'text/html')
-            self.end_headers()
-            self.wfile.write(DASHBOARD_HTML.encode())
-            logger.debug(f"Served dashboard HTML ({len(DASHBOARD_HTML)} chars)")
-        elif self.path == '/api/metrics':
-            logger.debug(f"Metrics request from {self.address_string()}")
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
+def read_kea_leases(path: str, now: float) -> Dict[str, str]:
+    """IP -> hostname for the active leases in a Kea memfile CSV"""
+    leases = {}
+    with open(path, newline='') as f:
+        # The file is append-only between cleanups, so later rows win
+        for row in csv.DictReader(f):
+            ip = row.get('address')
+            if not ip:
+                continue
+            hostname = (row.get('hostname') or '').rstrip('.')
+            try:
+                active = row.get('state') == '0' and int(row.get('expire') or 0) > now
+            except ValueError:
+                active = False
+            if active and hostname:
+                leases[ip] = hostname
+            else:
+                leases.pop(ip, None)
+    return leases
+
+def is_ip_address(value: str) -> bool:
+    try:
+        ipaddress.ip_address(value)
+    except ValueError:
+        return False
+    return True
+
+class HostnameResolver:
+    """Names for client IPs, resolved off the request path
+    
+    lookup() never blocks: it answers from network-metrics-exporter client
+    names, DHCP leases (the Kea lease file) and earlier reverse lookups, and
+    queues unknown IPs for a PTR lookup on a background thread. That thread
+    also re-reads the lease file when it has changed, at most every
+    `leases_interval` seconds, so lookups on the event loop never touch the
+    disk. Failed lookups are remembered for `negative_ttl` so an IP without
+    a PTR record isn't retried on every refresh.
+    """
+    positive_ttl = 3600
+    negative_ttl = 300
+    max_entries = 4096
+    leases_interval = 10
+    
+    def __init__(self, leases_file: str = KEA_LEASES_FILE):
+        self.leases_file = leases_file
+        self.lock = threading.Lock()
+        self.leases = {}
+        self.leases_mtime = None
+        self.leases_checked = float('-inf')
+        self.resolved = {}  # ip -> (hostname or None, expiry)
+        self.pending = set()
+        self.queue = queue.Queue()
+        self.thread = None
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+    
+    def ensure_started(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self.run, name='hostname-resolver', daemon=True)
+            self.thread.start()
+    
+    def load_leases(self):
+        try:
+            mtime = os.stat(self.leases_file).st_mtime_ns
+        except OSError:
+            self.leases = {}
+            return
+        if mtime == self.leases_mtime:
+            return
+        try:
+            self.leases = read_kea_leases(self.leases_file, time.time())
+        except (OSError, csv.Error, UnicodeDecodeError) as e:
+            logger.warning(f"Error reading Kea leases from {self.leases_file}: {e}")
+            return
+        self.leases_mtime = mtime
+    
+    def lookup(self, ip: str) -> Optional[str]:
+        """Cached name for `ip`, or None (and a PTR lookup is scheduled)"""
+        known = client_info_cache.cache.get(ip)
+        if known and known.get('hostname') not in (None, '', 'unknown'):
+            return known['hostname']
+        
+        self.ensure_started()
+        now = time.monotonic()
+        with self.lock:
+            if now - self.leases_checked >= self.leases_interval:
+                # None asks the resolver thread to re-check the lease file
+                self.leases_checked = now
+                self.queue.put(None)
+        if ip in self.leases:
+            return self.leases[ip]
+        
+        with self.lock:
+            entry = self.resolved.get(ip)
+            if entry is not None and entry[1] > now:
+                if entry[0] is None:
+                    self.negative_hits += 1
+                else:
+                    self.hits += 1
+                return entry[0]
+            self.misses += 1
+            if ip not in self.pending:
+                self.pending.add(ip)
+                self.queue.put(ip)
+            # An expired name is still better than an IP while it's re-resolved
+            return entry[0] if entry is not None else None
+    
+    def run(self):
+        while True:
+            ip = self.queue.get()
+            if ip is None:
+                self.load_leases()
+                continue
+            try:
+                hostname = socket.gethostbyaddr(ip)[0].rstrip('.') or None
+            except (OSError, UnicodeError):
+                hostname = None
+            self.store(ip, hostname)
+    
+    def store(self, ip: str, hostname: Optional[str]):
+        ttl = self.positive_ttl if hostname else self.negative_ttl
+        with self.lock:
+            self.pending.discard(ip)
+            self.resolved.pop(ip, None)
+            self.resolved[ip] = (hostname, time.monotonic() + ttl)
+            # Oldest lookups first, so this drops the longest-unrefreshed names
+            while len(self.resolved) > self.max_entries:
+                del self.resolved[next(iter(self.resolved))]
+    
+    def clear(self):
+        with self.lock:
+            self.resolved.clear()
+            self.leases_checked = float('-inf')
+        self.leases_mtime = None
+    
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                'entries': len(self.resolved),
+                'leases': len(self.leases),
+                'pending': len(self.pending),
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'hit_ratio': round((self.hits + self.negative_hits) / lookups, 3) if lookups else None
+            }
+
+# (longest duration, step) pairs for client history graphs, in seconds.
+# Keeps graphs responsive at roughly 100 points or fewer per client.
+HISTORY_STEPS = (
+    (600, 30),
+    (1800, 60),
+    (3600, 120),
+    (10800, 300),
+    (21600, 600),
+    (43200, 900),
+    (86400, 1800),
+    (172800, 3600),
+    (259200, 7200),
+    (604800, 14400)
+)
+HISTORY_MAX_STEP = 21600
+HISTORY_MAX_POINTS = 100
+
+def parse_duration(duration: str, default: int = 600) -> int:
+    """'10m', '6h' or '7d' in seconds"""
+    units = {'m': 60, 'h': 3600, 'd': 86400}
+    try:
+        return int(duration[:-1]) * units[duration[-1]]
+    except (KeyError, IndexError, ValueError):
+        return default
+
+def history_step(duration_seconds: int) -> int:
+    for longest, step in HISTORY_STEPS:
+        if duration_seconds <= longest:
+            return step
+    return HISTORY_MAX_STEP
+
+def format_history_labels(timestamps, duration_seconds: int) -> list:
+    """Axis labels for a shared timestamp grid, one strftime per timestamp"""
+    if duration_seconds <= 3600:  # <= 1 hour: show time only
+        fmt = '%H:%M:%S'
+    elif duration_seconds <= 86400:  # <= 24 hours: show hours:minutes
+        fmt = '%H:%M'
+    elif duration_seconds <= 604800:  # <= 1 week: show day and time
+        fmt = '%m/%d %H:%M'
+    else:  # > 1 week: show date only
+        fmt = '%m/%d'
+    return [time.strftime(fmt, time.localtime(ts)) for ts in timestamps]
+
+# Opt-in binary encoding of /api/client-histories (?format=binary or this Accept type)
+HISTORY_BINARY_TYPE = 'application/vnd.router-dashboard.histories'
+HISTORY_BINARY_MAGIC = b'RDH1'
+
+def xor_delta_float32(column) -> array:
+    """Float32 bit patterns, each XORed with the previous one
+    
+    Repeated values (idle clients, flat lines) become zero words and nearby
+    ones share their sign and exponent bits, which gzip then squeezes out.
+    Decoding is an exact running XOR.
+    """
+    words = array('I', array('f', column).tobytes())
+    for i in range(len(words) - 1, 0, -1):
+        words[i] ^= words[i - 1]
+    return words
+
+def encode_client_histories(timestamps, columns: Dict[str, tuple], ips: list, duration_seconds: int, step: int) -> bytes:
+    """Client histories as one shared timestamp vector plus per-client rx/tx columns
+    
+    Layout, little-endian: magic, uint32 header length, JSON header
+    {duration, step, points, ips} padded to 8 bytes, float64 timestamps,
+    then for each IP in header order its rx and tx as xor_delta_float32
+    words. Labels are left to the browser.
+    """
+    header = json.dumps({'duration': duration_seconds, 'step': step, 'points': len(timestamps), 'ips': ips},
+                        separators=(',', ':')).encode()
+    header += b' ' * (-(len(HISTORY_BINARY_MAGIC) + 4 + len(header)) % 8)
+    parts = [HISTORY_BINARY_MAGIC, struct.pack('<I', len(header)), header]
+    body = [array('d', timestamps)]
+    for ip in ips:
+        rx, tx = columns[ip]
+        body.append(xor_delta_float32(rx))
+        body.append(xor_delta_float32(tx))
+    for values in body:
+        if sys.byteorder == 'big':
+            values.byteswap()
+        parts.append(values.tobytes())
+    return b''.join(parts)
+
+def join_client_series(result: list, ips: set) -> tuple:
+    """Join rx/tx range series on timestamp into per-client array('d') columns
+    
+    Returns (timestamps, {ip: (rx, tx)}) where every column lines up with
+    the sorted union of timestamps across all series; a point missing from
+    one series is 0. Series already on the shared grid (the usual case, as
+    VictoriaMetrics aligns range queries to the step) skip the join.
+    """
+    parsed = {}
+    grid = set()
+    for series in result:
+        metric = series.get('metric', {})
+        ip = metric.get('ip')
+        direction = metric.get('direction')
+        if ip not in ips or direction not in ('rx', 'tx'):
+            continue
+        values = series.get('values', [])
+        series_timestamps = [ts for ts, _ in values]
+        parsed.setdefault(ip, {})[direction] = (series_timestamps, array('d', [float(value) for _, value in values]))
+        grid.update(series_timestamps)
+    
+    timestamps = sorted(grid)
+    empty = ([], array('d'))
+    columns = {}
+    for ip, directions in parsed.items():
+        columns[ip] = (align_column(*directions.get('rx', empty), timestamps),
+                       align_column(*directions.get('tx', empty), timestamps))
+    return array('d', timestamps), columns
+
+def align_column(series_timestamps, column: array, timestamps) -> array:
+    """`column` moved onto the `timestamps` grid, 0 where it has no point"""
+    if len(series_timestamps) == len(timestamps) and series_timestamps == timestamps:
+        return column
+    points = dict(zip(series_timestamps, column))
+    return array('d', [points.get(ts, 0.0) for ts in timestamps])
+
+def downsample_mean(timestamps: array, columns: list, max_points: int) -> tuple:
+    """Average every column into at most `max_points` equal-width buckets
+    
+    Buckets are shared by all columns so they keep one timestamp grid; each
+    bucket is labelled with its first timestamp. Bucket sums come from a
+    prefix sum, so each column costs one pass.
+    """
+    count = len(timestamps)
+    if count <= max_points:
+        return timestamps, columns
+    edges = [count * i // max_points for i in range(max_points + 1)]
+    bounds = [(lo, hi, 1.0 / (hi - lo)) for lo, hi in zip(edges, edges[1:])]
+    bucketed = array('d', [timestamps[lo] for lo, _, _ in bounds])
+    averaged = []
+    for column in columns:
+        prefix = list(itertools.accumulate(column, initial=0.0))
+        averaged.append(array('d', [(prefix[hi] - prefix[lo]) * scale for lo, hi, scale in bounds]))
+    return bucketed, averaged
+
+class ClientSeries:
+    """Raw step-aligned bandwidth columns for one client, fetched up to `end`"""
+    __slots__ = ('timestamps', 'rx', 'tx', 'end', 'updated')
+    
+    def __init__(self, timestamps: array, rx: array, tx: array, end: int):
+        self.timestamps = timestamps
+        self.rx = rx
+        self.tx = tx
+        self.end = end
+        self.updated = time.time()
+    
+    @property
+    def nbytes(self) -> int:
+        return (len(self.timestamps) + len(self.rx) + len(self.tx)) * 8
+    
+    def extended(self, tail: 'ClientSeries', since: float, window_start: float) -> 'ClientSeries':
+        """This series with everything from `since` replaced by `tail`, trimmed to the window"""
+        cut = bisect.bisect_left(self.timestamps, since)
+        timestamps = self.timestamps[:cut] + tail.timestamps
+        rx = self.rx[:cut] + tail.rx
+        tx = self.tx[:cut] + tail.tx
+        first = bisect.bisect_left(timestamps, window_start)
+        return ClientSeries(timestamps[first:], rx[first:], tx[first:], tail.end)
+
+# Local rollups of client rates: (bucket seconds, buckets) per tier
+ROLLUP_TIERS = ((60, 1440), (900, 2976))  # 1 min for 24 h, 15 min for 30 d plus a day of slack for step alignment
+ROLLUP_MAGIC = b'RDR1'
+ROLLUP_HEADER = struct.Struct('<4sII')  # magic, slots, tiers
+ROLLUP_TIER = struct.Struct('<II')  # bucket seconds, buckets
+ROLLUP_SLOT = struct.Struct('<56sd')  # ip, last seen
+
+class ClientRollups:
+    """Per-client rx/tx rate rollups in a fixed-layout memory-mapped file
+    
+    Every tier keeps a ring of buckets: a shared int64 bucket number and
+    uint32 sample count per bucket, then float32 rate sums per slot and
+    bucket, slot-major so one client's history is contiguous. Clients own
+    one of `slots` slots; the least recently seen is recycled when they run
+    out. Buckets whose number doesn't match the time they're read for hold
+    nothing. The file is native-endian and only ever read by this host.
+    
+    Nothing is loaded at startup beyond mapping the file, so history
+    recorded before a restart is available at once. A file with another
+    layout is reinitialized.
+    """
+    def __init__(self, path: str, slots: int = 256, tiers: tuple = ROLLUP_TIERS):
+        self.path = path
+        self.slot_count = slots
+        self.tier_specs = tiers
+        self.lock = threading.Lock()
+        self.records = 0
+        self.reads = 0
+        
+        header = ROLLUP_HEADER.pack(ROLLUP_MAGIC, slots, len(tiers)) + b''.join(
+            ROLLUP_TIER.pack(*tier) for tier in tiers)
+        offset = len(header) + ROLLUP_SLOT.size * slots
+        layout = []
+        for _, buckets in tiers:
+            offset = -(-offset // 8) * 8
+            epochs = offset
+            counts = epochs + 8 * buckets
+            rx = -(-(counts + 4 * buckets) // 8) * 8
+            tx = rx + 4 * slots * buckets
+            offset = tx + 4 * slots * buckets
+            layout.append((epochs, counts, rx, tx))
+        size = offset
+        
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size != size or os.pread(fd, len(header), 0) != header:
+                logger.info(f"Initializing client rollups in {path} ({size >> 10} KiB)")
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, size)
+                os.pwrite(fd, header, 0)
+            self.map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        
+        view = memoryview(self.map)
+        self.slot_table = view[len(header):len(header) + ROLLUP_SLOT.size * slots]
+        self.tiers = []
+        for (seconds, buckets), (epochs, counts, rx, tx) in zip(tiers, layout):
+            self.tiers.append((seconds, buckets,
+                               view[epochs:counts].cast('q'),
+                               view[counts:counts + 4 * buckets].cast('I'),
+                               view[rx:tx].cast('f'),
+                               view[tx:tx + 4 * slots * buckets].cast('f')))
+        
+        self.slots = {}
+        self.last_seen = [0.0] * slots
+        for slot in range(slots):
+            ip, seen = ROLLUP_SLOT.unpack_from(self.slot_table, slot * ROLLUP_SLOT.size)
+            ip = ip.rstrip(b'\0').decode()
+            if ip:
+                self.slots[ip] = slot
+                self.last_seen[slot] = seen
+        logger.info(f"Loaded client rollups for {len(self.slots)} clients from {path}")
+    
+    def close(self):
+        with self.lock:
+            self.tiers = []
+            self.slot_table.release()
+            self.map.close()
+    
+    def slot(self, ip: str, now: float) -> int:
+        """The slot recording `ip`, taking over the least recently seen one if needed; caller holds the lock"""
+        slot = self.slots.get(ip)
+        if slot is None:
+            if len(self.slots) < self.slot_count:
+                slot = len(self.slots)
+            else:
+                slot = min(self.slots.values(), key=self.last_seen.__getitem__)
+                del self.slots[next(old for old, used in self.slots.items() if used == slot)]
+            for _, buckets, _, _, rx, tx in self.tiers:
+                row = slot * buckets
+                rx[row:row + buckets] = memoryview(array('f', bytes(4 * buckets)))
+                tx[row:row + buckets] = memoryview(array('f', bytes(4 * buckets)))
+            self.slots[ip] = slot
+        self.last_seen[slot] = now
+        ROLLUP_SLOT.pack_into(self.slot_table, slot * ROLLUP_SLOT.size, ip.encode(), now)
+        return slot
+    
+    def record(self, rates: Dict[str, tuple], now: Optional[float] = None):
+        """Add one sample of {ip: (rx_bps, tx_bps)}; clients left out count as idle"""
+        now = time.time() if now is None else now
+        with self.lock:
+            rows = [(self.slot(ip, now), rx, tx) for ip, (rx, tx) in rates.items()]
+            for seconds, buckets, epochs, counts, rx_sums, tx_sums in self.tiers:
+                number = int(now // seconds)
+                index = number % buckets
+                if epochs[index] != number:
+                    epochs[index] = number
+                    counts[index] = 0
+                    for slot in range(self.slot_count):
+                        rx_sums[slot * buckets + index] = 0.0
+                        tx_sums[slot * buckets + index] = 0.0
+                counts[index] += 1
+                for slot, rx, tx in rows:
+                    rx_sums[slot * buckets + index] += rx
+                    tx_sums[slot * buckets + index] += tx
+            self.records += 1
+    
+    def series(self, ips: list, start: int, end: int, step: int, complete: bool = True,
+               now: Optional[float] = None) -> Dict[str, 'ClientSeries']:
+        """Rollup history on VictoriaMetrics' grid of `step`-aligned points from `start` to `end`
+        
+        A point at t averages the buckets in [t - step, t). With `complete`,
+        only a grid whose step is a whole number of buckets and whose
+        buckets all hold samples is served, and the series ends at the last
+        finished point; otherwise the finest tier spanning the window is
+        used at whatever resolution it has, points averaging the buckets
+        that do hold samples and reading 0 without any. Clients never
+        recorded are left out.
+        """
+        with self.lock:
+            tier = next((tier for tier in self.tiers if tier[0] * tier[1] >= end - start + step), None)
+            if tier is None:
+                return {}
+            seconds, buckets, epochs, counts, rx_sums, tx_sums = tier
+            if step % seconds:
+                if complete:
+                    return {}
+                step = -(-step // seconds) * seconds
+                start = start // step * step
+            last = min(end, int(time.time() if now is None else now) // seconds * seconds)
             
-            metrics = self.get_system_metrics()
-            response_data = json.dumps(metrics).encode()
-            self.wfile.write(response_data)
-            self.wfile.flush()
-            logger.debug(f"Sent metrics response ({len(response_data)} bytes)")
-        elif self.path.startswith('/api/client-histories'):
-            # Bulk fetch client histories
-            logger.debug(f"Bulk client histories request from {self.address_string()}")
+            # Copy just the span of buckets the window covers, so the
+            # averaging below doesn't hold up record() on the data-source loop
+            first = int(start - step) // seconds
+            length = max(0, last // seconds - first)
+            chunks = []  # (index, count) runs of the ring covering the span
+            number = first
+            while number < first + length:
+                index = number % buckets
+                chunks.append((index, min(buckets - index, first + length - number)))
+                number += chunks[-1][1]
+            
+            def span(values, row=0):
+                copied = array(values.format)
+                for index, count in chunks:
+                    copied.frombytes(values[row + index:row + index + count].cast('B'))
+                return copied
             
+            span_epochs, span_counts = span(epochs), span(counts)
+            spans = {ip: (span(rx_sums, slot * buckets), span(tx_sums, slot * buckets))
+                     for ip, slot in ((ip, self.slots.get(ip)) for ip in ips) if slot is not None}
+        
+        # Buckets behind each point, as offsets into the span, with the
+        # weight of each bucket's samples
+        timestamps = array('d', range(start, last + 1, step))
+        points = []
+        for t in timestamps:
+            weights = []
+            for number in range(int(t - step) // seconds, int(t) // seconds):
+                offset = number - first
+                if span_epochs[offset] == number and span_counts[offset]:
+                    weights.append((offset, 1.0 / span_counts[offset]))
+                elif complete:
+                    return {}
+            points.append((weights, 1.0 / len(weights) if weights else 0.0))
+        
+        result = {}
+        for ip, (rx_span, tx_span) in spans.items():
+            rx = array('d', [sum(rx_span[offset] * weight for offset, weight in weights) * scale
+                             for weights, scale in points])
+            tx = array('d', [sum(tx_span[offset] * weight for offset, weight in weights) * scale
+                             for weights, scale in points])
+            result[ip] = ClientSeries(timestamps, rx, tx, int(timestamps[-1]) if timestamps else start)
+        with self.lock:
+            self.reads += len(result)
+        return result
+    
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'path': self.path,
+                'entries': len(self.slots),
+                'slots': self.slot_count,
+                'bytes': len(self.map) if self.tiers else 0,
+                'records': self.records,
+                'reads': self.reads
+            }
+
+class ClientSeriesCache:
+    """Per-client bandwidth history shared by every /api/client-histories request
+    
+    Entries are keyed by (ip, duration, step), so any IP subset is assembled
+    from the same cached series. Clients not in the cache are fetched
+    together in one regex query; stale entries are extended by querying only
+    the tail since their last fetch rather than the whole window. Entries
+    idle for `idle_ttl` are dropped, and the least recently used go first
+    beyond `max_entries` or `max_bytes`.
+    """
+    def __init__(self, refresh_interval=15, idle_ttl=600, max_entries=2048, max_bytes=8 << 20):
+        self.entries = OrderedDict()  # LRU order
+        self.refresh_interval = refresh_interval
+        self.idle_ttl = idle_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.last_used = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.extensions = 0
+        self.seeded = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.last_used.clear()
+            self.bytes = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.extensions + self.seeded + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'extensions': self.extensions,
+                'misses': self.misses,
+                'seeded': self.seeded,
+                'hit_ratio': round((self.hits + self.extensions + self.seeded) / lookups, 3) if lookups else None,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+    
+    def get(self, ips: list, duration_seconds: int, step: int, timeout: float = 10) -> Dict[str, ClientSeries]:
+        """Series for `ips` over the last `duration_seconds`; clients without data are left out"""
+        now = time.time()
+        end = int(now)
+        # Step-aligned like VictoriaMetrics' own grid, so tails line up with cached points
+        window_start = (end - duration_seconds) // step * step
+        keys = {ip: (ip, duration_seconds, step) for ip in ips}
+        with self.lock:
+            self.prune(now)
+            cached = {}
+            for ip, key in keys.items():
+                self.last_used[key] = now
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    cached[ip] = self.entries[key]
+            missing = [ip for ip in keys if ip not in cached]
+            stale = [ip for ip, series in cached.items() if now - series.updated >= self.refresh_interval]
+        
+        # Complete local rollups stand in for a full fetch: only their tail is queried
+        if missing and client_rollups is not None:
+            seeded = client_rollups.series(missing, window_start, end, step)
+            cached.update(seeded)
+            stale.extend(seeded)
+            missing = [ip for ip in missing if ip not in seeded]
+        else:
+            seeded = {}
+        with self.lock:
+            self.hits += len(cached) - len(stale)
+            self.extensions += len(stale) - len(seeded)
+            self.seeded += len(seeded)
+            self.misses += len(missing)
+        
+        updated = {}
+        fallback = {}
+        if missing:
             try:
-                # Parse query parameters for specific IPs
-                from urllib.parse import urlparse, parse_qs
-                parsed = urlparse(self.path)
-                query_params = parse_qs(parsed.query)
-                
-                # Get requested IPs from query params, or all if not specified
-                if 'ips' in query_params:
-                    # IPs provided as comma-separated list
-                    client_ips = query_params['ips'][0].split(',')
-                    logger.debug(f"Fetching histories for specific IPs: {client_ips}")
-                else:
-                    # No IPs specified, get all connected clients
-                    clients_data = self.get_connected_clients()
-                    client_ips = [client['ip'] for client in clients_data.get('clients', [])]
-                    logger.debug(f"Fetching histories for all {len(client_ips)} connected clients")
-                
-                # Get duration parameter (default to 10m)
-                duration = query_params.get('duration', ['10m'])[0]
-                logger.debug(f"Using duration: {duration}")
-                
-                # Fetch histories in parallel with specified duration
-                histories = self.get_bulk_client_histories(client_ips, duration)
-                
-                response_data = json.dumps(histories).encode()
-                
-                self.send_response(200)
-                self.send_header('Content-Type', 'application/json')
-                self.send_header('Access-Control-Allow-Origin', '*')
-                self.send_header('Content-Length', str(len(response_data)))
-                self.end_headers()
-                
-                self.wfile.write(response_data)
-                self.wfile.flush()
-                logger.debug(f"Sent bulk histories for {len(histories)} clients ({len(response_data)} bytes)")
+                updated.update(self.fetch(missing, window_start, end, step, timeout))
             except Exception as e:
-                logger.error(f"Error handling bulk histories request: {e}", exc_info=True)
-                self.send_error(500, "Internal Server Error")
+                logger.error(f"Error fetching histories for {len(missing)} clients: {e}")
+                # Served from local rollups but not cached, so VictoriaMetrics fills them in once it's back
+                if client_rollups is not None:
+                    fallback = client_rollups.series(missing, window_start, end, step, complete=False)
+        if stale:
+            # Re-fetch the last point too: it may have been computed from a partial step
+            since = (min(cached[ip].end for ip in stale) - step) // step * step
+            try:
+                tails = self.fetch(stale, since, end, step, timeout)
+                for ip in stale:
+                    updated[ip] = cached[ip].extended(tails[ip], since, window_start)
+            except Exception as e:
+                logger.error(f"Error extending histories for {len(stale)} clients, serving stale: {e}")
+                for ip in seeded:
+                    updated[ip] = cached[ip]
+        
+        if updated:
+            with self.lock:
+                for ip, series in updated.items():
+                    self.store(keys[ip], series)
+        cached.update(updated)
+        cached.update(fallback)
+        return {ip: series for ip, series in cached.items() if series.timestamps}
+    
+    def fetch(self, ips: list, start: int, end: int, step: int, timeout: float) -> Dict[str, ClientSeries]:
+        ip_regex = '|'.join(ips)
+        query = f'client_traffic_rate_bps{{ip=~"{ip_regex}"}}'
+        result = victoriametrics.query_range(query, start, end, step, timeout=timeout, name='client_histories')
+        logger.debug(f"Got {len(result)} series for {len(ips)} clients over [{start}, {end}]")
+        timestamps, columns = join_client_series(result, set(ips))
+        empty = (array('d'), array('d'))
+        return {ip: ClientSeries(timestamps if ip in columns else array('d'), *columns.get(ip, empty), end)
+                for ip in ips}
+    
+    def store(self, key: tuple, series: ClientSeries):
+        """Insert or replace an entry, evicting LRU entries past the bounds; caller holds the lock"""
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.bytes -= old.nbytes
+        self.entries[key] = series
+        self.bytes += series.nbytes
+        while self.entries and (len(self.entries) > self.max_entries or self.bytes > self.max_bytes):
+            evicted_key, evicted = self.entries.popitem(last=False)
+            self.last_used.pop(evicted_key, None)
+            self.bytes -= evicted.nbytes
+            self.evictions += 1
+    
+    def prune(self, now: float):
+        """Drop series nobody has asked for in `idle_ttl` seconds; caller holds the lock"""
+        for key, used in list(self.last_used.items()):
+            if now - used > self.idle_ttl:
+                del self.last_used[key]
+                series = self.entries.pop(key, None)
+                if series is not None:
+                    self.bytes -= series.nbytes
+                    self.expirations += 1
+
+# /api/clients sort orders and filters
+CLIENT_STATE_RANK = {'PERMANENT': 3, 'REACHABLE': 3, 'DELAY': 2, 'PROBE': 2, 'STALE': 2, 'FAILED': 1}
+CLIENT_SORTS = ('bandwidth', 'name', 'status', 'ip')
+# The types in each sort's key (see client_sort_key), checked on incoming cursors
+CLIENT_CURSOR_KEYS = {
+    'bandwidth': ((int, float), int),
+    'name': (str, int),
+    'status': (int, int),
+    'ip': (int,)
+}
+CLIENT_PAGE_SIZE = 50
+# Clients embedded in the metrics snapshot, busiest first
+CLIENT_SUMMARY_SIZE = 20
+CLIENT_MAX_PAGE_SIZE = 500
+
+def client_display_name(client: Dict[str, Any]) -> str:
+    """What the dashboard shows as the client's name (see getClientName)"""
+    hostname = client.get('hostname')
+    if hostname and hostname != 'unknown':
+        return hostname
+    return client.get('mac', '')[:8].upper()
+
+def client_sort_key(client: Dict[str, Any], sort: str) -> tuple:
+    """Unique key for `sort`; the IP breaks ties so keyset cursors never skip or repeat"""
+    try:
+        ip_key = int(ipaddress.ip_address(client['ip']))
+    except ValueError:
+        ip_key = 0
+    if sort == 'bandwidth':
+        return (client.get('bandwidth_rx_bps', 0) + client.get('bandwidth_tx_bps', 0), ip_key)
+    if sort == 'name':
+        return (client_display_name(client).lower(), ip_key)
+    if sort == 'status':
+        # Ascending means reachable first, as the dashboard always sorted it
+        return (-CLIENT_STATE_RANK.get(str(client.get('state', '')).upper(), 0), ip_key)
+    return (ip_key,)
+
+class ClientIndex:
+    """Sorted views over one immutable clients snapshot, for paging /api/clients
+    
+    Each (sort, filters) view is built once per snapshot and kept as
+    ascending keys plus clients, so a page is a bisect on the cursor's key
+    and a slice: O(log n + page). Cursors carry the last key rather than an
+    offset, so paging stays consistent while snapshots are replaced
+    underneath it.
+    """
+    max_views = 32
+    
+    def __init__(self, clients: list, created: Optional[float] = None):
+        self.clients = clients
+        self.created = time.time() if created is None else created
+        self.views = {}
+        self.lock = threading.Lock()
+    
+    def view(self, sort: str, device_types: frozenset, states: frozenset) -> tuple:
+        view_key = (sort, device_types, states)
+        with self.lock:
+            view = self.views.get(view_key)
+        if view is not None:
+            return view
+        
+        entries = sorted(
+            (client_sort_key(client, sort), client) for client in self.clients
+            if (not device_types or client.get('device_type') in device_types)
+            and (not states or str(client.get('state', '')).upper() in states)
+        )
+        view = ([key for key, _ in entries], [client for _, client in entries])
+        with self.lock:
+            if len(self.views) >= self.max_views:
+                self.views.clear()
+            self.views[view_key] = view
+        return view
+    
+    def page(self, sort: str = 'bandwidth', descending: bool = True, limit: int = CLIENT_PAGE_SIZE,
+             cursor: Optional[tuple] = None, device_types: frozenset = frozenset(),
+             states: frozenset = frozenset()) -> Dict[str, Any]:
+        keys, clients = self.view(sort, device_types, states)
+        if descending:
+            end = bisect.bisect_left(keys, cursor) if cursor is not None else len(keys)
+            start = max(0, end - limit)
+            page = clients[start:end][::-1]
+            more = start > 0
         else:
-            self.send_error(404)
+            start = bisect.bisect_right(keys, cursor) if cursor is not None else 0
+            end = start + limit
+            page = clients[start:end]
+            more = end < len(keys)
+        next_cursor = None
+        if more and page:
+            next_cursor = encode_client_cursor(sort, descending, keys[start if descending else end - 1])
+        return {
+            'count': len(keys),
+            'total': len(self.clients),
+            'sort': sort,
+            'order': 'desc' if descending else 'asc',
+            'clients': page,
+            'next_cursor': next_cursor
+        }
+
+def encode_client_cursor(sort: str, descending: bool, key: tuple) -> str:
+    raw = json.dumps([sort, descending, list(key)], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_client_cursor(cursor: str, sort: str, descending: bool) -> tuple:
+    """The key a cursor resumes after; ValueError if malformed or from another ordering"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, cursor_descending, key = json.loads(raw)
+    except Exception:
+        raise ValueError('malformed cursor')
+    if cursor_sort != sort or cursor_descending != descending:
+        raise ValueError('cursor is for a different sort order')
+    # Keys are compared with the index's own, so a wrong type would fail in bisect
+    types = CLIENT_CURSOR_KEYS[sort]
+    if (not isinstance(key, list) or len(key) != len(types)
+            or not all(isinstance(part, kind) and not isinstance(part, bool) for part, kind in zip(key, types))):
+        raise ValueError('malformed cursor')
+    return tuple(key)
+
+# Rolling traffic windows: name -> index of its rx total in ClientTraffic.totals
+TRAFFIC_WINDOWS = {'1h': 0, '24h': 2, '7d': 4, 'today': 6}
+TRAFFIC_MINUTES = 60
+TRAFFIC_HOURS = 168
+TRAFFIC_DIRECTIONS = ('rx', 'tx')
+
+class ClientTraffic:
+    """One client's byte counts: per-minute and per-hour rings plus running window totals"""
+    __slots__ = ('minutes', 'hours', 'totals', 'last', 'seen')
     
-    def log_message(self, format, *args):
-        # Log HTTP requests using our logger
-        logger.info(f"{self.address_string()} - {format % args}")
+    def __init__(self):
+        # rx and tx interleaved: slot * 2 + direction
+        self.minutes = array('d', bytes(8 * 2 * TRAFFIC_MINUTES))
+        self.hours = array('d', bytes(8 * 2 * TRAFFIC_HOURS))
+        # 1h rx, 1h tx, 24h rx, 24h tx, 7d rx, 7d tx, today rx, today tx
+        self.totals = array('d', bytes(8 * 8))
+        self.last = [None, None]  # last exporter counter value per direction
+        self.seen = 0.0
+
+class ClientTrafficTotals:
+    """Per-client byte totals over the last hour, day and week, and since midnight
+    
+    Fed with the exporter's client_traffic_bytes counters on every clients
+    refresh. Counter deltas are added to minute and hour buckets and to
+    running window totals, which are trimmed as the buckets rotate, so
+    "top talkers" and per-client totals are answered from memory without
+    range queries. On first use the buckets are backfilled once from
+    VictoriaMetrics, so the windows aren't empty after a restart.
+    """
+    idle_ttl = 3600
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clients = {}
+        self.minute = None
+        self.hour = None
+        self.day = None
+        self.midnight = 0.0
+        self.backfill_task = None
+    
+    def advance(self, now: float):
+        """Rotate the buckets to `now`; caller holds the lock"""
+        minute, hour = int(now // 60), int(now // 3600)
+        day = time.localtime(now)[:3]
+        if self.minute is None:
+            self.minute, self.hour = minute, hour
+        
+        for k in range(1, min(minute - self.minute, TRAFFIC_MINUTES) + 1):
+            slot = (self.minute + k) % TRAFFIC_MINUTES * 2
+            for client in self.clients.values():
+                for d in (0, 1):
+                    client.totals[d] -= client.minutes[slot + d]
+                    client.minutes[slot + d] = 0.0
+        
+        for k in range(1, min(hour - self.hour, TRAFFIC_HOURS) + 1):
+            # The bucket from 24 hours ago leaves the day window, the one
+            # being reused leaves the week window
+            day_slot = (self.hour + k - 24) % TRAFFIC_HOURS * 2
+            slot = (self.hour + k) % TRAFFIC_HOURS * 2
+            for client in self.clients.values():
+                for d in (0, 1):
+                    client.totals[2 + d] -= client.hours[day_slot + d]
+                    client.totals[4 + d] -= client.hours[slot + d]
+                    client.hours[slot + d] = 0.0
+        
+        if day != self.day:
+            self.day = day
+            self.midnight = time.mktime(day + (0, 0, 0, 0, 0, -1))
+            for client in self.clients.values():
+                client.totals[6] = client.totals[7] = 0.0
+        
+        if hour != self.hour:
+            for ip in [ip for ip, client in self.clients.items()
+                       if not client.totals[4] and not client.totals[5] and now - client.seen > self.idle_ttl]:
+                del self.clients[ip]
+        self.minute, self.hour = minute, hour
+    
+    def add(self, client: ClientTraffic, d: int, when: float, nbytes: float, minutes=True, hours=True):
+        """Count `nbytes` at `when` in whichever buckets still cover it; caller holds the lock"""
+        minute, hour = int(when // 60), int(when // 3600)
+        if minutes and self.minute - TRAFFIC_MINUTES < minute <= self.minute:
+            client.minutes[minute % TRAFFIC_MINUTES * 2 + d] += nbytes
+            client.totals[d] += nbytes
+        if hours and self.hour - TRAFFIC_HOURS < hour <= self.hour:
+            client.hours[hour % TRAFFIC_HOURS * 2 + d] += nbytes
+            client.totals[4 + d] += nbytes
+            if hour > self.hour - 24:
+                client.totals[2 + d] += nbytes
+            if when >= self.midnight:
+                client.totals[6 + d] += nbytes
+    
+    def record(self, counters: Dict[tuple, float], now: Optional[float] = None):
+        """Add the deltas of {(ip, 'rx' | 'tx'): counter value} since the last call"""
+        now = time.time() if now is None else now
+        with self.lock:
+            self.advance(now)
+            for (ip, direction), value in counters.items():
+                client = self.clients.get(ip)
+                if client is None:
+                    client = self.clients[ip] = ClientTraffic()
+                d = TRAFFIC_DIRECTIONS.index(direction)
+                last = client.last[d]
+                client.last[d] = value
+                client.seen = now
+                # The first value is only a baseline; a smaller one means the
+                # exporter restarted and counts from zero again
+                if last is not None:
+                    self.add(client, d, now, value - last if value >= last else value)
+    
+    def ensure_backfilled(self, now: float):
+        with self.lock:
+            if self.backfill_task is not None:
+                return
+            self.backfill_task = data_sources.submit(self.backfill(now))
+    
+    async def backfill(self, until: float):
+        """Fill the buckets from VictoriaMetrics up to `until`, the first live sample"""
+        # The exporter's labels (name, device type) can change, so take one series per IP
+        query = 'max by (ip, direction) (increase(client_traffic_bytes[{}]))'
+        minute_end = int(until // 60 * 60)
+        hour_end = int(until // 3600 * 3600)
+        try:
+            minutes, hours = await asyncio.gather(
+                victoriametrics.aquery_range(query.format('1m'), minute_end - 3600 + 60, minute_end, 60,
+                                             name='traffic_backfill'),
+                victoriametrics.aquery_range(query.format('1h'), hour_end - TRAFFIC_HOURS * 3600 + 3600,
+                                             hour_end, 3600, name='traffic_backfill'))
+        except Exception as e:
+            logger.warning(f"Couldn't backfill client traffic totals: {e}")
+            return
+        
+        with self.lock:
+            self.advance(time.time())
+            # A point at t holds the bytes of (t - step, t]; those of the
+            # current hour only exist at minute resolution
+            for series, step, hourly in ((hours, 3600, True), (minutes, 60, False)):
+                for item in series:
+                    ip = item['metric'].get('ip')
+                    direction = item['metric'].get('direction')
+                    if not ip or direction not in TRAFFIC_DIRECTIONS:
+                        continue
+                    client = self.clients.get(ip)
+                    if client is None:
+                        client = self.clients[ip] = ClientTraffic()
+                        client.seen = until
+                    d = TRAFFIC_DIRECTIONS.index(direction)
+                    for ts, value in item['values']:
+                        nbytes = float(value)
+                        if not nbytes > 0:
+                            continue
+                        ts = float(ts)
+                        self.add(client, d, ts - step, nbytes, minutes=not hourly, hours=hourly or ts > hour_end)
+        logger.info(f"Backfilled client traffic totals for {len(self.clients)} clients")
+    
+    def top(self, window: str, limit: int = 10, direction: str = 'total', now: Optional[float] = None) -> list:
+        """The `limit` clients with the most bytes in `window`, as (ip, rx, tx)"""
+        index = TRAFFIC_WINDOWS[window]
+        rx_weight, tx_weight = {'total': (1, 1), 'rx': (1, 0), 'tx': (0, 1)}[direction]
+        with self.lock:
+            self.advance(time.time() if now is None else now)
+            rows = [(rx_weight * client.totals[index] + tx_weight * client.totals[index + 1], ip)
+                    for ip, client in self.clients.items()]
+            top = heapq.nlargest(limit, rows)
+            return [(ip, self.clients[ip].totals[index], self.clients[ip].totals[index + 1]) for _, ip in top]
+    
+    def totals(self, ips=None, now: Optional[float] = None) -> Dict[str, Dict[str, Dict[str, int]]]:
+        """ip -> window -> {rx, tx} for `ips` (all clients if None)"""
+        with self.lock:
+            self.advance(time.time() if now is None else now)
+            clients = self.clients if ips is None else {ip: self.clients[ip] for ip in ips if ip in self.clients}
+            return {
+                ip: {window: {'rx': round(client.totals[index]), 'tx': round(client.totals[index + 1])}
+                     for window, index in TRAFFIC_WINDOWS.items()}
+                for ip, client in clients.items()
+            }
+    
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'entries': len(self.clients),
+                'bytes': len(self.clients) * 8 * (2 * TRAFFIC_MINUTES + 2 * TRAFFIC_HOURS + 8)
+            }
+
+# Global VictoriaMetrics client, replaced in main() if --victoriametrics-url is given
+victoriametrics = VictoriaMetricsClient(VICTORIAMETRICS_URL)
+
+# Global cache instances
+metrics_cache = MetricsCache(ttl_seconds=5)  # Cache metrics for 5 seconds
+connectivity_cache = MetricsCache(ttl_seconds=30, stale_seconds=60)  # Cache connectivity for 30 seconds, serve stale for 60 more
+blocky_cache = MetricsCache(ttl_seconds=10, stale_seconds=30)  # Cache Blocky stats for 10 seconds, serve stale for 30 more
+client_info_cache = ClientInfoCache(ttl_seconds=30)  # Cache client info from network-metrics-exporter
+client_series_cache = ClientSeriesCache(refresh_interval=15)  # Per-client bandwidth histories, extended every 15 seconds
+client_traffic = ClientTrafficTotals()  # Per-client byte totals over rolling windows, fed by the clients section
+hostname_resolver = HostnameResolver()  # Names for Blocky's top clients, resolved in the background
+client_rollups = None  # Local client rate rollups under --state-dir, opened in main()
+
+def cache_stats() -> Dict[str, Any]:
+    """Size and hit/miss counters of every cache, for /api/debug/caches"""
+    return {
+        'metrics': metrics_cache.stats(),
+        'connectivity': connectivity_cache.stats(),
+        'blocky': blocky_cache.stats(),
+        'client_info': client_info_cache.stats(),
+        'client_series': client_series_cache.stats(),
+        'hostnames': hostname_resolver.stats(),
+        'rollups': client_rollups.stats() if client_rollups is not None else {}
+    }
+
+# cache_stats() keys exported on /metrics, by Prometheus type
+CACHE_COUNTERS = ('hits', 'stale_hits', 'negative_hits', 'extensions', 'seeded', 'misses', 'evictions', 'expirations')
+CACHE_GAUGES = ('entries', 'bytes', 'hit_ratio')
+
+def render_cache_metrics() -> list:
+    stats = cache_stats()
+    lines = []
+    for key in CACHE_COUNTERS + CACHE_GAUGES:
+        counter = key in CACHE_COUNTERS
+        name = f'dashboard_cache_{key}_total' if counter else f'dashboard_cache_{key}'
+        lines.append(f'# TYPE {name} {"counter" if counter else "gauge"}')
+        for cache, values in stats.items():
+            if values.get(key) is not None:
+                lines.append(f'{name}{prometheus_labels(("cache",), (cache,))} {values[key]}')
+    return lines
+
+instrumentation.collectors.append(render_cache_metrics)
+
+class DashboardHTTPServer(ThreadingHTTPServer):
+    """Threaded HTTP server with bounded connections and a bounded worker pool
+
+    Each keep-alive connection gets its own (mostly idle) thread, capped at
+    max_connections; connections beyond that are refused with a 503. Actual
+    request processing is limited to max_workers at a time, so a burst of
+    slow requests (e.g. a week of client histories) can't starve the router,
+    while a single slow request no longer blocks every other tab.
+    """
+    block_on_close = False
+    # socketserver's default listen backlog of 5 drops connections when
+    # several tabs reconnect at once
+    request_queue_size = 128
+    
+    def __init__(self, server_address, handler_class, max_workers=8, max_connections=64):
+        super().__init__(server_address, handler_class)
+        self.worker_slots = threading.BoundedSemaphore(max_workers)
+        self.connection_slots = threading.BoundedSemaphore(max_connections)
+    
+    def process_request(self, request, client_address):
+        if not self.connection_slots.acquire(blocking=False):
+            logger.warning(f"Too many connections, rejecting {client_address[0]}")
+            try:
+                request.sendall(b'HTTP/1.1 503 Service Unavailable\r\n'
+                                b'Retry-After: 1\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        super().process_request(request, client_address)
+    
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self.connection_slots.release()
+
+# Blocky's dashboard stats, fetched together with VictoriaMetricsClient.query_many
+BLOCKY_QUERIES = {
+    'total': 'sum(blocky_query_total)',
+    'qpm': 'sum(rate(blocky_query_total[5m])) * 60',
+    'cache_hits': 'sum(blocky_cache_hits_total)',
+    'cache_misses': 'sum(blocky_cache_misses_total)',
+    'top_clients': 'topk(5, sum by (client) (blocky_query_total))',
+    'blocking': 'sum by (reason) (blocky_response_total{response_type="BLOCKED"})'
+}
+
+class SystemMetrics:
+    """Collectors for each dashboard section (uptime, cpu, clients, ...)
+
+    Holds no per-request state, so one long-lived instance serves the
+    background collector and every request. Sections doing I/O are
+    coroutines and every section runs on the data-source loop; procfs
+    sections are plain functions, as their reads never block.
+    """
+    blocky_probe_ttl = 300
+    
+    def __init__(self, netlink: Optional[RouteNetlink] = None, procfs: Optional[ProcSampler] = None,
+                 icmp: Optional[IcmpProber] = None):
+        # Data sources default to the live system; the benchmarks pass fixture replays
+        self.netlink = netlink or RouteNetlink()
+        self.address_tracker = AddressTracker(self.netlink)
+        self.icmp = icmp or IcmpProber()
+        self.procfs = procfs or ProcSampler()
+        self.neighbors = NeighborTable(self.netlink)
+        self.flight = SingleFlight()
+        # Stale from the start, so the first /api/clients builds a real one
+        self.client_index = ClientIndex([], created=0)
+        self.blocky_enabled = False
+        self.blocky_probed_at = float('-inf')
+    
+    def sections(self) -> Dict[str, Any]:
+        """Section name -> collector function or coroutine function, in display order"""
+        return {
+            'uptime': self.get_uptime,
+            'cpu': self.get_cpu_info,
+            'memory': self.get_memory_info,
+            'network': self.get_network_info,
+            'clients': self.get_connected_clients,
+            'connectivity': self.check_connectivity,
+            'blocky': self.get_blocky_stats
+        }
     
     def get_system_metrics(self) -> Dict[str, Any]:
-        """Fetch all metrics concurrently for better performance"""
-        start_time = time.time()
-        
+        """Fetch all metrics concurrently on demand (used with --collection on-demand)"""
         # Check if we have cached metrics
         cached = metrics_cache.get('all_metrics')
         if cached:
-            cached['_timings'] = {'total': 0, 'from_cache': True}
-            return cached
+            return dict(cached, _timings={'total': 0, 'from_cache': True})
         
+        # Requests missing the cache together share one fan-out
+        return self.flight.do('all_metrics', lambda: data_sources.run(self.collect_system_metrics(),
+                                                                       max(SECTION_TIMEOUTS.values()) + 1))
+    
+    async def collect_system_metrics(self) -> Dict[str, Any]:
+        start_time = time.time()
         results = {}
         timings = {}
         
-        # Use ThreadPoolExecutor for concurrent fetching
-        with ThreadPoolExecutor(max_workers=8) as executor:
-            # Submit all tasks with timing wrappers
-            task_starts = {}
-            futures = {}
-            
-            for name, func in [
-                ('uptime', self.get_uptime),
-                ('cpu', self.get_cpu_info),
-                ('memory', self.get_memory_info),
-                ('network', self.get_network_info),
-                ('clients', self.get_connected_clients),
-                ('connectivity', self.get_connectivity_cached),
-                ('blocky', self.get_blocky_stats_cached)
-            ]:
-                task_starts[name] = time.time()
-                futures[executor.submit(func)] = name
-            
-            for future in as_completed(futures):
-                key = futures[future]
-                try:
-                    results[key] = future.result(timeout=3)
-                    timings[key] = round((time.time() - task_starts[key]) * 1000, 1)  # ms
-                except Exception as e:
-                    logger.error(f"Error getting {key}: {e}")
-                    results[key] = {}
-                    timings[key] = -1  # Mark as error
+        async def collect(name, func):
+            started = time.time()
+            try:
+                async with asyncio.timeout(SECTION_TIMEOUTS[name]):
+                    results[name] = await settle(func())
+                timings[name] = round((time.time() - started) * 1000, 1)  # ms
+            except Exception as e:
+                logger.error(f"Error getting {name}: {e!r}")
+                SECTION_ERRORS.inc(name)
+                results[name] = {}
+                timings[name] = -1  # Mark as error
+            SECTION_DURATION.observe(time.time() - started, name)
+        
+        # All sections at once, each under its own timeout
+        sections = dict(self.sections(), connectivity=self.get_connectivity_cached,
+                        blocky=self.get_blocky_stats_cached)
+        async with asyncio.TaskGroup() as group:
+            for name, func in sections.items():
+                group.create_task(collect(name, func))
         
         total_time = round((time.time() - start_time) * 1000, 1)  # ms
         results['timestamp'] = int(time.time())
@@ -1732,8 +2683,7 @@ class MetricsHandler(BaseHTTPRequestHandler):
     
     def get_uptime(self) -> Dict[str, Any]:
         try:
-            with open('/proc/uptime', 'r') as f:
-                uptime_seconds = float(f.readline().split()[0])
+            uptime_seconds = self.procfs.uptime()
             
             days = int(uptime_seconds // 86400)
             hours = int((uptime_seconds % 86400) // 3600)
@@ -1756,37 +2706,20 @@ class MetricsHandler(BaseHTTPRequestHandler):
     def get_cpu_info(self) -> Dict[str, Any]:
         try:
             # Get load averages
-            with open('/proc/loadavg', 'r') as f:
-                loads = f.readline().split()[:3]
-                load_1, load_5, load_15 = map(float, loads)
-            
-            # Get CPU count
-            cpu_count = os.cpu_count() or 1
-            
-            # Get CPU usage from /proc/stat
-            with open('/proc/stat', 'r') as f:
-                cpu_line = f.readline()
-                cpu_times = list(map(int, cpu_line.split()[1:8]))
+            load_1, load_5, load_15 = self.procfs.loadavg()
             
-            idle = cpu_times[3] + cpu_times[4]
-            total = sum(cpu_times)
-            
-            # Store current values for next calculation
-            if not hasattr(self, '_last_cpu'):
-                self._last_cpu = {'total': total, 'idle': idle}
-                usage = 0.0
-            else:
-                total_diff = total - self._last_cpu['total']
-                idle_diff = idle - self._last_cpu['idle']
-                usage = 100.0 * (1.0 - (idle_diff / total_diff)) if total_diff > 0 else 0.0
-                self._last_cpu = {'total': total, 'idle': idle}
+            # Get CPU usage since the previous sample (aggregate and per core)
+            usage = self.procfs.cpu_usage()
+            cpu_count = len(usage['per_core']) or os.cpu_count() or 1
             
             return {
                 'load_1': load_1,
                 'load_5': load_5,
                 'load_15': load_15,
                 'cores': cpu_count,
-                'usage_percent': round(usage, 1)
+                'usage_percent': usage['usage_percent'],
+                'softirq_percent': usage['softirq_percent'],
+                'per_core': usage['per_core']
             }
         except:
             return {
@@ -1799,14 +2732,7 @@ class MetricsHandler(BaseHTTPRequestHandler):
     
     def get_memory_info(self) -> Dict[str, Any]:
         try:
-            meminfo = {}
-            with open('/proc/meminfo', 'r') as f:
-                for line in f:
-                    parts = line.split(':')
-                    if len(parts) == 2:
-                        key = parts[0].strip()
-                        value = int(parts[1].strip().split()[0]) * 1024  # Convert KB to bytes
-                        meminfo[key] = value
+            meminfo = self.procfs.memory()
             
             total = meminfo.get('MemTotal', 0)
             available = meminfo.get('MemAvailable', 0)
@@ -1837,87 +2763,47 @@ class MetricsHandler(BaseHTTPRequestHandler):
                 }
             }
     
-    def get_network_info(self) -> Dict[str, Any]:
+    async def get_network_info(self) -> Dict[str, Any]:
+        addresses = await self.get_addresses()
         info = {
-            'wan_ip': self.get_wan_ip(),
-            'lan_network': self.get_lan_network(),
+            'wan_ip': self.get_wan_ip(addresses),
+            # When the external lookup last succeeded (None if never needed)
+            'wan_ip_resolved_at': self.address_tracker.resolved_at,
+            'lan_network': self.get_lan_network(addresses),
             'interfaces': self.get_interface_stats()
         }
         return info
     
-    def get_wan_ip(self) -> str:
-        # Try to get WAN IP from configured WAN interface
+    async def get_addresses(self) -> Dict[str, list]:
+        """IPv4 addresses per interface, tracked over netlink"""
         try:
-            # First try ppp0 (PPPoE)
-            result = subprocess.run(
-                ['ip', '-4', 'addr', 'show', 'ppp0'],
-                capture_output=True,
-                text=True,
-                timeout=1
-            )
-            if result.returncode == 0:
-                for line in result.stdout.split('\n'):
-                    if 'inet ' in line:
-                        return line.split()[1].split('/')[0]
-        except:
-            pass
-
+            return await self.address_tracker.get_addresses()
+        except OSError as e:
+            logger.error(f"Error reading interface addresses: {e}")
+            return {}
+    
+    def get_wan_ip(self, addresses: Dict[str, list]) -> str:
+        # First try ppp0 (PPPoE)
+        for ip, _ in addresses.get('ppp0', []):
+            return ip
+        
         # Try common WAN interfaces including enp2s0 (actual WAN interface)
         for iface in ['enp2s0', 'eth0', 'wan', 'enp1s0']:
-            try:
-                result = subprocess.run(
-                    ['ip', '-4', 'addr', 'show', iface],
-                    capture_output=True,
-                    text=True,
-                    timeout=1
-                )
-                if result.returncode == 0:
-                    for line in result.stdout.split('\n'):
-                        if 'inet ' in line and not line.strip().startswith('inet 10.') and not line.strip().startswith('inet 192.168.'):
-                            return line.split()[1].split('/')[0]
-            except:
-                continue
-
-        # Fallback: query external IP check service
-        try:
-            result = subprocess.run(
-                ['curl', '-s', '--max-time', '2', 'https://ifconfig.me'],
-                capture_output=True,
-                text=True,
-                timeout=3
-            )
-            if result.returncode == 0 and result.stdout.strip():
-                ip = result.stdout.strip()
-                # Validate it's a valid-looking IP
-                if '.' in ip and len(ip.split('.')) == 4:
+            for ip, _ in addresses.get(iface, []):
+                if not ip.startswith('10.') and not ip.startswith('192.168.'):
                     return ip
-        except:
-            pass
-
-        return 'unknown'
+        
+        # Fallback (e.g. behind CGNAT): the cached external IP, resolved off the refresh path
+        return self.address_tracker.get_external_ip() or 'unknown'
     
-    def get_lan_network(self) -> Dict[str, Any]:
-        try:
-            # Get LAN network from br-lan interface
-            result = subprocess.run(
-                ['ip', '-4', 'addr', 'show', 'br-lan'],
-                capture_output=True,
-                text=True,
-                timeout=1
-            )
-            
-            if result.returncode == 0:
-                for line in result.stdout.split('\n'):
-                    if 'inet ' in line:
-                        cidr = line.split()[1]
-                        ip, prefix_len = cidr.split('/')
-                        return {
-                            'ip': ip,
-                            'cidr': cidr,
-                            'prefix_length': int(prefix_len)
-                        }
-        except:
-            pass
+    def get_lan_network(self, addresses: Dict[str, list]) -> Dict[str, Any]:
+        # Get LAN network from br-lan interface
+        for ip, prefix_len in addresses.get('br-lan', []):
+            return {
+                'ip': ip,
+                'cidr': f"{ip}/{prefix_len}",
+                'prefix_length': prefix_len
+            }
         
         # Default fallback
         return {
@@ -1929,35 +2815,25 @@ class MetricsHandler(BaseHTTPRequestHandler):
     def get_interface_stats(self) -> Dict[str, Any]:
         stats = {}
         try:
-            with open('/proc/net/dev', 'r') as f:
-                lines = f.readlines()[2:]  # Skip header lines
-                
-            for line in lines:
-                if ':' in line:
-                    iface, data = line.split(':', 1)
-                    iface = iface.strip()
-                    
-                    # Only include relevant interfaces
-                    if iface in ['br-lan', 'eth0', 'ppp0', 'tailscale0', 'enp1s0', 'enp2s0', 'enp3s0', 'enp4s0']:
-                        values = data.split()
-                        stats[iface] = {
-                            'rx_bytes': int(values[0]),
-                            'rx_packets': int(values[1]),
-                            'tx_bytes': int(values[8]),
-                            'tx_packets': int(values[9]),
-                            'formatted': {
-                                'rx': self.format_bytes(int(values[0])),
-                                'tx': self.format_bytes(int(values[8]))
-                            }
-                        }
-        except:
-            pass
+            for iface, (rx_bytes, rx_packets, tx_bytes, tx_packets) in self.procfs.interfaces().items():
+                stats[iface] = {
+                    'rx_bytes': rx_bytes,
+                    'rx_packets': rx_packets,
+                    'tx_bytes': tx_bytes,
+                    'tx_packets': tx_packets,
+                    'formatted': {
+                        'rx': self.format_bytes(rx_bytes),
+                        'tx': self.format_bytes(tx_bytes)
+                    }
+                }
+        except Exception as e:
+            logger.error(f"Error reading interface stats: {e}")
         
         return stats
     
-    def get_device_type_from_exporter(self, ip: str) -> str:
+    async def get_device_type_from_exporter(self, ip: str) -> str:
         """Get device type from network-metrics-exporter data"""
-        clients = client_info_cache.get_clients()
+        clients = await client_info_cache.get_clients()
         if ip in clients:
             return clients[ip].get('device_type', 'unknown')
         return 'unknown'
@@ -1987,41 +2863,24 @@ class MetricsHandler(BaseHTTPRequestHandler):
         }
         return icons.get(device_type, 'lni-mobile')
     
-    def get_connectivity_cached(self) -> Dict[str, Any]:
+    async def get_connectivity_cached(self) -> Dict[str, Any]:
         """Cached version of connectivity check"""
-        cached = connectivity_cache.get('connectivity')
-        if cached:
-            return cached
-        
-        result = self.check_connectivity()
-        connectivity_cache.set('connectivity', result)
-        return result
+        return await connectivity_cache.get_or_refresh('connectivity', self.check_connectivity)
     
-    def get_blocky_stats_cached(self) -> Dict[str, Any]:
+    async def get_blocky_stats_cached(self) -> Dict[str, Any]:
         """Cached version of Blocky stats"""
-        cached = blocky_cache.get('blocky_stats')
-        if cached:
-            return cached
-        
-        result = self.get_blocky_stats()
-        blocky_cache.set('blocky_stats', result)
-        return result
+        return await blocky_cache.get_or_refresh('blocky_stats', self.get_blocky_stats)
     
-    def query_victoriametrics(self, query: str) -> Optional[Any]:
+    async def query_victoriametrics(self, query: str, name: str = 'query') -> Optional[Any]:
         """Query VictoriaMetrics and return the result"""
         try:
-            url = f"http://localhost:8428/api/v1/query?query={urllib.parse.quote(query)}"
-            with urllib.request.urlopen(url, timeout=2) as response:
-                data = json.loads(response.read().decode())
-                if data.get('status') == 'success' and data.get('data', {}).get('result'):
-                    return data['data']['result']
-                return None
+            return await victoriametrics.aquery(query, name=name) or None
         except Exception as e:
             logger.error(f"Error querying VictoriaMetrics: {e}")
             return None
     
-    def get_blocky_stats(self) -> Dict[str, Any]:
-        """Get DNS statistics from Blocky via VictoriaMetrics - optimized with concurrent queries"""
+    async def get_blocky_stats(self) -> Dict[str, Any]:
+        """Get DNS statistics from Blocky via VictoriaMetrics - all stats in one batched query"""
         try:
             stats = {
                 'enabled': False,
@@ -2035,44 +2894,36 @@ class MetricsHandler(BaseHTTPRequestHandler):
                 'blocking_lists': {}
             }
             
-            # Check if Blocky is running first
-            up_result = self.query_victoriametrics('blocky_build_info')
-            if not up_result:
+            # Whether Blocky is running rarely changes, so the answer is
+            # reused for blocky_probe_ttl and otherwise rides along in the batch
+            probe_fresh = time.monotonic() - self.blocky_probed_at < self.blocky_probe_ttl
+            if probe_fresh and not self.blocky_enabled:
                 return stats
             
-            stats['enabled'] = True
+            queries = dict(BLOCKY_QUERIES)
+            if not probe_fresh:
+                queries['build_info'] = 'count(blocky_build_info)'
             
-            # Define all queries we need to make
-            queries = {
-                'total': 'sum(blocky_query_total)',
-                'blocked': 'sum(blocky_response_total{response_type="BLOCKED"})',
-                'qpm': 'sum(rate(blocky_query_total[5m])) * 60',
-                'cache_hits': 'sum(blocky_cache_hits_total)',
-                'cache_misses': 'sum(blocky_cache_misses_total)',
-                'top_clients': 'topk(5, sum by (client) (blocky_query_total))',
-                'blocking': 'sum by (reason) (blocky_response_total{response_type="BLOCKED"})'
-            }
+            # Execute all queries (and the probe) in one round-trip
+            try:
+                query_results = await victoriametrics.aquery_many(queries, name='blocky')
+            except Exception as e:
+                logger.error(f"Error querying Blocky stats: {e}")
+                return stats
             
-            # Execute all queries concurrently
-            query_results = {}
-            with ThreadPoolExecutor(max_workers=len(queries)) as executor:
-                future_to_key = {executor.submit(self.query_victoriametrics, query): key 
-                                for key, query in queries.items()}
-                
-                for future in as_completed(future_to_key):
-                    key = future_to_key[future]
-                    try:
-                        query_results[key] = future.result(timeout=1)
-                    except Exception as e:
-                        logger.error(f"Error querying {key}: {e}")
-                        query_results[key] = None
+            if not probe_fresh:
+                self.blocky_enabled = bool(query_results.get('build_info'))
+                self.blocky_probed_at = time.monotonic()
+                if not self.blocky_enabled:
+                    return stats
+            stats['enabled'] = True
             
             # Process results
             if query_results.get('total') and len(query_results['total']) > 0:
                 stats['total_queries'] = int(float(query_results['total'][0]['value'][1]))
             
-            if query_results.get('blocked') and len(query_results['blocked']) > 0:
-                stats['blocked_queries'] = int(float(query_results['blocked'][0]['value'][1]))
+            # Blocked total is the sum over blocking reasons, so it needs no query of its own
+            stats['blocked_queries'] = int(sum(float(item['value'][1]) for item in query_results.get('blocking', [])))
             
             if stats['total_queries'] > 0:
                 stats['block_percentage'] = round((stats['blocked_queries'] / stats['total_queries']) * 100, 1)
@@ -2089,14 +2940,16 @@ class MetricsHandler(BaseHTTPRequestHandler):
                     if total_cache > 0:
                         stats['cache_hit_rate'] = round((hits / total_cache) * 100, 1)
             
-            # Process top clients (don't resolve hostnames here - too slow)
+            # Process top clients; names come from the resolver's cache, so
+            # an IP seen for the first time shows up by name on a later refresh
             if query_results.get('top_clients'):
                 for item in query_results['top_clients'][:5]:
                     client_ip = item['metric'].get('client', 'unknown')
                     count = int(float(item['value'][1]))
+                    hostname = hostname_resolver.lookup(client_ip) if is_ip_address(client_ip) else None
                     stats['top_clients'].append({
                         'ip': client_ip,
-                        'hostname': client_ip,  # Just use IP for speed
+                        'hostname': hostname or client_ip,
                         'queries': count
                     })
             
@@ -2118,19 +2971,26 @@ class MetricsHandler(BaseHTTPRequestHandler):
                 'error': str(e)
             }
     
-    def ping_host(self, target: Dict[str, str]) -> Dict[str, Any]:
+    async def ping_host(self, target: Dict[str, str]) -> Dict[str, Any]:
         """Ping a single host"""
         try:
-            result = subprocess.run(
-                ['ping', '-c', '1', '-W', '1', target['host']],
-                capture_output=True,
-                text=True,
-                timeout=1.5
+            process = await asyncio.create_subprocess_exec(
+                'ping', '-c', '1', '-W', '1', target['host'],
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL
             )
+            try:
+                async with asyncio.timeout(1.5):
+                    stdout, _ = await process.communicate()
+            except BaseException:
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+                raise
             
-            if result.returncode == 0:
+            if process.returncode == 0:
                 # Parse response time from ping output
-                for line in result.stdout.split('\n'):
+                for line in stdout.decode().split('\n'):
                     if 'time=' in line:
                         time_ms = float(line.split('time=')[1].split(' ')[0])
                         return {
@@ -2155,23 +3015,27 @@ class MetricsHandler(BaseHTTPRequestHandler):
                 'error': str(e)
             }
     
-    def check_connectivity(self) -> Dict[str, Any]:
-        """Check internet connectivity by pinging external hosts - optimized with parallel pings"""
+    async def check_connectivity(self) -> Dict[str, Any]:
+        """Check internet connectivity by pinging external hosts concurrently"""
         check_hosts = [
             {'host': '1.1.1.1', 'name': 'Cloudflare DNS'},
             {'host': '8.8.8.8', 'name': 'Google DNS'},
             {'host': '9.9.9.9', 'name': 'Quad9 DNS'}
         ]
         
-        # Run pings in parallel
-        results = []
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            futures = [executor.submit(self.ping_host, target) for target in check_hosts]
-            for future in as_completed(futures):
-                try:
-                    results.append(future.result(timeout=2))
-                except Exception as e:
-                    logger.error(f"Error in connectivity check: {e}")
+        # Probe all hosts at once over ICMP sockets; fall back to forking
+        # ping only if the kernel gives us neither datagram nor raw sockets
+        try:
+            rtts = await self.icmp.probe([target['host'] for target in check_hosts], timeout=1.0)
+            results = [{
+                'host': target['host'],
+                'name': target['name'],
+                'reachable': rtts[target['host']] is not None,
+                'response_time': rtts[target['host']]
+            } for target in check_hosts]
+        except OSError as e:
+            logger.warning(f"ICMP probe unavailable ({e}), falling back to ping")
+            results = list(await asyncio.gather(*(self.ping_host(target) for target in check_hosts)))
         
         # Determine overall connectivity status
         reachable_count = sum(1 for r in results if r.get('reachable', False))
@@ -2198,40 +3062,39 @@ class MetricsHandler(BaseHTTPRequestHandler):
             'avg_response_time': round(avg_response_time, 1) if avg_response_time else None
         }
     
-    def get_connected_clients(self) -> Dict[str, Any]:
-        """Get connected clients from network-metrics-exporter and ARP table"""
+    async def get_connected_clients(self) -> Dict[str, Any]:
+        """Get connected clients from network-metrics-exporter and the neighbor table"""
         start = time.time()
         clients = []
         seen_ips = set()
         
-        # Get bandwidth data from VictoriaMetrics
-        bandwidth_data = self.get_client_bandwidth_rates()
-        
-        # Get client info from network-metrics-exporter
-        exporter_clients = client_info_cache.get_clients()
+        # Bandwidth from VictoriaMetrics and client info from network-metrics-exporter, concurrently
+        bandwidth_data, exporter_clients = await asyncio.gather(self.get_client_bandwidth_rates(),
+                                                                client_info_cache.get_clients())
         
-        # Read ARP table for MAC addresses and state
+        # LAN neighbors with a usable MAC, kept current by netlink events
         arp_data = {}
+        ipv6_by_mac = {}
         try:
-            with open('/proc/net/arp', 'r') as f:
-                lines = f.readlines()[1:]  # Skip header
-                
-            for line in lines:
-                parts = line.split()
-                if len(parts) >= 6:
-                    ip = parts[0]
-                    flags = parts[2]
-                    mac = parts[3].lower()
-                    device = parts[5]
-                    
-                    # Check if it's on br-lan
-                    if device == 'br-lan' and mac != '00:00:00:00:00:00' and flags != '0x0':
-                        arp_data[ip] = {
-                            'mac': mac,
-                            'state': 'REACHABLE' if flags in ['0x2', '0x6'] else 'STALE'
-                        }
-        except Exception as e:
-            logger.error(f"Error reading ARP table: {e}")
+            neighbors = await self.neighbors.get_neighbors()
+        except OSError as e:
+            logger.error(f"Error reading neighbor table: {e}")
+            neighbors = {}
+        for neighbor in neighbors.values():
+            if neighbor['ifname'] != LAN_INTERFACE or neighbor['state'] not in NUD_PRESENT or not neighbor['mac']:
+                continue
+            if neighbor['family'] == 4:
+                arp_data[neighbor['ip']] = neighbor
+            else:
+                ipv6_by_mac.setdefault(neighbor['mac'], []).append(neighbor)
+        
+        # IPv6-only devices still show up, under their preferred address
+        ipv4_macs = {neighbor['mac'] for neighbor in arp_data.values()}
+        for mac, addresses in ipv6_by_mac.items():
+            if mac not in ipv4_macs:
+                # Global addresses over link-local (fe80::/10)
+                preferred = min(addresses, key=lambda n: (ipaddress.ip_address(n['ip']).is_link_local, n['ip']))
+                arp_data[preferred['ip']] = preferred
         
         # Combine data from all sources
         for ip, arp_info in arp_data.items():
@@ -2257,10 +3120,11 @@ class MetricsHandler(BaseHTTPRequestHandler):
             clients.append({
                 'ip': ip,
                 'mac': arp_info['mac'],
+                'ipv6': [n['ip'] for n in ipv6_by_mac.get(arp_info['mac'], [])],
                 'hostname': hostname,
                 'device_type': device_type,
                 'icon': self.get_device_icon(device_type),
-                'source': 'arp',
+                'source': 'neighbor',
                 'state': state,
                 'bandwidth_rx_bps': bw_info.get('rx_bps', 0),
                 'bandwidth_tx_bps': bw_info.get('tx_bps', 0),
@@ -2276,6 +3140,7 @@ class MetricsHandler(BaseHTTPRequestHandler):
                 clients.append({
                     'ip': ip,
                     'mac': 'unknown',
+                    'ipv6': [],
                     'hostname': client_info.get('hostname', ip),
                     'device_type': client_info.get('device_type', 'unknown'),
                     'icon': self.get_device_icon(client_info.get('device_type', 'unknown')),
@@ -2294,12 +3159,32 @@ class MetricsHandler(BaseHTTPRequestHandler):
         if total_time > 100:  # More than 100ms
             logger.debug(f"get_connected_clients took: {total_time}ms")
         
+        # Every client goes into the index behind /api/clients; the section
+        # itself only carries the busiest few for the summary
+        self.client_index = index = ClientIndex(clients)
         return {
             'count': len(clients),
-            'clients': clients[:20],  # Limit to 20 for display
+            'clients': index.page(limit=CLIENT_SUMMARY_SIZE)['clients'],
             '_debug_timing': total_time
         }
     
+    def get_client_index(self, max_age: Optional[float] = 5) -> ClientIndex:
+        """The latest client index, rebuilt if older than `max_age` seconds
+        
+        With max_age None (the collector owns refreshes) it is only built
+        here if no refresh has produced one yet.
+        """
+        index = self.client_index
+        if max_age is None:
+            stale = index.created == 0
+        else:
+            stale = time.time() - index.created > max_age
+        if stale:
+            self.flight.do('clients', lambda: data_sources.run(self.get_connected_clients(),
+                                                               SECTION_TIMEOUTS['clients'] + 1))
+            index = self.client_index
+        return index
+    
     
     def format_bytes(self, bytes_val: int) -> str:
         for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
@@ -2319,12 +3204,28 @@ class MetricsHandler(BaseHTTPRequestHandler):
         else:
             return f"{bps/1000000000:.1f} Gbps"
     
-    def get_client_bandwidth_rates(self) -> Dict[str, Dict[str, Any]]:
+    async def get_client_bandwidth_rates(self) -> Dict[str, Dict[str, Any]]:
         """Get bandwidth rates for all clients from VictoriaMetrics"""
         try:
-            # Query for all client traffic rates
-            query = 'client_traffic_rate_bps'
-            result = self.query_victoriametrics(query)
+            # Rates for display and byte counters for the rolling totals, in one round-trip
+            try:
+                results = await victoriametrics.aquery_many({
+                    'rates': 'client_traffic_rate_bps',
+                    'bytes': 'max by (ip, direction) (client_traffic_bytes)'
+                }, name='client_rates')
+            except Exception as e:
+                logger.error(f"Error querying VictoriaMetrics: {e}")
+                results = {}
+            result = results.get('rates')
+            
+            if results.get('bytes'):
+                now = time.time()
+                client_traffic.record({
+                    (item['metric']['ip'], item['metric']['direction']): float(item['value'][1])
+                    for item in results['bytes']
+                    if item['metric'].get('ip') and item['metric'].get('direction') in TRAFFIC_DIRECTIONS
+                }, now)
+                client_traffic.ensure_backfilled(now)
             
             bandwidth_by_ip = {}
             
@@ -2342,6 +3243,9 @@ class MetricsHandler(BaseHTTPRequestHandler):
                     elif direction == 'tx':
                         bandwidth_by_ip[ip]['tx_bps'] = rate
             
+            if result and client_rollups is not None:
+                client_rollups.record({ip: (bw['rx_bps'], bw['tx_bps']) for ip, bw in bandwidth_by_ip.items() if ip})
+            
             # Format the bandwidth for display
             for ip, bw in bandwidth_by_ip.items():
                 bw['rx_formatted'] = self.format_bandwidth(bw['rx_bps'])
@@ -2355,259 +3259,60 @@ class MetricsHandler(BaseHTTPRequestHandler):
             logger.error(f"Error getting client bandwidth rates: {e}")
             return {}
     
-    def get_bulk_client_histories(self, client_ips: list, duration: str = '10m') -> Dict[str, Any]:
-        """Get bandwidth history for multiple clients in a single VictoriaMetrics query"""
-        start_time = time.time()
-        
-        # Check cache for bulk request
-        cache_key = f"bulk_histories_{','.join(sorted(client_ips))}_{duration}"
-        cached = bandwidth_history_cache.get(cache_key)
-        if cached:
-            logger.debug(f"Using cached bulk histories for {len(client_ips)} clients")
-            return cached
+    def get_bulk_client_histories(self, client_ips: list, duration: str = '10m', timeout: float = 10) -> Dict[str, Any]:
+        """Get bandwidth history for multiple clients, assembled from per-client cached series"""
+        if not client_ips:
+            return {}
         
+        timestamps, columns, duration_seconds, _ = self.get_client_history_columns(client_ips, duration, timeout)
+        labels = format_history_labels(timestamps, duration_seconds)
         histories = {}
-        
-        # Initialize empty histories for all IPs
         for ip in client_ips:
-            histories[ip] = {
-                'ip': ip,
-                'labels': [],
-                'rx': [],
-                'tx': []
-            }
-        
-        if not client_ips:
-            return histories
+            rx, tx = columns[ip]
+            histories[ip] = {'ip': ip, 'labels': labels, 'rx': rx.tolist(), 'tx': tx.tolist()}
+        return histories
+    
+    def get_client_history_columns(self, client_ips: list, duration: str = '10m', timeout: float = 10) -> tuple:
+        """(timestamps, {ip: (rx, tx)}, duration seconds, step) on one shared grid, as array('d')
         
-        try:
-            # Build time range parameters
-            end_time = int(time.time())
-            
-            # Parse duration and determine optimal step size
-            if duration.endswith('m'):
-                duration_seconds = int(duration[:-1]) * 60
-            elif duration.endswith('h'):
-                duration_seconds = int(duration[:-1]) * 3600
-            elif duration.endswith('d'):
-                duration_seconds = int(duration[:-1]) * 86400
-            else:
-                duration_seconds = 600  # Default 10 minutes for bulk
-            
-            start_time_query = end_time - duration_seconds
-            
-            # Adaptive step size and max points based on duration
-            # Goal: Keep graphs responsive with max ~100 data points
-            if duration_seconds <= 600:  # <= 10 minutes
-                step = 30  # 30-second resolution
-                max_points = 100
-            elif duration_seconds <= 1800:  # <= 30 minutes
-                step = 60  # 1-minute resolution
-                max_points = 100
-            elif duration_seconds <= 3600:  # <= 1 hour
-                step = 120  # 2-minute resolution
-                max_points = 100
-            elif duration_seconds <= 10800:  # <= 3 hours
-                step = 300  # 5-minute resolution
-                max_points = 100
-            elif duration_seconds <= 21600:  # <= 6 hours
-                step = 600  # 10-minute resolution
-                max_points = 100
-            elif duration_seconds <= 43200:  # <= 12 hours
-                step = 900  # 15-minute resolution
-                max_points = 100
-            elif duration_seconds <= 86400:  # <= 24 hours
-                step = 1800  # 30-minute resolution
-                max_points = 100
-            elif duration_seconds <= 172800:  # <= 48 hours (2 days)
-                step = 3600  # 1-hour resolution
-                max_points = 100
-            elif duration_seconds <= 259200:  # <= 72 hours (3 days)
-                step = 7200  # 2-hour resolution
-                max_points = 100
-            elif duration_seconds <= 604800:  # <= 1 week
-                step = 14400  # 4-hour resolution
-                max_points = 100
-            else:  # > 1 week
-                step = 21600  # 6-hour resolution
-                max_points = 100
-            
-            logger.debug(f"Duration: {duration}, seconds: {duration_seconds}, step: {step}s, max_points: {max_points}")
-            
-            # Build a single query for all clients using regex matching
-            # This queries all client_traffic_rate_bps metrics and filters by IP
-            base_url = "http://localhost:8428/api/v1/query_range"
-            
-            # Query all client traffic in one request
-            ip_regex = '|'.join(client_ips)
-            query = f'client_traffic_rate_bps{{ip=~"{ip_regex}"}}'
-            
-            params = {
-                'query': query,
-                'start': start_time_query,
-                'end': end_time,
-                'step': step
-            }
-            
-            url = f"{base_url}?{urllib.parse.urlencode(params)}"
-            logger.debug(f"Bulk query URL: {url}")
-            logger.debug(f"Query params: start={start_time_query}, end={end_time}, step={step}, duration_seconds={duration_seconds}")
-            
-            with urllib.request.urlopen(url, timeout=10) as response:
-                data = json.loads(response.read().decode())
-                
-                logger.debug(f"VictoriaMetrics response status: {data.get('status')}")
-                if data.get('data', {}).get('result'):
-                    logger.debug(f"Got {len(data['data']['result'])} series from VictoriaMetrics")
-                
-                if data.get('status') == 'success' and data.get('data', {}).get('result'):
-                    # Process each series returned - collect all data first
-                    series_data = {}  # ip -> {rx_values: [], tx_values: [], timestamps: []}
-                    
-                    for series in data['data']['result']:
-                        metric = series.get('metric', {})
-                        ip = metric.get('ip')
-                        direction = metric.get('direction')
-                        values = series.get('values', [])
-                        
-                        logger.debug(f"Processing series: ip={ip}, direction={direction}, values_count={len(values)}")
-                        
-                        if ip and ip in histories:
-                            if ip not in series_data:
-                                series_data[ip] = {'rx_values': [], 'tx_values': [], 'timestamps': []}
-                            
-                            if direction == 'rx':
-                                series_data[ip]['rx_values'] = [float(v) for _, v in values]
-                                series_data[ip]['timestamps'] = [float(ts) for ts, _ in values]
-                                logger.debug(f"Stored RX data for {ip}: {len(values)} points")
-                            elif direction == 'tx':
-                                series_data[ip]['tx_values'] = [float(v) for _, v in values]
-                                logger.debug(f"Stored TX data for {ip}: {len(values)} points")
-                    
-                    # Now process each IP's complete data
-                    for ip, data_dict in series_data.items():
-                        rx_values = data_dict['rx_values']
-                        tx_values = data_dict['tx_values']
-                        timestamps = data_dict['timestamps']
-                        
-                        logger.debug(f"Processing {ip}: rx={len(rx_values)}, tx={len(tx_values)}, timestamps={len(timestamps)}")
-                        
-                        # Use the longest array as the reference (should all be the same length)
-                        max_len = max(len(rx_values), len(tx_values), len(timestamps))
-                        if max_len == 0:
-                            logger.debug(f"Skipping {ip} - no data")
-                            continue
-                            
-                        # Pad shorter arrays with zeros/last timestamp
-                        while len(rx_values) < max_len:
-                            rx_values.append(0.0)
-                        while len(tx_values) < max_len:
-                            tx_values.append(0.0)
-                        while len(timestamps) < max_len:
-                            timestamps.append(timestamps[-1] if timestamps else start_time_query)
-                        
-                        # Truncate to shortest length if somehow mismatched
-                        min_len = min(len(rx_values), len(tx_values), len(timestamps))
-                        rx_values = rx_values[:min_len]
-                        tx_values = tx_values[:min_len]
-                        timestamps = timestamps[:min_len]
-                        
-                        # Generate formatted labels
-                        if duration_seconds <= 3600:  # <= 1 hour: show time only
-                            labels = [time.strftime('%H:%M:%S', time.localtime(ts)) for ts in timestamps]
-                        elif duration_seconds <= 86400:  # <= 24 hours: show hours:minutes
-                            labels = [time.strftime('%H:%M', time.localtime(ts)) for ts in timestamps]
-                        elif duration_seconds <= 604800:  # <= 1 week: show day and time
-                            labels = [time.strftime('%m/%d %H:%M', time.localtime(ts)) for ts in timestamps]
-                        else:  # > 1 week: show date only
-                            labels = [time.strftime('%m/%d', time.localtime(ts)) for ts in timestamps]
-                        
-                        # Apply downsampling if needed BEFORE storing
-                        if len(labels) > max_points:
-                            logger.debug(f"Downsampling {ip}: {len(labels)} -> {max_points} points")
-                            downsample_rate = len(labels) // max_points
-                            labels = labels[::downsample_rate][:max_points]
-                            rx_values = rx_values[::downsample_rate][:max_points]
-                            tx_values = tx_values[::downsample_rate][:max_points]
-                        
-                        # Store the processed data
-                        logger.debug(f"Storing {ip}: labels={len(labels)}, rx={len(rx_values)}, tx={len(tx_values)}")
-                        histories[ip]['labels'] = labels
-                        histories[ip]['rx'] = rx_values
-                        histories[ip]['tx'] = tx_values
-            
-            # Calculate expected number of points
-            num_points = min(max_points, max(1, int(duration_seconds / step)))
-            # Fill in empty data for clients with no metrics and validate all arrays
-            for ip in client_ips:
-                if not histories[ip]['labels']:  # No data from VictoriaMetrics
-                    # Generate time labels for empty data
-                    for i in range(num_points):
-                        timestamp = start_time_query + (i * step)
-                        # Format based on duration
-                        if duration_seconds <= 3600:  # <= 1 hour
-                            time_str = time.strftime('%H:%M:%S', time.localtime(timestamp))
-                        elif duration_seconds <= 86400:  # <= 24 hours
-                            time_str = time.strftime('%H:%M', time.localtime(timestamp))
-                        elif duration_seconds <= 604800:  # <= 1 week
-                            time_str = time.strftime('%m/%d %H:%M', time.localtime(timestamp))
-                        else:  # > 1 week
-                            time_str = time.strftime('%m/%d', time.localtime(timestamp))
-                        histories[ip]['labels'].append(time_str)
-                    histories[ip]['rx'] = [0] * num_points
-                    histories[ip]['tx'] = [0] * num_points
-                else:
-                    # Validate that all arrays are the same length
-                    label_count = len(histories[ip]['labels'])
-                    rx_count = len(histories[ip]['rx'])
-                    tx_count = len(histories[ip]['tx'])
-                    
-                    if not (label_count == rx_count == tx_count):
-                        logger.warning(f"Pre-validation length mismatch for {ip}: labels={label_count}, rx={rx_count}, tx={tx_count}")
-                        # Fix by truncating to shortest length
-                        min_count = min(label_count, rx_count, tx_count)
-                        if min_count > 0:
-                            histories[ip]['labels'] = histories[ip]['labels'][:min_count]
-                            histories[ip]['rx'] = histories[ip]['rx'][:min_count]
-                            histories[ip]['tx'] = histories[ip]['tx'][:min_count]
-                        else:
-                            # All arrays are empty, generate empty data
-                            histories[ip]['labels'] = []
-                            histories[ip]['rx'] = []
-                            histories[ip]['tx'] = []
+        Clients without data get zero columns.
+        """
+        start_time = time.time()
+        duration_seconds = parse_duration(duration)
+        step = history_step(duration_seconds)
+        logger.debug(f"Duration: {duration}, seconds: {duration_seconds}, step: {step}s, max_points: {HISTORY_MAX_POINTS}")
         
-        except Exception as e:
-            logger.error(f"Error fetching bulk histories: {e}")
-            # Fill with empty data on error
-            num_points = 10
-            for ip in client_ips:
-                if not histories[ip]['labels']:
-                    for i in range(num_points):
-                        timestamp = end_time - ((num_points - i - 1) * 30)
-                        time_str = time.strftime('%H:%M:%S', time.localtime(timestamp))
-                        histories[ip]['labels'].append(time_str)
-                    histories[ip]['rx'] = [0] * num_points
-                    histories[ip]['tx'] = [0] * num_points
+        series = client_series_cache.get(client_ips, duration_seconds, step, timeout=timeout)
         
-        elapsed = time.time() - start_time
-        # Log statistics with validation
-        total_points = sum(len(h['labels']) for h in histories.values())
+        # Join the cached series onto one grid; they normally share it already
+        grid = set()
+        for entry in series.values():
+            grid.update(entry.timestamps)
+        timestamps = array('d', sorted(grid))
+        if not timestamps:
+            # No data at all: an empty grid over the requested window
+            start_time_query = int(start_time) - duration_seconds
+            num_points = min(HISTORY_MAX_POINTS, max(1, duration_seconds // step))
+            timestamps = array('d', (start_time_query + i * step for i in range(num_points)))
         
-        # Debug: Check for mismatched array lengths
-        for ip, history in histories.items():
-            if history['labels']:  # Only check if there's data
-                label_len = len(history['labels'])
-                rx_len = len(history['rx'])
-                tx_len = len(history['tx'])
-                if not (label_len == rx_len == tx_len):
-                    logger.warning(f"Array length mismatch for {ip}: labels={label_len}, rx={rx_len}, tx={tx_len}")
+        # Every client shares the timestamp grid, so buckets and labels are computed once
+        ips_with_data = [ip for ip in client_ips if ip in series]
+        flat = []
+        for ip in ips_with_data:
+            entry = series[ip]
+            flat.append(align_column(entry.timestamps, entry.rx, timestamps))
+            flat.append(align_column(entry.timestamps, entry.tx, timestamps))
+        timestamps, flat = downsample_mean(timestamps, flat, HISTORY_MAX_POINTS)
         
-        logger.info(f"Fetched {len(histories)} client histories ({total_points} total points) in {elapsed:.2f}s with step={step}s")
+        columns = {ip: (flat[2 * i], flat[2 * i + 1]) for i, ip in enumerate(ips_with_data)}
+        zeros = array('d', bytes(8 * len(timestamps)))
+        for ip in client_ips:
+            columns.setdefault(ip, (zeros, zeros))
         
-        # Cache the bulk result
-        bandwidth_history_cache.set(cache_key, histories)
+        elapsed = time.time() - start_time
+        logger.info(f"Assembled {len(client_ips)} client histories ({len(timestamps)} points each) in {elapsed:.2f}s with step={step}s")
         
-        return histories
+        return timestamps, columns, duration_seconds, step
     
     def get_client_bandwidth_history(self, client_ip: str, duration: str = '30m') -> Dict[str, Any]:
         """Get bandwidth history for a specific client from VictoriaMetrics"""
@@ -2621,7 +3326,680 @@ class MetricsHandler(BaseHTTPRequestHandler):
             'error': 'No data available'
         })
 
+def json_pointer_token(key: Any) -> str:
+    return str(key).replace('~', '~0').replace('/', '~1')
+
+def json_patch(old: Any, new: Any, path: str = '') -> list:
+    """RFC 6902 operations turning `old` into `new`
+    
+    Recurses into dicts and into lists of equal length, so a bandwidth
+    change for one client becomes a single small `replace`. Lists that grew
+    or shrank are replaced wholesale.
+    """
+    if old == new:
+        return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key, value in new.items():
+            child = f"{path}/{json_pointer_token(key)}"
+            if key not in old:
+                ops.append({'op': 'add', 'path': child, 'value': value})
+            else:
+                ops.extend(json_patch(old[key], value, child))
+        for key in old:
+            if key not in new:
+                ops.append({'op': 'remove', 'path': f"{path}/{json_pointer_token(key)}"})
+        return ops
+    if isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        ops = []
+        for index, (before, after) in enumerate(zip(old, new)):
+            ops.extend(json_patch(before, after, f"{path}/{index}"))
+        return ops
+    return [{'op': 'replace', 'path': path, 'value': new}]
+
+# How often each section is refreshed by the background collector (seconds)
+SECTION_INTERVALS = {
+    'uptime': 30,
+    'cpu': 5,
+    'memory': 5,
+    'network': 5,
+    'clients': 5,
+    'connectivity': 30,
+    'blocky': 10
+}
+
+# Seconds a section may take before its refresh is cancelled; VictoriaMetrics
+# queries and probes time out on their own well before these
+SECTION_TIMEOUTS = {
+    'uptime': 2,
+    'cpu': 2,
+    'memory': 2,
+    'network': 2,
+    'clients': 5,
+    'connectivity': 3,
+    'blocky': 3
+}
+
+# (shortest, longest) refresh interval per section while adapting, in seconds
+SECTION_INTERVAL_BOUNDS = {
+    'uptime': (30, 300),
+    'cpu': (2, 10),
+    'memory': (5, 60),
+    'network': (2, 15),
+    'clients': (5, 30),
+    'connectivity': (15, 120),
+    'blocky': (10, 120)
+}
+# Fields the page shows, for sections where others move on every refresh
+# (uptime seconds); only these count as a change when adapting
+SECTION_CHANGE_KEYS = {
+    'uptime': ('formatted',),
+    'memory': ('percent',)
+}
+ADAPT_SHRINK = 0.8  # interval factor after a refresh that changed the section
+ADAPT_GROW = 1.25  # ... and after one that didn't
+ADAPT_COST_REFERENCE = 0.05  # CPU seconds per refresh at which backing off doubles
+ADAPT_ALPHA = 0.2  # weight of the latest refresh in change rate and cost averages
+
+def section_signature(name: str, value: Any) -> Any:
+    """The part of a section's value whose change should speed up its refreshes"""
+    if not isinstance(value, dict):
+        return value
+    keys = SECTION_CHANGE_KEYS.get(name)
+    if keys:
+        return tuple(value.get(key) for key in keys)
+    # Debug fields like _debug_timing change every time
+    return {key: item for key, item in value.items() if not key.startswith('_')}
+
+class MetricsCollector:
+    """Refreshes each section in the background and publishes snapshots
+    
+    Every section runs on its own cadence (SECTION_INTERVALS) as a task on
+    the data-source loop, cancelled if it outlasts SECTION_TIMEOUTS. Stopping
+    the collector cancels the scheduler and every refresh still in flight
+    with it. When a refresh changes a section, a new snapshot dict is
+    built, serialized and swapped in; a published snapshot is never mutated
+    again, so requests read it without locking. Unchanged refreshes don't
+    republish, which keeps the ETag stable for conditional polls.
+    
+    Stream subscribers wait on `published` and are handed the new snapshot
+    plus, while anyone is subscribed, a JSON patch against the previous one.
+    
+    With `adaptive`, each section's interval moves within
+    SECTION_INTERVAL_BOUNDS: it shrinks after a refresh that changed what
+    the page shows and grows after one that didn't, faster for sections
+    that cost more CPU to collect. scheduler_report() compares the CPU spent
+    with what the fixed SECTION_INTERVALS would have cost. CPU is the loop
+    thread's time from start to end of a refresh, so refreshes overlapping
+    on an await share theirs; procfs sections never await, so theirs is
+    exact.
+    """
+    def __init__(self, source: SystemMetrics, intervals: Optional[Dict[str, float]] = None,
+                 adaptive: bool = True):
+        self.source = source
+        self.base_intervals = dict(SECTION_INTERVALS, **(intervals or {}))
+        self.intervals = dict(self.base_intervals)
+        self.adaptive = adaptive
+        self.change_rate = {}  # name -> moving average of "refresh changed it"
+        self.cost = {}  # name -> moving average of CPU seconds per refresh
+        self.signatures = {}
+        self.refreshes = dict.fromkeys(self.base_intervals, 0)
+        self.cpu_seconds = dict.fromkeys(self.base_intervals, 0.0)
+        self.started_at = None
+        self.sections = {}  # name -> {'value', 'updated', 'duration'}
+        self.snapshot = None
+        self.response = None  # snapshot serialized once per publish
+        self.version = 0
+        # Recent (version, serialized ops) so a subscriber that missed a
+        # few publishes still gets a patch instead of a full snapshot
+        self.patches = deque(maxlen=16)
+        self.subscribers = 0
+        self.lock = threading.Lock()
+        self.published = threading.Condition(self.lock)
+        self.in_flight = set()
+        self.stop_event = threading.Event()
+        self.task = None
+    
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+    
+    def start(self, initial_timeout: float = 5.0):
+        """Collect every section once, then keep refreshing in the background"""
+        self.started_at = time.monotonic()
+        self.stop_event.clear()
+        ready = threading.Event()
+        self.task = data_sources.submit(self.run(ready, initial_timeout))
+        ready.wait(initial_timeout + 1)
+    
+    def stop(self):
+        self.stop_event.set()
+        with self.published:
+            self.published.notify_all()
+        if self.task:
+            self.task.cancel()
+    
+    async def run(self, ready: threading.Event, initial_timeout: float):
+        # Refreshes are children of the scheduler, so cancelling it cancels them too
+        async with asyncio.TaskGroup() as group:
+            initial = [group.create_task(self.refresh(name)) for name in self.source.sections()]
+            _, pending = await asyncio.wait(initial, timeout=initial_timeout)
+            if pending:
+                logger.warning(f"Initial collection incomplete: {len(pending)} sections still running")
+            ready.set()
+            
+            now = time.monotonic()
+            next_due = {name: now + self.intervals[name] for name in self.source.sections()}
+            while True:
+                await asyncio.sleep(max(0.05, min(next_due.values()) - time.monotonic()))
+                now = time.monotonic()
+                for name, due in next_due.items():
+                    if due > now:
+                        continue
+                    next_due[name] = now + self.intervals[name]
+                    with self.lock:
+                        # Skip a section whose previous refresh is still running
+                        if name in self.in_flight:
+                            continue
+                        self.in_flight.add(name)
+                    group.create_task(self.refresh(name))
+    
+    async def refresh(self, name: str):
+        """Collect one section under its timeout and publish a new snapshot"""
+        with self.lock:
+            self.in_flight.add(name)
+        start = time.monotonic()
+        cpu_start = time.thread_time()
+        try:
+            async with asyncio.timeout(SECTION_TIMEOUTS[name]):
+                value = await settle(self.source.sections()[name]())
+            duration = round((time.monotonic() - start) * 1000, 1)
+        except Exception as e:
+            logger.error(f"Error collecting {name}: {e!r}")
+            SECTION_ERRORS.inc(name)
+            value = None
+            duration = -1  # Mark as error
+        except BaseException:
+            with self.lock:
+                self.in_flight.discard(name)
+            raise
+        cpu = time.thread_time() - cpu_start
+        SECTION_DURATION.observe(time.monotonic() - start, name)
+        
+        with self.lock:
+            self.in_flight.discard(name)
+            self.refreshes[name] = self.refreshes.get(name, 0) + 1
+            self.cpu_seconds[name] = self.cpu_seconds.get(name, 0.0) + cpu
+            if value is not None:
+                self.adapt(name, value, cpu)
+            previous = self.sections.get(name)
+            if value is None:
+                # Keep serving the last good value, but let its age show
+                value = previous['value'] if previous else {}
+                updated = previous['updated'] if previous else time.time()
+            else:
+                updated = time.time()
+            changed = previous is None or previous['value'] != value
+            self.sections[name] = {'value': value, 'updated': updated, 'duration': duration}
+            if changed:
+                self.publish()
+    
+    def adapt(self, name: str, value: Any, cpu: float):
+        """Move a section's interval after a successful refresh (caller holds the lock)"""
+        signature = section_signature(name, value)
+        first = name not in self.signatures
+        changed = self.signatures.get(name) != signature
+        self.signatures[name] = signature
+        cost = self.cost.get(name, cpu)
+        self.cost[name] = cost = cost + ADAPT_ALPHA * (cpu - cost)
+        if first:
+            return
+        rate = self.change_rate.get(name, 1.0)
+        self.change_rate[name] = rate + ADAPT_ALPHA * (changed - rate)
+        if not self.adaptive:
+            return
+        
+        base = self.base_intervals[name]
+        low, high = SECTION_INTERVAL_BOUNDS.get(name, (base, base))
+        if changed:
+            interval = self.intervals[name] * ADAPT_SHRINK
+        else:
+            # Expensive sections back off faster
+            interval = self.intervals[name] * ADAPT_GROW * (1 + min(1.0, cost / ADAPT_COST_REFERENCE))
+        self.intervals[name] = min(high, max(low, interval))
+    
+    def scheduler_report(self) -> Dict[str, Any]:
+        """Per-section intervals and CPU spent, against the fixed-interval schedule"""
+        with self.lock:
+            elapsed = time.monotonic() - self.started_at if self.started_at is not None else 0.0
+            sections = {}
+            for name, base in self.base_intervals.items():
+                refreshes = self.refreshes.get(name, 0)
+                cpu = self.cpu_seconds.get(name, 0.0)
+                fixed_refreshes = elapsed / base + 1
+                fixed_cpu = fixed_refreshes * cpu / refreshes if refreshes else 0.0
+                sections[name] = {
+                    'interval': round(self.intervals[name], 2),
+                    'base_interval': base,
+                    'change_rate': round(self.change_rate.get(name, 0.0), 3),
+                    'cpu_ms_per_refresh': round(self.cost.get(name, 0.0) * 1000, 2),
+                    'refreshes': refreshes,
+                    'fixed_refreshes': int(fixed_refreshes),
+                    'cpu_seconds': round(cpu, 3),
+                    'cpu_saved_seconds': round(fixed_cpu - cpu, 3)
+                }
+        spent = sum(section['cpu_seconds'] for section in sections.values())
+        saved = sum(section['cpu_saved_seconds'] for section in sections.values())
+        return {
+            'adaptive': self.adaptive,
+            'elapsed_seconds': round(elapsed, 1),
+            'cpu_seconds': round(spent, 3),
+            'cpu_saved_seconds': round(saved, 3),
+            'cpu_saved_percent': round(100 * saved / (spent + saved), 1) if spent + saved > 0 else None,
+            'sections': sections
+        }
+    
+    def publish(self):
+        """Build and swap in a new immutable snapshot (caller holds the lock)"""
+        now = time.time()
+        snapshot = {name: section['value'] for name, section in self.sections.items()}
+        snapshot['timestamp'] = int(now)
+        snapshot['_timings'] = {
+            'total': 0,
+            'details': {name: section['duration'] for name, section in self.sections.items()},
+            'age': {name: round(now - section['updated'], 1) for name, section in self.sections.items()},
+            'from_cache': True
+        }
+        if self.subscribers and self.snapshot is not None:
+            ops = json.dumps(json_patch(self.snapshot, snapshot), separators=(',', ':')).encode()
+            self.patches.append((self.version + 1, ops[1:-1]))
+        else:
+            self.patches.clear()
+        self.snapshot = snapshot
+        self.response = PreparedResponse.json(snapshot)
+        self.version += 1
+        self.published.notify_all()
+    
+    def get_snapshot(self) -> Dict[str, Any]:
+        """Latest published snapshot; must be treated as read-only"""
+        return self.snapshot or {}
+    
+    def get_response(self) -> PreparedResponse:
+        """Latest snapshot, already serialized"""
+        return self.response or PreparedResponse.json({})
+    
+    def get_section(self, name: str) -> Optional[Dict[str, Any]]:
+        snapshot = self.snapshot
+        return snapshot.get(name) if snapshot else None
+    
+    def subscribe(self):
+        """Latest (version, response) and registers a stream subscriber"""
+        with self.lock:
+            self.subscribers += 1
+            return self.version, self.get_response()
+    
+    def unsubscribe(self):
+        with self.lock:
+            self.subscribers -= 1
+    
+    def wait_for_update(self, version: int, timeout: float):
+        """Block until a snapshot newer than `version` is published
+        
+        Returns (version, response, patch) where patch, when set, takes the
+        caller's version to the new one; (version, None, None) on timeout or
+        shutdown.
+        """
+        with self.published:
+            self.published.wait_for(lambda: self.version != version or self.stop_event.is_set(), timeout)
+            if self.version == version or self.stop_event.is_set():
+                return version, None, None
+            missed = [ops for patch_version, ops in self.patches if patch_version > version]
+            patch = None
+            if len(missed) == self.version - version:
+                patch = b'[' + b','.join(ops for ops in missed if ops) + b']'
+            return self.version, self.response, patch
+
+# Global collector instances
+system_metrics = SystemMetrics()
+collector = MetricsCollector(system_metrics)
+local_history = LocalHistory()
+
+def render_scheduler_metrics() -> list:
+    report = collector.scheduler_report()['sections']
+    lines = []
+    for key, name, kind in (('interval', 'dashboard_section_interval_seconds', 'gauge'),
+                            ('cpu_seconds', 'dashboard_section_cpu_seconds_total', 'counter'),
+                            ('cpu_saved_seconds', 'dashboard_section_cpu_saved_seconds', 'gauge')):
+        lines.append(f'# TYPE {name} {kind}')
+        for section, values in report.items():
+            lines.append(f'{name}{prometheus_labels(("section",), (section,))} {values[key]}')
+    return lines
+
+instrumentation.collectors.append(render_scheduler_metrics)
+
+# Routes labelled individually in /metrics; anything else counts as 'other'
+ROUTES = frozenset(['/', '/index.html', '/metrics', '/api/metrics', '/api/clients', '/api/client-histories',
+                    '/api/local-history', '/api/traffic', '/api/debug/caches', '/api/debug/scheduler'])
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections alive between polls; every response must
+    # therefore carry a Content-Length
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; don't let Nagle hold the
+    # body back waiting for a delayed ACK on a reused connection
+    disable_nagle_algorithm = True
+    # Idle keep-alive connections are closed after this many seconds
+    timeout = 15
+    # Per-request deadline in seconds, overridable with --request-timeout
+    request_timeout = 12.0
+    # Seconds between keep-alive comments on an idle event stream
+    stream_keepalive = 10.0
+    
+    def time_left(self) -> float:
+        """Seconds remaining before this request's deadline (never below 0.1)"""
+        return max(0.1, self.deadline - time.monotonic())
+    
+    def etag_matches(self, etag: str) -> bool:
+        """Whether the client's If-None-Match covers this ETag"""
+        header = self.headers.get('If-None-Match')
+        if not header:
+            return False
+        candidates = [tag.strip().removeprefix('W/') for tag in header.split(',')]
+        return '*' in candidates or etag in candidates
+    
+    def send_prepared(self, response: PreparedResponse, vary: str = 'Accept-Encoding') -> int:
+        """Send a prepared response, as 304 or gzip when the client allows; returns bytes sent
+        
+        `vary` lists the request headers the representation depends on.
+        """
+        body = response.body
+        etag = response.etag
+        gzipped = response.gzipped() if 'gzip' in self.headers.get('Accept-Encoding', '') else None
+        if gzipped is not None:
+            # Each encoding is a distinct representation and needs its own ETag
+            body = gzipped
+            etag = etag[:-1] + '-gzip"'
+        
+        if self.etag_matches(etag):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', response.cache_control)
+            self.send_header('Vary', vary)
+            self.end_headers()
+            return 0
+        
+        self.send_response(200)
+        self.send_header('Content-Type', response.content_type)
+        if gzipped is not None:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', response.cache_control)
+        self.send_header('Vary', vary)
+        if response.content_type == 'application/json':
+            self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(body)
+        self.bytes_sent = len(body)
+        return len(body)
+    
+    def route(self) -> str:
+        """The path without its query, or 'other', to keep /metrics label cardinality bounded"""
+        path = self.path.split('?', 1)[0]
+        if path.startswith('/static/'):
+            return '/static'
+        return path if path in ROUTES else 'other'
+    
+    def send_response(self, code, message=None):
+        self.status = code
+        super().send_response(code, message)
+    
+    def do_GET(self):
+        self.deadline = time.monotonic() + self.request_timeout
+        if self.path == '/api/stream':
+            # Streams are long-lived and mostly idle, so they don't take a worker
+            self.handle_stream()
+            return
+        started = time.monotonic()
+        self.status = None
+        self.bytes_sent = 0
+        # Wait for a free worker, but not past this request's deadline
+        worker_slots = getattr(self.server, 'worker_slots', None)
+        if worker_slots is not None and not worker_slots.acquire(timeout=self.time_left()):
+            self.send_error(503, "Dashboard busy")
+        else:
+            try:
+                self.handle_get()
+            finally:
+                if worker_slots is not None:
+                    worker_slots.release()
+        route = self.route()
+        HTTP_DURATION.observe(time.monotonic() - started, route)
+        HTTP_RESPONSE_SIZE.observe(self.bytes_sent, route)
+        HTTP_RESPONSES.inc(route, str(self.status))
+    
+    def client_index(self) -> ClientIndex:
+        """Connected clients for /api/clients and /api/client-histories
+        
+        While collecting in the background the collector's index is served
+        whatever its age (adaptive intervals stretch it to 30 s), so these
+        pages never pay for a refresh; on-demand mode rebuilds a stale one.
+        """
+        return system_metrics.get_client_index(None if collector.running else 5)
+    
+    def handle_stream(self):
+        """Push collector snapshots as Server-Sent Events
+        
+        The first event is the full snapshot; each later one is a JSON patch
+        against the previous event, or a full snapshot again if this client
+        fell behind. Every subscriber shares the collector's single producer.
+        """
+        if not collector.running:
+            self.send_error(503, "Streaming requires background collection")
+            return
+        
+        logger.debug(f"Stream subscriber connected from {self.address_string()}")
+        # No Content-Length: the stream ends when the connection closes
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.send_header('X-Accel-Buffering', 'no')
+        self.end_headers()
+        
+        version, response = collector.subscribe()
+        try:
+            self.wfile.write(b'retry: 5000\n')
+            self.wfile.write(b'event: snapshot\nid: %d\ndata: %s\n\n' % (version, response.body))
+            self.wfile.flush()
+            while not collector.stop_event.is_set():
+                new_version, response, patch = collector.wait_for_update(version, timeout=self.stream_keepalive)
+                if response is None:
+                    # Comment line keeps proxies from closing an idle stream
+                    self.wfile.write(b': keepalive\n\n')
+                elif patch is not None:
+                    self.wfile.write(b'event: patch\nid: %d\ndata: %s\n\n' % (new_version, patch))
+                else:
+                    self.wfile.write(b'event: snapshot\nid: %d\ndata: %s\n\n' % (new_version, response.body))
+                self.wfile.flush()
+                version = new_version
+        except (BrokenPipeError, ConnectionResetError, socket.timeout):
+            pass
+        finally:
+            collector.unsubscribe()
+            logger.debug(f"Stream subscriber from {self.address_string()} disconnected")
+    
+    def handle_get(self):
+        if self.path == '/' or self.path == '/index.html':
+            # Serve the dashboard HTML
+            logger.debug(f"Dashboard request from {self.address_string()}")
+            if static_assets is None:
+                self.send_error(503, "Dashboard assets not loaded")
+                return
+            sent = self.send_prepared(static_assets.page)
+            logger.debug(f"Served dashboard HTML ({sent} bytes)")
+        elif self.path.startswith('/static/'):
+            asset = static_assets.get(self.path.split('?', 1)[0]) if static_assets else None
+            if asset is None:
+                self.send_error(404)
+                return
+            self.send_prepared(asset)
+        elif self.path == '/api/metrics':
+            logger.debug(f"Metrics request from {self.address_string()}")
+            if collector.running:
+                response = collector.get_response()
+            else:
+                response = PreparedResponse.json(system_metrics.get_system_metrics())
+            sent = self.send_prepared(response)
+            logger.debug(f"Sent metrics response ({sent} bytes)")
+        elif self.path.startswith('/api/client-histories'):
+            # Bulk fetch client histories
+            logger.debug(f"Bulk client histories request from {self.address_string()}")
+            
+            try:
+                # Parse query parameters for specific IPs
+                from urllib.parse import urlparse, parse_qs
+                parsed = urlparse(self.path)
+                query_params = parse_qs(parsed.query)
+                
+                # Get requested IPs from query params, or all if not specified
+                if 'ips' in query_params:
+                    # IPs provided as comma-separated list
+                    client_ips = query_params['ips'][0].split(',')
+                    logger.debug(f"Fetching histories for specific IPs: {client_ips}")
+                else:
+                    # No IPs specified, get all connected clients
+                    client_ips = [client['ip'] for client in self.client_index().clients]
+                    logger.debug(f"Fetching histories for all {len(client_ips)} connected clients")
+                
+                # Get duration parameter (default to 10m)
+                duration = query_params.get('duration', ['10m'])[0]
+                logger.debug(f"Using duration: {duration}")
+                
+                # Fetch histories with specified duration, bounded by the request deadline
+                timeout = min(10, self.time_left())
+                binary = (query_params.get('format', [''])[0] == 'binary'
+                          or HISTORY_BINARY_TYPE in self.headers.get('Accept', ''))
+                if binary:
+                    timestamps, columns, duration_seconds, step = system_metrics.get_client_history_columns(
+                        client_ips, duration, timeout=timeout)
+                    response = PreparedResponse(
+                        encode_client_histories(timestamps, columns, client_ips, duration_seconds, step),
+                        HISTORY_BINARY_TYPE)
+                else:
+                    response = PreparedResponse.json(
+                        system_metrics.get_bulk_client_histories(client_ips, duration, timeout=timeout))
+                
+                # JSON or binary depending on Accept, so caches must key on both
+                sent = self.send_prepared(response, vary='Accept, Accept-Encoding')
+                logger.debug(f"Sent bulk histories for {len(client_ips)} clients ({sent} bytes)")
+            except TimeoutError:
+                self.send_error(503, "Timed out listing connected clients")
+            except Exception as e:
+                logger.error(f"Error handling bulk histories request: {e}", exc_info=True)
+                self.send_error(500, "Internal Server Error")
+        elif self.path == '/metrics':
+            # Self-instrumentation, scraped by VictoriaMetrics
+            self.send_prepared(PreparedResponse(instrumentation.render(), 'text/plain; version=0.0.4; charset=utf-8'))
+        elif self.path.startswith('/api/clients'):
+            self.handle_clients()
+        elif self.path.startswith('/api/traffic'):
+            self.handle_traffic()
+        elif self.path == '/api/debug/caches':
+            self.send_prepared(PreparedResponse.json(cache_stats()))
+        elif self.path == '/api/debug/scheduler':
+            self.send_prepared(PreparedResponse.json(collector.scheduler_report()))
+        elif self.path.startswith('/api/local-history'):
+            # Recent per-core CPU and interface rates from the in-memory ring buffers
+            query_params = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+            try:
+                seconds = int(query_params.get('seconds', ['600'])[0])
+                step = int(query_params.get('step', ['1'])[0])
+            except ValueError:
+                self.send_error(400, "seconds and step must be integers")
+                return
+            series = query_params.get('series', [''])[0]
+            prefixes = [prefix for prefix in series.split(',') if prefix]
+            history = local_history.query(seconds, step, prefixes)
+            sent = self.send_prepared(PreparedResponse.json(history))
+            logger.debug(f"Sent local history ({len(history['timestamps'])} samples, {sent} bytes)")
+        else:
+            self.send_error(404)
+    
+    def handle_clients(self):
+        """One page of connected clients: ?sort=&order=&limit=&cursor=&device_type=&state="""
+        query_params = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+        
+        def param(name, default=''):
+            return query_params.get(name, [default])[0]
+        
+        def values(name):
+            return frozenset(value for value in param(name).split(',') if value)
+        
+        sort = param('sort', 'bandwidth')
+        order = param('order', 'desc' if sort == 'bandwidth' else 'asc')
+        if sort not in CLIENT_SORTS or order not in ('asc', 'desc'):
+            self.send_error(400, f"sort must be one of {', '.join(CLIENT_SORTS)} and order asc or desc")
+            return
+        descending = order == 'desc'
+        try:
+            limit = min(CLIENT_MAX_PAGE_SIZE, max(1, int(param('limit', str(CLIENT_PAGE_SIZE)))))
+            cursor = decode_client_cursor(param('cursor'), sort, descending) if param('cursor') else None
+        except ValueError as e:
+            self.send_error(400, str(e))
+            return
+        
+        try:
+            index = self.client_index()
+        except TimeoutError:
+            self.send_error(503, "Timed out listing connected clients")
+            return
+        page = index.page(
+            sort, descending, limit, cursor,
+            device_types=values('device_type'),
+            states=frozenset(state.upper() for state in values('state')))
+        self.send_prepared(PreparedResponse.json(page))
+    
+    def handle_traffic(self):
+        """Top talkers from the rolling byte totals: ?window=&limit=&direction=, or per client with ?ips="""
+        query_params = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+        ips = [ip for ip in query_params.get('ips', [''])[0].split(',') if ip]
+        if ips:
+            self.send_prepared(PreparedResponse.json({'clients': client_traffic.totals(ips)}))
+            return
+        
+        window = query_params.get('window', ['24h'])[0]
+        direction = query_params.get('direction', ['total'])[0]
+        if window not in TRAFFIC_WINDOWS or direction not in ('total',) + TRAFFIC_DIRECTIONS:
+            self.send_error(400, f"window must be one of {', '.join(TRAFFIC_WINDOWS)} and direction total, rx or tx")
+            return
+        try:
+            limit = min(CLIENT_MAX_PAGE_SIZE, max(1, int(query_params.get('limit', ['10'])[0])))
+        except ValueError:
+            self.send_error(400, "limit must be an integer")
+            return
+        
+        talkers = []
+        for ip, rx, tx in client_traffic.top(window, limit, direction):
+            known = client_info_cache.cache.get(ip) or {}
+            talkers.append({
+                'ip': ip,
+                'hostname': known.get('hostname', ip),
+                'rx_bytes': round(rx),
+                'tx_bytes': round(tx),
+                'total_bytes': round(rx + tx),
+                'total_formatted': system_metrics.format_bytes(rx + tx)
+            })
+        self.send_prepared(PreparedResponse.json({'window': window, 'direction': direction, 'clients': talkers}))
+    
+    def log_message(self, format, *args):
+        # Log HTTP requests using our logger
+        logger.info(f"{self.address_string()} - {format % args}")
+
 def main():
+    global victoriametrics, static_assets, client_rollups
+    
     parser = argparse.ArgumentParser(description='Router Dashboard and Metrics API Server')
     parser.add_argument('--host', default='localhost', 
                        help='Host to bind to (default: localhost, use 0.0.0.0 for all interfaces)')
@@ -2632,17 +4010,51 @@ def main():
     parser.add_argument('--log-level', default='INFO',
                        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'],
                        help='Set the logging level (default: INFO)')
+    parser.add_argument('--workers', type=int, default=8,
+                       help='Maximum number of requests processed concurrently (default: 8)')
+    parser.add_argument('--max-connections', type=int, default=64,
+                       help='Maximum number of open client connections (default: 64)')
+    parser.add_argument('--request-timeout', type=float, default=12.0,
+                       help='Per-request deadline in seconds (default: 12)')
+    parser.add_argument('--collection', choices=['background', 'on-demand'], default='background',
+                       help='Refresh metrics in a background collector, or on request like before (default: background)')
+    parser.add_argument('--fixed-intervals', action='store_true',
+                       help='Refresh every section at its base interval instead of adapting to its change rate')
+    parser.add_argument('--victoriametrics-url', default=VICTORIAMETRICS_URL,
+                       help=f'VictoriaMetrics base URL (default: {VICTORIAMETRICS_URL})')
+    parser.add_argument('--history-cache-mb', type=float, default=8,
+                       help='Memory bound for cached client bandwidth histories in MiB (default: 8)')
+    parser.add_argument('--static-dir', default=STATIC_DIR,
+                       help='Directory with index.html and the dashboard assets (default: next to this script)')
+    parser.add_argument('--state-dir',
+                       help='Directory for client history rollups that outlive restarts and VictoriaMetrics outages (default: none)')
     
     args = parser.parse_args()
     
     # Update log level based on command line argument
     logger.setLevel(getattr(logging, args.log_level))
     
+    static_assets = StaticAssets(args.static_dir)
+    victoriametrics = VictoriaMetricsClient(args.victoriametrics_url)
+    MetricsHandler.request_timeout = args.request_timeout
+    client_series_cache.max_bytes = int(args.history_cache_mb * (1 << 20))
+    if args.state_dir:
+        try:
+            client_rollups = ClientRollups(os.path.join(args.state_dir, 'client-rollups.bin'))
+        except OSError as e:
+            logger.error(f"Client rollups unavailable, history depends on VictoriaMetrics alone: {e}")
+    
+    collector.adaptive = not args.fixed_intervals
+    if args.collection == 'background':
+        collector.start()
+    local_history.start()
+    
     # Override host if --bind-all is specified
     host = '0.0.0.0' if args.bind_all else args.host
     port = args.port
     
-    server = HTTPServer((host, port), MetricsHandler)
+    server = DashboardHTTPServer((host, port), MetricsHandler, max_workers=args.workers,
+                                 max_connections=args.max_connections)
     
     # Display appropriate URLs based on binding
     if host == '0.0.0.0':
@@ -2667,7 +4079,12 @@ def main():
         server.serve_forever()
     except KeyboardInterrupt:
         logger.info("Shutting down server...")
-        server.shutdown()
+    finally:
+        collector.stop()
+        local_history.stop()
+        server.server_close()
+        if client_rollups is not None:
+            client_rollups.close()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
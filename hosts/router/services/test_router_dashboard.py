@@ -0,0 +1,1126 @@
+"""Unit tests for router-dashboard.py.
+
+Hermetic like the rest of the repo's Python tests: no VictoriaMetrics, no
+Blocky, no pings. Upstream calls are replaced with counting fakes, so the
+file runs inside a Nix build.
+"""
+
+import asyncio
+import http.client
+import http.server
+import importlib.util
+import json
+import socket
+import struct
+import tempfile
+import threading
+import time
+import unittest
+import unittest.mock
+from array import array
+from pathlib import Path
+
+# router-dashboard.py isn't an importable module name
+spec = importlib.util.spec_from_file_location(
+    "router_dashboard", Path(__file__).with_name("router-dashboard.py")
+)
+dashboard = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(dashboard)
+dashboard.logger.setLevel("CRITICAL")
+
+CONCURRENCY = 50
+
+
+class CountingUpstream:
+    """A slow upstream call that records how often it actually ran."""
+
+    def __init__(self, result, delay=0.2):
+        self.result = result
+        self.delay = delay
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return self.result
+
+
+def run_concurrently(func, count=CONCURRENCY):
+    """Call `func` from `count` threads released at the same instant."""
+    barrier = threading.Barrier(count)
+    results = [None] * count
+    errors = []
+
+    def worker(index):
+        barrier.wait()
+        try:
+            results[index] = func()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    if errors:
+        raise errors[0]
+    return results
+
+
+def fake_sections(upstream):
+    """Every dashboard section served by one counting fake."""
+    return lambda: {name: upstream for name in dashboard.SECTION_INTERVALS}
+
+
+class SingleFlightTest(unittest.TestCase):
+    def test_concurrent_calls_with_one_key_run_once_and_share_the_result(self):
+        flight = dashboard.SingleFlight()
+        upstream = CountingUpstream({"answer": 42})
+        results = run_concurrently(lambda: flight.do("key", upstream))
+        self.assertEqual(upstream.calls, 1)
+        self.assertTrue(all(result is upstream.result for result in results))
+
+    def test_different_keys_do_not_wait_on_each_other(self):
+        flight = dashboard.SingleFlight()
+        upstream = CountingUpstream("value", delay=0.05)
+        run_concurrently(lambda: flight.do(threading.get_ident(), upstream), count=5)
+        self.assertEqual(upstream.calls, 5)
+
+    def test_an_exception_reaches_every_waiter_and_is_not_remembered(self):
+        flight = dashboard.SingleFlight()
+
+        def failing():
+            time.sleep(0.1)
+            raise RuntimeError("upstream down")
+
+        with self.assertRaises(RuntimeError):
+            run_concurrently(lambda: flight.do("key", failing))
+        self.assertEqual(flight.do("key", lambda: "recovered"), "recovered")
+
+
+class CacheMissCoalescingTest(unittest.TestCase):
+    def setUp(self):
+        dashboard.metrics_cache.clear()
+        dashboard.connectivity_cache.clear()
+        dashboard.blocky_cache.clear()
+        self.metrics = dashboard.SystemMetrics()
+
+    def test_system_metrics_fan_out_runs_once(self):
+        upstream = CountingUpstream({"ok": True})
+        self.metrics.sections = fake_sections(upstream)
+        self.metrics.get_connectivity_cached = upstream
+        self.metrics.get_blocky_stats_cached = upstream
+
+        results = run_concurrently(self.metrics.get_system_metrics)
+
+        # One call per section, not one per request
+        self.assertEqual(upstream.calls, len(dashboard.SECTION_INTERVALS))
+        self.assertTrue(all(result["cpu"] == {"ok": True} for result in results))
+
+    def test_connectivity_check_runs_once(self):
+        upstream = CountingUpstream({"internet": True})
+        self.metrics.check_connectivity = upstream
+        results = run_concurrently(lambda: dashboard.data_sources.run(self.metrics.get_connectivity_cached()))
+        self.assertEqual(upstream.calls, 1)
+        self.assertTrue(all(result == {"internet": True} for result in results))
+
+    def test_blocky_stats_run_once(self):
+        upstream = CountingUpstream({"enabled": True})
+        self.metrics.get_blocky_stats = upstream
+        run_concurrently(lambda: dashboard.data_sources.run(self.metrics.get_blocky_stats_cached()))
+        self.assertEqual(upstream.calls, 1)
+
+    def test_client_info_runs_one_query(self):
+        upstream = CountingUpstream({
+            "status": [{"metric": {"ip": "10.1.1.10", "client": "laptop"}, "value": [0, "1"]}],
+            "connections": [],
+        }, delay=0)
+
+        async def aquery_many(*args, **kwargs):
+            await asyncio.sleep(0.2)
+            return upstream()
+
+        fake = type("FakeVictoriaMetrics", (), {"aquery_many": staticmethod(aquery_many)})()
+        original = dashboard.victoriametrics
+        dashboard.victoriametrics = fake
+        try:
+            cache = dashboard.ClientInfoCache(ttl_seconds=30)
+            results = run_concurrently(lambda: dashboard.data_sources.run(cache.get_clients()))
+        finally:
+            dashboard.victoriametrics = original
+        self.assertEqual(upstream.calls, 1)
+        self.assertTrue(all("10.1.1.10" in result for result in results))
+
+    def test_concurrent_http_requests_share_one_fetch(self):
+        upstream = CountingUpstream({"ok": True})
+        self.metrics.sections = fake_sections(upstream)
+        self.metrics.get_connectivity_cached = upstream
+        self.metrics.get_blocky_stats_cached = upstream
+        original = dashboard.system_metrics
+        dashboard.system_metrics = self.metrics
+        server = dashboard.DashboardHTTPServer(
+            ("127.0.0.1", 0), dashboard.MetricsHandler,
+            max_workers=CONCURRENCY, max_connections=CONCURRENCY,
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        def request():
+            conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=10)
+            try:
+                conn.request("GET", "/api/metrics")
+                response = conn.getresponse()
+                response.read()
+                return response.status
+            finally:
+                conn.close()
+
+        try:
+            statuses = run_concurrently(request)
+        finally:
+            server.shutdown()
+            server.server_close()
+            dashboard.system_metrics = original
+        self.assertEqual(statuses, [200] * CONCURRENCY)
+        self.assertEqual(upstream.calls, len(dashboard.SECTION_INTERVALS))
+
+
+class MetricsCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1_700_000_000.0
+        clock = unittest.mock.patch.object(dashboard.time, "time", lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def test_least_recently_used_entries_go_beyond_max_entries(self):
+        cache = dashboard.MetricsCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((cache.get("a"), cache.get("c")), (1, 3))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_least_recently_used_entries_go_beyond_max_bytes(self):
+        # Each value is 12 bytes of JSON
+        cache = dashboard.MetricsCache(max_bytes=30)
+        for key in "abc":
+            cache.set(key, "x" * 10)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["bytes"], 24)
+        self.assertEqual(cache.stats()["entries"], 2)
+
+    def test_an_oversized_value_is_not_cached_and_drops_the_old_one(self):
+        cache = dashboard.MetricsCache(max_bytes=30)
+        cache.set("small", 1)
+        cache.set("big", "x" * 10)
+        cache.set("big", "x" * 100)
+        self.assertIsNone(cache.get("big"))
+        self.assertEqual(cache.get("small"), 1)
+        self.assertEqual(cache.stats()["bytes"], 1)
+
+    def test_stale_values_are_served_while_one_refresh_runs(self):
+        cache = dashboard.MetricsCache(ttl_seconds=10, stale_seconds=30)
+        calls = []
+        release = asyncio.Event()
+
+        async def compute():
+            calls.append(self.now)
+            if len(calls) > 1:
+                await release.wait()
+            return len(calls)
+
+        async def scenario():
+            self.assertEqual(await cache.get_or_refresh("key", compute), 1)
+            self.now += 15
+            stale = [await cache.get_or_refresh("key", compute) for _ in range(3)]
+            refreshing = len(cache.refreshing)
+            release.set()
+            await asyncio.sleep(0.01)
+            return stale, refreshing, await cache.get_or_refresh("key", compute)
+
+        stale, refreshing, fresh = dashboard.data_sources.run(scenario(), timeout=5)
+        self.assertEqual(stale, [1, 1, 1])
+        self.assertEqual(refreshing, 1)
+        self.assertEqual(fresh, 2)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(cache.stats()["stale_hits"], 3)
+
+    def test_values_past_the_stale_window_are_recomputed_before_returning(self):
+        cache = dashboard.MetricsCache(ttl_seconds=10, stale_seconds=30)
+        values = iter([1, 2])
+        self.assertEqual(dashboard.data_sources.run(cache.get_or_refresh("key", lambda: next(values))), 1)
+        self.now += 41
+        self.assertEqual(dashboard.data_sources.run(cache.get_or_refresh("key", lambda: next(values))), 2)
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+
+class FakeBlockyVictoriaMetrics:
+    """Answers Blocky's batched query and records which parts were asked for."""
+
+    def __init__(self, running=True):
+        self.running = running
+        self.batches = []
+
+    async def aquery_many(self, queries, timeout=2, name="batch"):
+        self.batches.append(sorted(queries))
+        results = {part: [] for part in queries}
+        if not self.running:
+            return results
+        results["build_info"] = [{"metric": {}, "value": [0, "1"]}]
+        results["total"] = [{"metric": {}, "value": [0, "1000"]}]
+        results["blocking"] = [
+            {"metric": {"reason": "BLOCKED (ads)"}, "value": [0, "30"]},
+            {"metric": {"reason": "BLOCKED (malware)"}, "value": [0, "20"]},
+        ]
+        return {part: results[part] for part in queries}
+
+
+class BlockyStatsTest(unittest.TestCase):
+    def setUp(self):
+        self.metrics = dashboard.SystemMetrics()
+        self.original = dashboard.victoriametrics
+        self.addCleanup(setattr, dashboard, "victoriametrics", self.original)
+
+    def stats(self):
+        return dashboard.data_sources.run(self.metrics.get_blocky_stats())
+
+    def test_the_probe_rides_along_once_per_ttl(self):
+        dashboard.victoriametrics = fake = FakeBlockyVictoriaMetrics()
+        first = self.stats()
+        second = self.stats()
+        self.assertEqual(len(fake.batches), 2)
+        self.assertIn("build_info", fake.batches[0])
+        self.assertNotIn("build_info", fake.batches[1])
+        for stats in (first, second):
+            self.assertTrue(stats["enabled"])
+            self.assertEqual(stats["blocked_queries"], 50)
+            self.assertEqual(stats["block_percentage"], 5.0)
+            self.assertEqual(stats["blocking_lists"], {"ads": 30, "malware": 20})
+
+    def test_a_missing_blocky_is_not_queried_again_until_the_probe_expires(self):
+        dashboard.victoriametrics = fake = FakeBlockyVictoriaMetrics(running=False)
+        self.assertFalse(self.stats()["enabled"])
+        self.assertFalse(self.stats()["enabled"])
+        self.assertEqual(len(fake.batches), 1)
+
+        self.metrics.blocky_probed_at -= self.metrics.blocky_probe_ttl
+        fake.running = True
+        self.assertTrue(self.stats()["enabled"])
+
+
+def client(index, state="REACHABLE", rx=0):
+    return {
+        "ip": f"10.1.1.{index}",
+        "hostname": f"host-{index:03d}",
+        "mac": "aa:bb:cc:dd:ee:ff",
+        "device_type": "laptop" if index % 2 else "phone",
+        "state": state,
+        "bandwidth_rx_bps": rx,
+        "bandwidth_tx_bps": 0,
+    }
+
+
+class ClientIndexTest(unittest.TestCase):
+    def pages(self, index, sort, descending, limit, **filters):
+        ips, cursor = [], None
+        while True:
+            page = index.page(sort, descending, limit, cursor, **filters)
+            ips.extend(c["ip"] for c in page["clients"])
+            if not page["next_cursor"]:
+                return ips
+            cursor = dashboard.decode_client_cursor(page["next_cursor"], sort, descending)
+
+    def test_paging_visits_every_client_once_in_order(self):
+        clients = [client(i, rx=i % 7) for i in range(1, 101)]
+        index = dashboard.ClientIndex(clients)
+        ips = self.pages(index, "bandwidth", True, 15)
+        expected = sorted(clients, key=lambda c: (c["bandwidth_rx_bps"], int(c["ip"].split(".")[-1])), reverse=True)
+        self.assertEqual(ips, [c["ip"] for c in expected])
+
+    def test_filters_apply_before_paging(self):
+        clients = [client(i, state="FAILED" if i % 3 == 0 else "STALE") for i in range(1, 31)]
+        index = dashboard.ClientIndex(clients)
+        ips = self.pages(index, "name", False, 4, states=frozenset(["FAILED"]),
+                         device_types=frozenset(["phone"]))
+        self.assertEqual(ips, [f"10.1.1.{i}" for i in (6, 12, 18, 24, 30)])
+
+    def test_a_cursor_survives_a_new_snapshot(self):
+        index = dashboard.ClientIndex([client(i) for i in range(1, 11)])
+        first = index.page("ip", False, 5)
+        # A client before the cursor disappears between pages
+        newer = dashboard.ClientIndex([client(i) for i in range(2, 11)])
+        cursor = dashboard.decode_client_cursor(first["next_cursor"], "ip", False)
+        second = newer.page("ip", False, 5, cursor)
+        self.assertEqual([c["ip"] for c in second["clients"]], [f"10.1.1.{i}" for i in range(6, 11)])
+
+    def test_a_cursor_from_another_sort_is_rejected(self):
+        page = dashboard.ClientIndex([client(i) for i in range(1, 5)]).page("name", False, 2)
+        with self.assertRaises(ValueError):
+            dashboard.decode_client_cursor(page["next_cursor"], "bandwidth", True)
+
+    def test_a_cursor_with_the_wrong_key_shape_is_rejected(self):
+        for key in ([True, ["x"]], ["fast", 1], [1.5], [10, 1, 2], "abc"):
+            cursor = dashboard.encode_client_cursor("bandwidth", True, key)
+            with self.assertRaises(ValueError, msg=key):
+                dashboard.decode_client_cursor(cursor, "bandwidth", True)
+        cursor = dashboard.encode_client_cursor("bandwidth", True, [1.5, 7])
+        self.assertEqual(dashboard.decode_client_cursor(cursor, "bandwidth", True), (1.5, 7))
+
+
+class ClientEndpointsTest(unittest.TestCase):
+    def setUp(self):
+        self.metrics = dashboard.SystemMetrics()
+        self.metrics.client_index = dashboard.ClientIndex([client(i) for i in range(1, 5)])
+        original = dashboard.system_metrics
+        self.addCleanup(setattr, dashboard, "system_metrics", original)
+        dashboard.system_metrics = self.metrics
+        server = dashboard.DashboardHTTPServer(("127.0.0.1", 0), dashboard.MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.port = server.server_address[1]
+
+    def get(self, path, headers={}):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=10)
+        try:
+            conn.request("GET", path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            return response
+        finally:
+            conn.close()
+
+    def status(self, path):
+        return self.get(path).status
+
+    def test_a_cursor_of_the_wrong_types_is_a_bad_request(self):
+        cursor = dashboard.encode_client_cursor("bandwidth", True, [True, ["x"]])
+        self.assertEqual(self.status(f"/api/clients?cursor={cursor}"), 400)
+        self.assertEqual(self.status("/api/clients"), 200)
+
+    def test_a_client_index_timeout_is_unavailable(self):
+        def timed_out(max_age=5):
+            raise TimeoutError
+
+        self.metrics.get_client_index = timed_out
+        self.assertEqual(self.status("/api/clients"), 503)
+        self.assertEqual(self.status("/api/client-histories"), 503)
+
+    def test_the_collectors_index_is_served_whatever_its_age(self):
+        self.metrics.client_index = dashboard.ClientIndex([client(i) for i in range(1, 5)],
+                                                          created=time.time() - 600)
+
+        async def refreshed():
+            raise AssertionError("refreshed on the request thread")
+
+        self.metrics.get_connected_clients = refreshed
+        with unittest.mock.patch.object(dashboard.MetricsCollector, "running",
+                                        new_callable=unittest.mock.PropertyMock, return_value=True):
+            response = self.get("/api/clients")
+        self.assertEqual(response.status, 200)
+
+    def test_histories_vary_on_accept(self):
+        self.metrics.get_bulk_client_histories = lambda ips, duration, timeout: {"histories": {}}
+        self.metrics.get_client_history_columns = lambda ips, duration, timeout: (
+            array("d", [0.0]), {"10.1.1.1": (array("d", [1.0]), array("d", [2.0]))}, 600, 60)
+        for accept in ("application/json", dashboard.HISTORY_BINARY_TYPE):
+            response = self.get("/api/client-histories?ips=10.1.1.1", {"Accept": accept})
+            self.assertEqual(response.status, 200)
+            self.assertEqual(response.getheader("Vary"), "Accept, Accept-Encoding")
+        self.assertEqual(self.get("/api/clients").getheader("Vary"), "Accept-Encoding")
+
+
+KEA_HEADER = "address,hwaddr,client_id,valid_lifetime,expire,subnet_id,fqdn_fwd,fqdn_rev,hostname,state,user_context,pool_id\n"
+
+
+class HostnameResolverTest(unittest.TestCase):
+    def setUp(self):
+        self.leases = tempfile.NamedTemporaryFile("w", suffix=".csv")
+        self.addCleanup(self.leases.close)
+        self.resolver = dashboard.HostnameResolver(self.leases.name)
+        self.resolver.thread = "not started"  # PTR lookups are run by hand below
+
+    def write_leases(self, *rows):
+        self.leases.seek(0)
+        self.leases.truncate()
+        self.leases.write(KEA_HEADER + "".join(rows))
+        self.leases.flush()
+
+    def test_the_latest_active_lease_wins(self):
+        future = int(time.time()) + 3600
+        self.write_leases(
+            f"10.1.1.20,aa:bb:cc:00:00:01,,3600,{future},1,0,0,old-name,0,,0\n",
+            f"10.1.1.20,aa:bb:cc:00:00:01,,3600,{future},1,0,0,new-name.lan.,0,,0\n",
+            f"10.1.1.21,aa:bb:cc:00:00:02,,3600,{future},1,0,0,gone,0,,0\n",
+            f"10.1.1.21,aa:bb:cc:00:00:02,,3600,{future},1,0,0,gone,2,,0\n",
+            "10.1.1.22,aa:bb:cc:00:00:03,,3600,1000,1,0,0,expired,0,,0\n",
+        )
+        # Lookups leave the file to the resolver thread
+        self.assertIsNone(self.resolver.lookup("10.1.1.20"))
+        self.assertIsNone(self.resolver.queue.get_nowait())
+        self.resolver.load_leases()
+        self.assertEqual(self.resolver.lookup("10.1.1.20"), "new-name.lan")
+        self.assertIsNone(self.resolver.lookup("10.1.1.21"))
+        self.assertIsNone(self.resolver.lookup("10.1.1.22"))
+
+    def test_misses_are_queued_once_and_failures_cached(self):
+        self.write_leases()
+        for _ in range(3):
+            self.assertIsNone(self.resolver.lookup("10.1.1.30"))
+        # One lease check and one PTR lookup
+        self.assertEqual(list(self.resolver.queue.queue), [None, "10.1.1.30"])
+        self.resolver.queue.get()
+
+        self.resolver.store(self.resolver.queue.get(), None)
+        self.assertIsNone(self.resolver.lookup("10.1.1.30"))
+        self.assertEqual(self.resolver.queue.qsize(), 0)
+        self.assertEqual(self.resolver.stats()["negative_hits"], 1)
+
+        self.resolver.store("10.1.1.31", "printer.lan")
+        self.assertEqual(self.resolver.lookup("10.1.1.31"), "printer.lan")
+
+
+class FlakyNetlink:
+    """Subscribes over datagram socketpairs; the first `failures` dumps time out."""
+
+    def __init__(self, failures=1, denied=False):
+        self.failures = failures
+        self.denied = denied
+        self.subscriptions = 0
+        self.dumps = 0
+        self.sockets = []
+        self.peers = []
+
+    def subscribe(self, groups):
+        self.subscriptions += 1
+        if self.denied:
+            raise PermissionError("Operation not permitted")
+        sock, peer = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sockets.append(sock)
+        self.peers.append(peer)
+        return sock
+
+    async def dump(self):
+        self.dumps += 1
+        await asyncio.sleep(0)
+        if self.failures:
+            self.failures -= 1
+            raise TimeoutError("timed out")
+
+    async def aaddresses(self):
+        await self.dump()
+        return {"br-lan": [("10.1.1.1", 24)]}
+
+    async def aneighbors(self):
+        await self.dump()
+        return {}
+
+    def close(self):
+        async def unregister():
+            loop = asyncio.get_running_loop()
+            for sock in self.sockets:
+                if sock.fileno() != -1:
+                    loop.remove_reader(sock)
+
+        dashboard.data_sources.run(unregister())
+        for sock in self.sockets + self.peers:
+            sock.close()
+
+
+class NetlinkTrackerTest(unittest.TestCase):
+    def run_on_loop(self, coro):
+        return dashboard.data_sources.run(coro, timeout=5)
+
+    def test_address_tracking_starts_once_the_initial_dump_succeeds(self):
+        netlink = FlakyNetlink(failures=2)
+        self.addCleanup(netlink.close)
+        tracker = dashboard.AddressTracker(netlink)
+        with self.assertLogs("router-dashboard", "WARNING"):
+            with self.assertRaises(OSError):
+                self.run_on_loop(tracker.get_addresses())
+        self.assertFalse(tracker.started)
+        self.assertEqual(netlink.sockets[0].fileno(), -1)
+
+        self.assertEqual(self.run_on_loop(tracker.get_addresses()), {"br-lan": [("10.1.1.1", 24)]})
+        self.assertTrue(tracker.started)
+        self.assertIs(tracker.sock, netlink.sockets[1])
+
+    def test_an_address_event_re_reads_the_table_on_the_loop(self):
+        netlink = FlakyNetlink(failures=0)
+        self.addCleanup(netlink.close)
+        tracker = dashboard.AddressTracker(netlink)
+        tracker.external_stale = False
+        self.run_on_loop(tracker.get_addresses())
+        self.assertEqual(netlink.dumps, 1)
+
+        header = dashboard.NLMSG_HEADER.pack(dashboard.NLMSG_HEADER.size, dashboard.RTM_NEWADDR, 0, 0, 0)
+        with self.assertLogs("router-dashboard", "INFO"):
+            netlink.peers[0].send(header)
+            deadline = time.monotonic() + 5
+            while netlink.dumps < 2 or tracker.reload_task is not None:
+                self.assertLess(time.monotonic(), deadline)
+                time.sleep(0.01)
+        self.assertTrue(tracker.external_stale)
+
+    def test_a_failed_neighbor_dump_closes_its_subscription(self):
+        netlink = FlakyNetlink(failures=3)
+        self.addCleanup(netlink.close)
+        table = dashboard.NeighborTable(netlink)
+        for _ in range(2):
+            with self.assertLogs("router-dashboard", "WARNING"):
+                self.run_on_loop(table.ensure_started())
+        self.assertEqual([sock.fileno() for sock in netlink.sockets], [-1, -1])
+        self.assertIsNone(table.sock)
+        self.assertFalse(table.started)
+
+    def test_a_denied_neighbor_subscription_falls_back_to_dumps_quietly(self):
+        netlink = FlakyNetlink(failures=0, denied=True)
+        self.addCleanup(netlink.close)
+        table = dashboard.NeighborTable(netlink)
+        with self.assertLogs("router-dashboard", "WARNING") as logs:
+            for _ in range(5):
+                self.run_on_loop(table.get_neighbors())
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(netlink.subscriptions, 1)
+        self.assertEqual(netlink.dumps, 5)
+
+
+class ProcSamplerTest(unittest.TestCase):
+    def setUp(self):
+        scratch = tempfile.TemporaryDirectory()
+        self.addCleanup(scratch.cleanup)
+        self.root = Path(scratch.name)
+
+    def write_stat(self, *lines):
+        """cpu lines as (user, system, idle, iowait, softirq) counters, aggregate first."""
+        stat = "".join(f"{name} {user} 0 {system} {idle} {iowait} 0 {softirq} 0 0 0\n"
+                       for name, (user, system, idle, iowait, softirq)
+                       in zip(["cpu"] + [f"cpu{i}" for i in range(len(lines) - 1)], lines))
+        (self.root / "stat").write_text(stat + "intr 12345 0 0\nctxt 678\n")
+
+    def sampler(self):
+        sampler = dashboard.ProcSampler(str(self.root))
+        self.addCleanup(sampler.stat.close)
+        return sampler
+
+    def test_usage_is_the_delta_since_the_previous_sample(self):
+        self.write_stat((100, 100, 800, 100, 0), (50, 50, 350, 50, 0), (50, 50, 450, 50, 0))
+        sampler = self.sampler()
+        self.write_stat((300, 200, 1350, 100, 100), (200, 100, 500, 50, 100), (100, 100, 850, 50, 0))
+
+        self.assertEqual(sampler.cpu_usage(), {
+            # aggregate: 950 jiffies, 550 idle, 100 softirq
+            "usage_percent": 42.1,
+            "softirq_percent": 10.5,
+            # cpu0: 450 jiffies, 150 idle; cpu1: 500 jiffies, 400 idle
+            "per_core": [66.7, 20.0],
+            "per_core_softirq": [22.2, 0.0],
+        })
+        # Nothing ran since, so nothing is busy
+        self.assertEqual(sampler.cpu_usage()["per_core"], [0.0, 0.0])
+
+    def test_restarted_counters_count_from_zero(self):
+        self.write_stat((200, 200, 1400, 200, 0), (100, 100, 700, 100, 0), (100, 100, 700, 100, 0))
+        sampler = self.sampler()
+
+        # cpu1 went offline and back, restarting its counters
+        self.write_stat((220, 220, 1460, 200, 0), (110, 110, 730, 100, 0), (10, 10, 30, 0, 0))
+        self.assertEqual(sampler.cpu_usage()["per_core"], [40.0, 40.0])
+
+        # A core fewer: every line is read against zero
+        self.write_stat((20, 20, 50, 10, 0), (20, 20, 50, 10, 0))
+        usage = sampler.cpu_usage()
+        self.assertEqual((usage["usage_percent"], usage["per_core"]), (40.0, [40.0]))
+
+
+class ClientTrafficTotalsTest(unittest.TestCase):
+    def setUp(self):
+        self.traffic = dashboard.ClientTrafficTotals()
+        # Noon on a fixed day, so no window crosses midnight unexpectedly
+        self.start = time.mktime((2024, 5, 1, 12, 0, 0, 0, 0, -1))
+
+    def record(self, offset, **counters):
+        self.traffic.record({(ip, "rx"): value for ip, value in counters.items()}, self.start + offset)
+
+    def rx(self, offset, window):
+        return self.traffic.totals(["a"], self.start + offset).get("a", {}).get(window, {}).get("rx")
+
+    def test_deltas_roll_out_of_each_window(self):
+        self.record(0, a=1000)  # baseline only
+        self.record(60, a=1500)
+        self.record(7200, a=1800)
+
+        self.assertEqual(self.rx(7200, "1h"), 300)
+        self.assertEqual(self.rx(7200, "24h"), 800)
+        self.assertEqual(self.rx(25 * 3600, "1h"), 0)
+        self.assertEqual(self.rx(25 * 3600, "24h"), 300)
+        self.assertEqual(self.rx(25 * 3600, "7d"), 800)
+        self.assertEqual(self.rx(25 * 3600, "today"), 0)
+        # Idle clients are dropped once their week is empty
+        self.assertIsNone(self.rx(8 * 86400, "7d"))
+
+    def test_a_counter_reset_counts_from_zero(self):
+        self.record(0, a=5000)
+        self.record(10, a=200)
+        self.assertEqual(self.rx(10, "1h"), 200)
+
+    def test_top_talkers_are_ranked_by_window_total(self):
+        self.record(0, a=0, b=0, c=0)
+        self.record(30, a=10, b=300, c=20)
+        top = self.traffic.top("1h", 2, now=self.start + 60)
+        self.assertEqual([row[0] for row in top], ["b", "c"])
+
+
+class BinaryHistoriesTest(unittest.TestCase):
+    def decode(self, body):
+        """What dashboard.js does, for checking the layout."""
+        self.assertEqual(body[:4], dashboard.HISTORY_BINARY_MAGIC)
+        (length,) = struct.unpack_from("<I", body, 4)
+        header = json.loads(body[8:8 + length])
+        offset = 8 + length
+        self.assertEqual(offset % 8, 0)
+        points = header["points"]
+        timestamps = list(struct.unpack_from(f"<{points}d", body, offset))
+        offset += 8 * points
+        columns = {}
+        for ip in header["ips"]:
+            pair = []
+            for _ in range(2):
+                words = struct.unpack_from(f"<{points}I", body, offset)
+                offset += 4 * points
+                previous, bits = 0, []
+                for word in words:
+                    previous ^= word
+                    bits.append(previous)
+                pair.append(list(struct.unpack(f"<{points}f", struct.pack(f"<{points}I", *bits))))
+            columns[ip] = tuple(pair)
+        self.assertEqual(offset, len(body))
+        return header, timestamps, columns
+
+    def test_columns_round_trip_through_float32(self):
+        timestamps = array("d", [1000.0, 1060.0, 1120.0])
+        columns = {
+            "a": (array("d", [1.5, 1.5, 1e9]), array("d", [0.0, 0.0, 0.0])),
+            "b": (array("d", [3.25, -2.0, 7.0]), array("d", [0.1, 0.2, 0.3])),
+        }
+        body = dashboard.encode_client_histories(timestamps, columns, ["b", "a"], 180, 60)
+        header, decoded_timestamps, decoded = self.decode(body)
+
+        self.assertEqual(header["ips"], ["b", "a"])
+        self.assertEqual((header["duration"], header["step"], header["points"]), (180, 60, 3))
+        self.assertEqual(decoded_timestamps, list(timestamps))
+        self.assertEqual(decoded["a"], ([1.5, 1.5, 1e9], [0.0, 0.0, 0.0]))
+        self.assertEqual(decoded["b"][0], [3.25, -2.0, 7.0])
+        self.assertEqual(decoded["b"][1], list(array("f", [0.1, 0.2, 0.3])))
+
+    def test_repeated_values_encode_as_zero_words(self):
+        words = dashboard.xor_delta_float32([42.0] * 4)
+        self.assertEqual(list(words[1:]), [0, 0, 0])
+
+
+class RangeVictoriaMetrics:
+    """Answers range queries with a constant rate per client, or fails."""
+
+    def __init__(self, fail=False, value=lambda t: 500):
+        self.fail = fail
+        self.value = value
+        self.starts = []
+
+    def query_range(self, query, start, end, step, timeout=None, name=None):
+        self.starts.append(start)
+        if self.fail:
+            raise dashboard.VictoriaMetricsError("unreachable")
+        ips = query.split('"')[1].split("|")
+        values = [[t, str(self.value(t))] for t in range(start, end + 1, step)]
+        return [{"metric": {"ip": ip, "direction": direction}, "values": values}
+                for ip in ips for direction in ("rx", "tx")]
+
+
+class ClientSeriesCacheTest(unittest.TestCase):
+    def setUp(self):
+        # Each point's value is its own timestamp, so misplaced points show
+        self.vm = RangeVictoriaMetrics(value=lambda t: t)
+        originals = dashboard.victoriametrics, dashboard.client_rollups
+        self.addCleanup(setattr, dashboard, "victoriametrics", originals[0])
+        self.addCleanup(setattr, dashboard, "client_rollups", originals[1])
+        dashboard.victoriametrics, dashboard.client_rollups = self.vm, None
+        self.cache = dashboard.ClientSeriesCache(refresh_interval=15)
+        self.now = 1_700_000_037.5
+        clock = unittest.mock.patch.object(dashboard.time, "time", lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def get(self, *ips):
+        return self.cache.get(list(ips), 600, 60)
+
+    def assertWindow(self, series):
+        """The step grid from the window's start to now, each point exactly once."""
+        end = int(self.now)
+        expected = list(range((end - 600) // 60 * 60, end + 1, 60))
+        self.assertEqual(list(series.timestamps), expected)
+        self.assertEqual(list(series.rx), expected)
+        self.assertEqual(list(series.tx), expected)
+
+    def test_a_stale_entry_queries_only_from_its_last_step(self):
+        first_end = int(self.now)
+        self.assertWindow(self.get("a")["a"])
+        self.now += 130
+        series = self.get("a")["a"]
+        self.assertEqual(self.vm.starts[-1], (first_end - 60) // 60 * 60)
+        self.assertWindow(series)
+        self.assertEqual(self.cache.stats()["extensions"], 1)
+
+    def test_entries_fetched_at_different_times_extend_from_the_oldest(self):
+        oldest_end = int(self.now)
+        self.get("a")
+        self.now += 130
+        self.get("b")
+        self.now += 130
+        series = self.get("a", "b")
+        # One query for both, re-reading b's points from a's last step on
+        self.assertEqual(len(self.vm.starts), 3)
+        self.assertEqual(self.vm.starts[-1], (oldest_end - 60) // 60 * 60)
+        self.assertWindow(series["a"])
+        self.assertWindow(series["b"])
+
+    def test_fresh_entries_are_not_queried(self):
+        self.get("a")
+        self.now += 5
+        self.get("a")
+        self.assertEqual(len(self.vm.starts), 1)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_a_failed_extension_serves_the_stale_series(self):
+        before = list(self.get("a")["a"].timestamps)
+        self.vm.fail = True
+        self.now += 130
+        with self.assertLogs("router-dashboard", "ERROR"):
+            series = self.get("a")["a"]
+        self.assertEqual(list(series.timestamps), before)
+
+        self.vm.fail = False
+        self.now += 5
+        self.assertWindow(self.get("a")["a"])
+
+
+class ClientRollupsTest(unittest.TestCase):
+    def setUp(self):
+        scratch = tempfile.TemporaryDirectory()
+        self.addCleanup(scratch.cleanup)
+        self.path = str(Path(scratch.name) / "rollups.bin")
+        self.rollups = self.open()
+        self.minute = int(time.time()) // 60 * 60
+
+    def open(self, slots=4):
+        rollups = dashboard.ClientRollups(self.path, slots=slots)
+        self.addCleanup(rollups.close)
+        return rollups
+
+    def record_hour(self, rollups, rx=100.0, skip=()):
+        """Samples every 15 s over the hour before the current minute."""
+        for t in range(self.minute - 3600, self.minute, 15):
+            if (t - self.minute) // 60 not in skip:
+                rollups.record({"a": (rx, 2 * rx), "b": (rx + (t // 60) % 2, 0.0)}, t)
+
+    def test_history_survives_reopening(self):
+        self.record_hour(self.rollups)
+        self.rollups.close()
+        series = self.open().series(["a", "b", "c"], self.minute - 1800, self.minute, 120)
+
+        self.assertEqual(sorted(series), ["a", "b"])
+        self.assertEqual(series["a"].end, self.minute)
+        self.assertEqual(set(series["a"].rx), {100.0})
+        self.assertEqual(set(series["a"].tx), {200.0})
+        self.assertEqual(set(series["b"].rx), {100.5})
+        self.assertEqual(list(series["a"].timestamps), list(range(self.minute - 1800, self.minute + 1, 120)))
+
+    def test_gaps_only_show_up_in_fallback_series(self):
+        self.record_hour(self.rollups, skip={-8, -7, -6, -5})
+        start = self.minute - 1800
+        self.assertEqual(self.rollups.series(["a"], start, self.minute, 120), {})
+        # A 30 s grid is finer than the minute buckets
+        self.assertEqual(self.rollups.series(["a"], start, self.minute, 30), {})
+
+        # Points average the buckets that have samples; one with none reads 0
+        rx = self.rollups.series(["a"], start, self.minute, 120, complete=False)["a"].rx
+        self.assertEqual(set(rx), {0.0, 100.0})
+
+    def test_least_recently_seen_slot_is_recycled(self):
+        rollups = dashboard.ClientRollups(self.path + ".small", slots=2)
+        self.addCleanup(rollups.close)
+        rollups.record({"a": (1.0, 1.0)}, self.minute - 120)
+        rollups.record({"b": (1.0, 1.0)}, self.minute - 90)
+        rollups.record({"b": (1.0, 1.0), "c": (3.0, 3.0)}, self.minute - 60)
+        series = rollups.series(["a", "b", "c"], self.minute - 120, self.minute, 60, complete=False)
+        self.assertEqual(sorted(series), ["b", "c"])
+        # c's slot was cleared, so the minute before it was seen reads as idle
+        self.assertEqual(list(series["c"].rx), [0.0, 0.0, 3.0])
+
+    def test_a_window_across_the_end_of_the_ring(self):
+        # Minute bucket numbers wrap to index 0 at UTC midnight
+        midnight = self.minute // 86400 * 86400
+        for t in range(midnight - 1800, midnight + 1800, 15):
+            self.rollups.record({"a": (float(t // 60 % 7), 0.0)}, t)
+        series = self.rollups.series(["a"], midnight - 1200, midnight + 1200, 120, now=midnight + 1800)
+
+        minutes = [int(t) // 60 for t in series["a"].timestamps]
+        self.assertEqual(list(series["a"].rx), [((m - 2) % 7 + (m - 1) % 7) / 2 for m in minutes])
+
+    def history(self, vm, ips):
+        cache = dashboard.ClientSeriesCache()
+        originals = dashboard.victoriametrics, dashboard.client_rollups
+        dashboard.victoriametrics, dashboard.client_rollups = vm, self.rollups
+        try:
+            return cache.get(ips, 1800, 120), cache
+        finally:
+            dashboard.victoriametrics, dashboard.client_rollups = originals
+
+    def test_complete_rollups_seed_the_cache_and_only_the_tail_is_queried(self):
+        self.record_hour(self.rollups)
+        vm = RangeVictoriaMetrics()
+        series, cache = self.history(vm, ["a"])
+        self.assertEqual(len(vm.starts), 1)
+        self.assertGreaterEqual(vm.starts[0], self.minute - 240)
+        self.assertEqual(cache.stats()["seeded"], 1)
+        self.assertEqual(series["a"].rx[0], 100.0)
+        self.assertEqual(series["a"].rx[-1], 500.0)
+
+    def test_rollups_stand_in_while_victoriametrics_is_down(self):
+        self.record_hour(self.rollups, skip={-5})
+        series, cache = self.history(RangeVictoriaMetrics(fail=True), ["a", "c"])
+        self.assertEqual(sorted(series), ["a"])
+        self.assertIn(100.0, series["a"].rx)
+        # Not cached, so VictoriaMetrics' own history replaces it once it's back
+        self.assertEqual(cache.stats()["entries"], 0)
+
+
+class StaticAssetsTest(unittest.TestCase):
+    def setUp(self):
+        scratch = tempfile.TemporaryDirectory()
+        self.addCleanup(scratch.cleanup)
+        self.root = Path(scratch.name)
+        (self.root / "vendor" / "fonts").mkdir(parents=True)
+        (self.root / "index.html").write_text(
+            '<link href="https://cdn.lineicons.com/4.0/lineicons.css" rel="stylesheet" />'
+            '<script src="https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.min.js"></script>'
+            '<script src="https://cdn.tailwindcss.com"></script>\n'
+            '    <script src="/static/tailwind-config.js"></script>'
+            '<script src="/static/app.js"></script>'
+        )
+        (self.root / "tailwind-config.js").write_text("tailwind.config = {};")
+        (self.root / "app.js").write_text("console.log('hi');")
+        (self.root / "vendor" / "lineicons.css").write_text(
+            '@font-face { src: url("fonts/lineicons.woff2?v=4") format("woff2"); }'
+        )
+        (self.root / "vendor" / "fonts" / "lineicons.woff2").write_bytes(b"wOF2")
+
+    def test_references_become_hashed_and_vendored_files_replace_cdns(self):
+        assets = dashboard.StaticAssets(str(self.root))
+        page = assets.page.body.decode()
+        self.assertNotIn("cdn.lineicons.com", page)
+        # Chart.js wasn't vendored, so the page still loads it from the CDN
+        self.assertIn("cdn.jsdelivr.net", page)
+        # No compiled stylesheet either, so the JIT stays
+        self.assertIn("cdn.tailwindcss.com", page)
+
+        app = assets.hashed["app.js"]
+        self.assertRegex(app, r"^/static/app\.[0-9a-f]{10}\.js$")
+        self.assertIn(app, page)
+        self.assertEqual(assets.get(app).cache_control, dashboard.IMMUTABLE)
+        self.assertEqual(assets.get("/static/app.js").cache_control, "no-cache")
+
+        font = assets.hashed["vendor/fonts/lineicons.woff2"]
+        css = assets.get(assets.hashed["vendor/lineicons.css"]).body.decode()
+        self.assertIn(f'url({font}?v=4)', css)
+        self.assertEqual(assets.get(font).content_type, "font/woff2")
+
+    def test_a_compiled_stylesheet_replaces_the_tailwind_jit(self):
+        (self.root / "vendor" / "tailwind.css").write_text(".p-5{padding:1.25rem}")
+        assets = dashboard.StaticAssets(str(self.root))
+        page = assets.page.body.decode()
+        self.assertNotIn("cdn.tailwindcss.com", page)
+        self.assertNotIn("tailwind-config", page)
+        self.assertIn(f'<link href="{assets.hashed["vendor/tailwind.css"]}" rel="stylesheet" />', page)
+
+    def test_a_changed_file_gets_a_new_name(self):
+        before = dashboard.StaticAssets(str(self.root)).hashed["app.js"]
+        (self.root / "app.js").write_text("console.log('bye');")
+        self.assertNotEqual(dashboard.StaticAssets(str(self.root)).hashed["app.js"], before)
+
+
+class FakeSections:
+    """A SystemMetrics stand-in whose sections return scripted values."""
+
+    def __init__(self, **sections):
+        self.values = sections
+
+    def sections(self):
+        return {name: (lambda name=name: self.values[name]) for name in self.values}
+
+
+class AdaptiveSchedulerTest(unittest.TestCase):
+    def collector(self, **sections):
+        return dashboard.MetricsCollector(FakeSections(**sections))
+
+    def test_stable_sections_back_off_to_their_upper_bound(self):
+        collector = self.collector(uptime={"seconds": 1, "formatted": "1d 2h"})
+        for second in range(2, 30):
+            # Only the seconds move, which the page doesn't show
+            collector.source.values["uptime"] = {"seconds": second, "formatted": "1d 2h"}
+            dashboard.data_sources.run(collector.refresh("uptime"))
+        self.assertEqual(collector.intervals["uptime"], dashboard.SECTION_INTERVAL_BOUNDS["uptime"][1])
+
+    def test_volatile_sections_speed_up_to_their_lower_bound(self):
+        collector = self.collector(cpu={"usage_percent": 0})
+        for percent in range(1, 30):
+            collector.source.values["cpu"] = {"usage_percent": percent, "_debug_timing": percent}
+            dashboard.data_sources.run(collector.refresh("cpu"))
+        self.assertEqual(collector.intervals["cpu"], dashboard.SECTION_INTERVAL_BOUNDS["cpu"][0])
+        self.assertGreater(collector.scheduler_report()["sections"]["cpu"]["change_rate"], 0.9)
+
+    def test_fixed_intervals_stay_put(self):
+        collector = self.collector(memory={"percent": 10.0})
+        collector.adaptive = False
+        for _ in range(10):
+            dashboard.data_sources.run(collector.refresh("memory"))
+        self.assertEqual(collector.intervals["memory"], dashboard.SECTION_INTERVALS["memory"])
+        self.assertEqual(collector.scheduler_report()["sections"]["memory"]["refreshes"], 10)
+
+
+class HungSections(FakeSections):
+    def sections(self):
+        async def hang():
+            await asyncio.sleep(60)
+
+        return dict(super().sections(), blocky=hang)
+
+
+class SectionTimeoutTest(unittest.TestCase):
+    def setUp(self):
+        timeouts = dict(dashboard.SECTION_TIMEOUTS)
+        self.addCleanup(dashboard.SECTION_TIMEOUTS.update, timeouts)
+        dashboard.SECTION_TIMEOUTS["blocky"] = 0.1
+
+    def test_a_hung_section_is_cancelled_and_keeps_its_last_value(self):
+        collector = dashboard.MetricsCollector(HungSections(uptime={"formatted": "1d"}))
+        dashboard.data_sources.run(collector.refresh("uptime"))
+        dashboard.data_sources.run(collector.refresh("blocky"), timeout=5)
+        self.assertEqual(collector.sections["blocky"]["duration"], -1)
+        self.assertEqual(collector.get_snapshot()["uptime"], {"formatted": "1d"})
+        self.assertEqual(collector.in_flight, set())
+
+    def test_on_demand_fan_out_reports_the_hung_section_as_failed(self):
+        metrics = dashboard.SystemMetrics()
+        metrics.sections = HungSections(uptime={"formatted": "1d"}).sections
+        metrics.get_connectivity_cached = lambda: {}
+        metrics.get_blocky_stats_cached = metrics.sections()["blocky"]
+        started = time.monotonic()
+        results = dashboard.data_sources.run(metrics.collect_system_metrics(), timeout=5)
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(results["blocky"], {})
+        self.assertEqual(results["_timings"]["details"]["blocky"], -1)
+        self.assertEqual(results["uptime"], {"formatted": "1d"})
+
+
+class AsyncSingleFlightTest(unittest.TestCase):
+    def test_concurrent_awaits_share_one_call_and_survive_a_cancelled_waiter(self):
+        flight = dashboard.AsyncSingleFlight()
+        calls = []
+
+        async def upstream():
+            calls.append(1)
+            await asyncio.sleep(0.1)
+            return "value"
+
+        async def scenario():
+            impatient = asyncio.ensure_future(flight.do("key", upstream))
+            waiters = [flight.do("key", upstream) for _ in range(5)]
+            await asyncio.sleep(0.01)
+            impatient.cancel()
+            return await asyncio.gather(*waiters)
+
+        self.assertEqual(dashboard.data_sources.run(scenario(), timeout=5), ["value"] * 5)
+        self.assertEqual(len(calls), 1)
+
+
+class StubQueryHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    chunked = False
+
+    def setup(self):
+        super().setup()
+        StubQueryHandler.connections += 1
+
+    def do_GET(self):
+        body = json.dumps({"status": "success", "data": {"result": [{"metric": {}, "value": [0, "1"]}]}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        if self.chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            half = len(body) // 2
+            for part in (body[:half], body[half:], b""):
+                self.wfile.write(f"{len(part):x}\r\n".encode() + part + b"\r\n")
+        else:
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class VictoriaMetricsClientTest(unittest.TestCase):
+    def setUp(self):
+        StubQueryHandler.connections = 0
+        StubQueryHandler.chunked = False
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StubQueryHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.client = dashboard.VictoriaMetricsClient(f"http://127.0.0.1:{server.server_address[1]}")
+        self.addCleanup(self.client.close)
+
+    def test_queries_reuse_one_keep_alive_connection(self):
+        for query in ("a", "b", "c"):
+            self.assertEqual(len(self.client.query(query)), 1)
+        self.assertEqual(StubQueryHandler.connections, 1)
+
+    def test_chunked_responses_are_reassembled(self):
+        StubQueryHandler.chunked = True
+        self.assertEqual(self.client.query_many({"x": "a", "y": "b"})["x"], [])
+        self.assertEqual(self.client.query("a")[0]["value"], [0, "1"])
+
+    def test_blocking_calls_are_refused_on_the_loop(self):
+        async def on_loop():
+            return self.client.query("a")
+
+        with self.assertRaises(RuntimeError):
+            dashboard.data_sources.run(on_loop())
+
+
+class InstrumentationTest(unittest.TestCase):
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = dashboard.Histogram("latency_seconds", "test", ("route",), buckets=(0.1, 1))
+        for value in (0.05, 0.5, 0.5, 5):
+            histogram.observe(value, "/api/metrics")
+        lines = histogram.render()
+        self.assertIn('latency_seconds_bucket{route="/api/metrics",le="0.1"} 1', lines)
+        self.assertIn('latency_seconds_bucket{route="/api/metrics",le="1"} 3', lines)
+        self.assertIn('latency_seconds_bucket{route="/api/metrics",le="+Inf"} 4', lines)
+        self.assertIn('latency_seconds_count{route="/api/metrics"} 4', lines)
+
+    def test_label_values_are_escaped(self):
+        self.assertEqual(
+            dashboard.prometheus_labels(("query",), ('say "hi"\\now',)),
+            '{query="say \\"hi\\"\\\\now"}',
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()